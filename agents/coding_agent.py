@@ -1,5 +1,6 @@
 from autogen_agentchat import AssistantAgent
 import streamlit as st
+from core.llm_client import build_llm_config, attach_pooled_client
 import os
 
 
@@ -59,18 +60,14 @@ CRITICAL OUTPUT RULES:
 coding_agent = AssistantAgent(
     name="coding_agent",
     system_message=SYSTEM_MESSAGE,
-    llm_config={
-        "config_list": [
-            {
-                "model": st.secrets["MODEL"],
-                "api_type": "groq",
-                "api_key": st.secrets["GROQ_API_KEY"],
-            }
-        ],
-        "temperature": 0.1,
-        "max_tokens": 5000,
-    },
+    llm_config=build_llm_config(
+        model=st.secrets["MODEL"],
+        api_key=st.secrets["GROQ_API_KEY"],
+        temperature=0.1,
+        max_tokens=5000,
+    ),
 )
+attach_pooled_client(coding_agent)
 
 
 
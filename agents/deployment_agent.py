@@ -1,6 +1,7 @@
 # Deployment Agent
 from autogen_agentchat import AssistantAgent
 import streamlit as st
+from core.llm_client import build_llm_config, attach_pooled_client
 import os
 
 
@@ -50,17 +51,13 @@ CRITICAL OUTPUT RULES:
 deployment_agent = AssistantAgent(
     name="deployment_agent",
     system_message=SYSTEM_MESSAGE,
-    llm_config={
-        "config_list": [
-            {
-                "model": st.secrets["MODEL_BASIC"],
-                "api_type": "groq",
-                "api_key": st.secrets["GROQ_API_KEY"],
-            }
-        ],
-        "temperature": 0.0,
-        "max_tokens": 2000,
-    },
+    llm_config=build_llm_config(
+        model=st.secrets["MODEL_BASIC"],
+        api_key=st.secrets["GROQ_API_KEY"],
+        temperature=0.0,
+        max_tokens=2000,
+    ),
 )
+attach_pooled_client(deployment_agent)
 
 
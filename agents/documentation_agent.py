@@ -1,37 +1,33 @@
 # Documentation Agent
 from autogen_agentchat import AssistantAgent
 import streamlit as st
+from core.llm_client import build_llm_config, attach_pooled_client
 
 SYSTEM_MESSAGE = """
 You are a Technical Documentation Specialist.
 
 TASK:
-- Generate clear, professional documentation for the project.
+- Write the short narrative parts of a project's documentation.
+- Requirement lists, component lists and API tables are rendered separately
+  from structured data - do NOT repeat them.
 
-DOCUMENTS TO GENERATE:
-1. README.md
-2. ARCHITECTURE.md
-3. API.md
+SECTIONS TO WRITE:
+1. overview - 2-3 sentences: what the project does and for whom
+2. architecture - one paragraph: how the components work together
+3. usage - one paragraph: how a user typically runs and uses the project
 
 QUALITY REQUIREMENTS:
-- Documentation must be readable and practical
+- Plain prose, no lists, no headings
 - Avoid filler or meaningless text
-- Explain how to run and use the project
+- Keep the whole answer under 250 words
 
 OUTPUT SCHEMA:
 {
-  "docs": [
-    {
-      "path": "string",
-      "content_base64": "string"
-    }
-  ]
+  "overview": "string",
+  "architecture": "string",
+  "usage": "string"
 }
 
-IMPORTANT:
-- Encode documentation using BASE64
-- Output ONLY JSON
-
 CRITICAL OUTPUT RULES:
 - Output ONLY valid JSON
 - Do NOT include explanations
@@ -47,17 +43,13 @@ CRITICAL OUTPUT RULES:
 documentation_agent = AssistantAgent(
     name="documentation_agent",
     system_message=SYSTEM_MESSAGE,
-    llm_config={
-        "config_list": [
-            {
-                "model": st.secrets["MODEL_BASIC"],
-                "api_type": "groq",
-                "api_key": st.secrets["GROQ_API_KEY"],
-            }
-        ],
-        "temperature": 0.1,
-        "max_tokens": 2000,
-    },
+    llm_config=build_llm_config(
+        model=st.secrets["MODEL_BASIC"],
+        api_key=st.secrets["GROQ_API_KEY"],
+        temperature=0.1,
+        max_tokens=600,
+    ),
 )
+attach_pooled_client(documentation_agent)
 
 
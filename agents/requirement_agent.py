@@ -1,5 +1,6 @@
 from autogen_agentchat.agents import AssistantAgent
 import streamlit as st
+from core.llm_client import build_llm_config, attach_pooled_client
 
 SYSTEM_MESSAGE = """
 You are a Senior Business Analyst and Software Architect.
@@ -41,18 +42,14 @@ CRITICAL OUTPUT RULES:
 requirement_agent = AssistantAgent(
     name="requirement_agent",
     system_message=SYSTEM_MESSAGE,
-    llm_config={
-        "config_list": [
-            {
-                "model": st.secrets["MODEL_BASIC"],
-                "api_type": "groq",
-                "api_key": st.secrets["GROQ_API_KEY"],
-            }
-        ],
-        "temperature": 0.0,
-        "max_tokens": 2000,
-    },
+    llm_config=build_llm_config(
+        model=st.secrets["MODEL_BASIC"],
+        api_key=st.secrets["GROQ_API_KEY"],
+        temperature=0.0,
+        max_tokens=2000,
+    ),
 )
+attach_pooled_client(requirement_agent)
 
 
 
@@ -1,5 +1,6 @@
 from autogen_agentchat import AssistantAgent
 import streamlit as st
+from core.llm_client import build_llm_config, attach_pooled_client
 
 SYSTEM_MESSAGE = """
 You are a Senior Code Reviewer acting as a mentor, not a gatekeeper.
@@ -59,17 +60,13 @@ CRITICAL OUTPUT RULES:
 review_agent = AssistantAgent(
     name="review_agent",
     system_message=SYSTEM_MESSAGE,
-    llm_config={
-        "config_list": [
-            {
-                "model": st.secrets["MODEL"],
-                "api_type": "groq",
-                "api_key": st.secrets["GROQ_API_KEY"],
-            }
-        ],
-        "temperature": 0.0,
-        "max_tokens": 2000,
-    },
+    llm_config=build_llm_config(
+        model=st.secrets["MODEL"],
+        api_key=st.secrets["GROQ_API_KEY"],
+        temperature=0.0,
+        max_tokens=2000,
+    ),
 )
+attach_pooled_client(review_agent)
 
 
@@ -1,6 +1,7 @@
 # Test Agent
 from autogen_agentchat.agents import AssistantAgent
 import streamlit as st
+from core.llm_client import build_llm_config, attach_pooled_client
 
 SYSTEM_MESSAGE = """
 You are a Senior QA Engineer.
@@ -46,18 +47,14 @@ CRITICAL OUTPUT RULES:
 test_agent = AssistantAgent(
     name="test_agent",
     system_message=SYSTEM_MESSAGE,
-    llm_config={
-        "config_list": [
-            {
-                "model": st.secrets["MODEL_BASIC"],
-                "api_type": "groq",
-                "api_key": st.secrets["GROQ_API_KEY"],
-            }
-        ],
-        "temperature": 0.0,
-        "max_tokens": 2000,
-    },
+    llm_config=build_llm_config(
+        model=st.secrets["MODEL_BASIC"],
+        api_key=st.secrets["GROQ_API_KEY"],
+        temperature=0.0,
+        max_tokens=2000,
+    ),
 )
+attach_pooled_client(test_agent)
 
 
 
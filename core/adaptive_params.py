@@ -0,0 +1,220 @@
+"""
+Adaptive Parameters
+Generation parameters and retry limits tuned from recorded agent calls.
+
+Every LLM call is recorded in the run store (agent, attempt, outcome, token
+usage, truncation). From an agent's most recent calls:
+- max_tokens is raised (up to 2x the agent's configured value) while
+  responses get cut off at the limit, and drifts back once they fit
+- temperature is halved while outputs keep failing the JSON format check
+- retry limits are cut to one more than the attempt by which almost every
+  eventual success happened (never above the configured limit)
+Agents without enough history keep their configured values.
+
+The same history gives a pre-run token and latency estimate for a requirement.
+"""
+import logging
+import os
+import statistics
+import threading
+import time
+from typing import Dict, List, Optional
+
+from core import run_store
+from core.llm_client import last_call
+from core.logging_config import current_run_id
+from core.similarity_index import find_similar_run, DRAFT_THRESHOLD
+
+logger = logging.getLogger(__name__)
+
+ADAPTIVE_PARAMS = os.getenv("ADAPTIVE_PARAMS", "1") != "0"
+MIN_SAMPLES = int(os.getenv("ADAPTIVE_MIN_SAMPLES", "20"))
+HISTORY_CALLS = 200
+CACHE_SECONDS = 60
+
+# Safe bounds
+MAX_TOKENS_CEILING = int(os.getenv("ADAPTIVE_MAX_TOKENS_CEILING", "8192"))
+MAX_TOKENS_GROWTH = 1.5
+MIN_RETRIES = 2
+
+TRUNCATION_THRESHOLD = 0.05
+FORMAT_ERROR_THRESHOLD = 0.2
+SUCCESS_COVERAGE = 0.95
+
+SUCCESS_OUTCOMES = ("ok", "approved", "forced")
+REVIEW_LOOP = "review_loop"
+
+_stats_lock = threading.Lock()
+_stats_cache = {}
+
+
+def agent_key(agent, fallback: Optional[str] = None) -> Optional[str]:
+    """Name calls of an agent are recorded under."""
+    return getattr(agent, "name", None) or fallback
+
+
+def record_call(agent_name: str, attempt: int, outcome: str, started: Optional[float] = None) -> None:
+    """
+    Record one call with the usage of the last LLM call made in this context.
+
+    Args:
+        agent_name: Agent name (see agent_key)
+        attempt: Attempt number within the retry loop
+        outcome: 'ok', 'format_error', 'error', 'approved', 'rejected', ...
+        started: time.monotonic() when the call started; None for outcomes
+            that are not a single LLM call (e.g. a whole review loop)
+    """
+    if started is None:
+        run_store.record_agent_call(current_run_id(), agent_name, attempt, outcome)
+        return
+    run_store.record_agent_call(
+        current_run_id(), agent_name, attempt, outcome,
+        usage=last_call(), latency_ms=(time.monotonic() - started) * 1000
+    )
+
+
+def _percentile(values: List[float], fraction: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def agent_stats(agent_name: str) -> Dict:
+    """
+    Output sizes, truncation and format-error rates and success-by-attempt of an agent.
+
+    Returns:
+        Dictionary with calls, truncation_rate, format_error_rate,
+        success_attempts (attempt numbers of successful calls),
+        p95_completion_tokens, max_tokens, mean_latency_ms and p90_latency_ms
+    """
+    with _stats_lock:
+        cached = _stats_cache.get(agent_name)
+        if cached and time.monotonic() - cached[0] < CACHE_SECONDS:
+            return cached[1]
+
+    rows = run_store.recent_agent_calls(agent_name, HISTORY_CALLS)
+    calls = len(rows)
+    completions = [r["completion_tokens"] for r in rows if r["completion_tokens"] is not None]
+    latencies = [r["latency_ms"] for r in rows if r["latency_ms"] is not None]
+    stats = {
+        "calls": calls,
+        "truncation_rate": sum(r["truncated"] for r in rows) / calls if calls else 0.0,
+        # Truncated outputs fail the format check too - that is max_tokens' problem, not temperature's
+        "format_error_rate": (
+            sum(1 for r in rows if r["outcome"] == "format_error" and not r["truncated"]) / calls if calls else 0.0
+        ),
+        "success_attempts": [r["attempt"] for r in rows if r["outcome"] in SUCCESS_OUTCOMES],
+        "p95_completion_tokens": _percentile(completions, 0.95),
+        "max_tokens": max((r["max_tokens"] for r in rows if r["max_tokens"]), default=None),
+        "mean_latency_ms": statistics.fmean(latencies) if latencies else None,
+        "p90_latency_ms": _percentile(latencies, 0.9),
+    }
+
+    with _stats_lock:
+        _stats_cache[agent_name] = (time.monotonic(), stats)
+    return stats
+
+
+def llm_params(agent) -> Dict:
+    """
+    Generation parameter overrides for an agent's next call (see llm_client.call_overrides).
+
+    Args:
+        agent: Agent built with build_llm_config()
+
+    Returns:
+        Dictionary with tuned max_tokens and/or temperature; empty when the
+        configured values stand
+    """
+    name = agent_key(agent)
+    if not ADAPTIVE_PARAMS or not name:
+        return {}
+    stats = agent_stats(name)
+    if stats["calls"] < MIN_SAMPLES:
+        return {}
+
+    config = getattr(agent, "llm_config", None) or {}
+    max_tokens, temperature = config.get("max_tokens"), config.get("temperature")
+    params = {}
+
+    if max_tokens:
+        current = max(max_tokens, stats["max_tokens"] or max_tokens)
+        if stats["truncation_rate"] > TRUNCATION_THRESHOLD:
+            target = current * MAX_TOKENS_GROWTH
+        elif stats["truncation_rate"] == 0 and stats["p95_completion_tokens"]:
+            target = min(current, stats["p95_completion_tokens"] * MAX_TOKENS_GROWTH)
+        else:
+            target = current
+        tuned = int(min(max(target, max_tokens), max(max_tokens, min(MAX_TOKENS_CEILING, 2 * max_tokens))))
+        if tuned != max_tokens:
+            params["max_tokens"] = tuned
+
+    if temperature and stats["format_error_rate"] > FORMAT_ERROR_THRESHOLD:
+        params["temperature"] = round(temperature / 2, 3) if temperature > 0.02 else 0.0
+
+    if params:
+        logger.debug(f"Tuned parameters for {name}: {params} ({stats})")
+    return params
+
+
+def retry_limit(agent_name: str, configured: int) -> int:
+    """
+    Retry limit for an agent's loop, from the attempts its successes needed.
+
+    Args:
+        agent_name: Agent name (or REVIEW_LOOP for review rounds)
+        configured: Hard-coded limit - the upper bound
+
+    Returns:
+        Number of attempts to allow
+    """
+    if not ADAPTIVE_PARAMS:
+        return configured
+    stats = agent_stats(agent_name)
+    attempts = sorted(stats["success_attempts"])
+    if stats["calls"] < MIN_SAMPLES or not attempts:
+        return configured
+
+    needed = attempts[min(len(attempts) - 1, int(SUCCESS_COVERAGE * len(attempts)))]
+    return max(min(MIN_RETRIES, configured), min(configured, needed + 1))
+
+
+def estimate_run(requirement: str, user_id: Optional[str] = None) -> Optional[Dict]:
+    """
+    Predict a requirement's token use and latency from earlier runs.
+
+    Uses the user's most similar earlier run when there is one, else the
+    recent succeeded runs of all users (as aggregates only).
+
+    Args:
+        requirement: Requirement text
+        user_id: User whose runs may serve as the similar run
+
+    Returns:
+        Dictionary with tokens, latency_s, latency_p90_s, basis and runs keys,
+        or None without history
+    """
+    recent = run_store.run_costs(limit=50)
+    if not recent:
+        return None
+    durations = [r["duration_ms"] / 1000 for r in recent if r["duration_ms"]]
+
+    similar = find_similar_run(requirement, DRAFT_THRESHOLD, user_id=user_id) if requirement.strip() else None
+    match = run_store.run_costs([similar["run_id"]]) if similar else []
+    if match:
+        basis = f"similar run {similar['run_id']} (similarity {similar['similarity']:.2f})"
+        tokens, latency = match[0]["tokens"], (match[0]["duration_ms"] or 0) / 1000
+    else:
+        basis = f"median of {len(recent)} recent runs"
+        tokens = statistics.median(r["tokens"] for r in recent)
+        latency = statistics.median(durations) if durations else None
+
+    return {
+        "tokens": int(tokens or 0),
+        "latency_s": latency,
+        "latency_p90_s": _percentile(durations, 0.9),
+        "basis": basis,
+        "runs": len(recent),
+    }
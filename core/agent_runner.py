@@ -1,6 +1,12 @@
 import logging
+import time
 from core.json_guard import safe_parse_json
 from core.schema_validator import validate_json
+from core.tracing import span
+from core.run_budget import current_budget
+from core.llm_client import call_overrides, reset_last_call
+from core.adaptive_params import agent_key, llm_params, record_call, retry_limit
+from core.hedging import hedged_reply
 
 logger = logging.getLogger(__name__)
 
@@ -15,27 +21,48 @@ def run_agent_json(
     """
     Universal, retry-safe agent runner.
     NEVER throws JSONRepairError or JSONDecodeError.
+
+    max_retries is an upper bound - agents whose history shows they succeed
+    earlier get fewer attempts (see core.adaptive_params).
     """
     logger.info(f"{'='*60}")
     logger.info(f"Starting {agent_name}")
     logger.info(f"{'='*60}")
-    logger.debug(f"Required keys: {required_keys}")
-    logger.debug(f"Input message length: {len(str(messages))} characters")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(f"Required keys: {required_keys}")
+        logger.debug(f"Input message length: {len(str(messages))} characters")
 
     last_error = None
+    budget = current_budget()
+    name = agent_key(agent, agent_name)
+    max_retries = retry_limit(name, max_retries)
+    params = llm_params(agent)
 
     for attempt in range(1, max_retries + 1):
+        if attempt > 1 and budget is not None and not budget.allow_retry(agent_name):
+            max_retries = attempt - 1
+            break
         logger.info(f"{agent_name} - Attempt {attempt}/{max_retries}")
         
+        reset_last_call()
+        call_started, tokens_before = time.monotonic(), budget.tokens_used if budget else 0
+        outcome = "error"
         try:
-            response = agent.generate_reply(messages=messages)
-            logger.debug(f"Agent response length: {len(response.get('content', ''))} characters")
-            
-            parsed = validate_json(
-                safe_parse_json(response["content"]),
-                required_keys
-            )
+            with span("agent.attempt", agent=agent_name, attempt=attempt):
+                with span("llm.wait", agent=agent_name), call_overrides(**params):
+                    response = hedged_reply(agent, messages, agent_name, required_keys)
+                    if budget is not None:
+                        budget.record_attempt(time.monotonic() - call_started, budget.tokens_used - tokens_before)
+                logger.debug(f"Agent response length: {len(response.get('content', ''))} characters")
+                outcome = "format_error"
+
+                with span("parse", agent=agent_name):
+                    parsed = validate_json(
+                        safe_parse_json(response["content"]),
+                        required_keys
+                    )
             
+            record_call(name, attempt, "ok", call_started)
             logger.info(f"✓ {agent_name} completed successfully")
             logger.debug(f"Output keys: {list(parsed.keys())}")
             
@@ -43,7 +70,8 @@ def run_agent_json(
 
         except Exception as e:
             last_error = e
-            logger.warning(f"✗ {agent_name} JSON error on attempt {attempt}: {str(e)}")
+            record_call(name, attempt, outcome, call_started)
+            logger.warning(f"✗ {agent_name} JSON error on attempt {attempt}: {e}")
             
             if attempt < max_retries:
                 logger.info(f"Retrying {agent_name}...")
@@ -0,0 +1,156 @@
+"""
+Artifact
+Compact, read-mostly representation of one generated file.
+
+- Holds UTF-8 bytes (or, until first use, the base64 text the agent returned),
+  so decoding only happens for files something actually reads.
+- Once saved to the artifact store, the in-memory bytes are released and
+  later reads go back to the store (see mark_saved).
+- Supports the read-only dict interface used across the pipeline
+  (f["path"], f["content"], f.get(...)), so artifacts and plain dicts loaded
+  from the run store can be mixed freely.
+- repr() shows only path and size; prompt text is built with prompt_text.
+"""
+import hashlib
+import io
+from typing import Any, BinaryIO, Dict, Optional
+
+from core import artifact_store
+from core.base64_utils import safe_b64decode_bytes
+
+
+class Artifact:
+    __slots__ = ("path", "_encoded", "_data", "_digest", "_size")
+
+    def __init__(self, path: str, data: Optional[bytes] = None, encoded: Optional[str] = None):
+        self.path = path
+        self._encoded = encoded
+        self._data = data
+        self._digest = None
+        self._size = None if data is None else len(data)
+
+    @classmethod
+    def from_base64(cls, path: str, encoded: str) -> "Artifact":
+        """Artifact whose content is decoded on first access."""
+        return cls(path, encoded=encoded)
+
+    @classmethod
+    def from_dict(cls, item: Dict[str, Any]) -> "Artifact":
+        """Artifact from an agent file entry ({path, content_base64}) or a stored one ({path, content})."""
+        if isinstance(item, cls):
+            return item
+        if "content_base64" in item:
+            return cls.from_base64(item.get("path", ""), item["content_base64"])
+        return cls(item.get("path", ""), data=item.get("content", "").encode("utf-8"))
+
+    # Content access
+
+    @property
+    def data(self) -> bytes:
+        data = self._data
+        if data is not None:
+            return data
+        if self._encoded is not None:
+            data = safe_b64decode_bytes(self._encoded)
+            self._data, self._encoded, self._size = data, None, len(data)
+            return data
+        if self._digest is not None:
+            data = artifact_store.get_blob(self._digest)
+            if data is not None:
+                return data
+        return b""
+
+    @property
+    def content(self) -> str:
+        return self.data.decode("utf-8", errors="replace")
+
+    @property
+    def digest(self) -> str:
+        if self._digest is None:
+            self._digest = hashlib.sha256(self.data).hexdigest()
+        return self._digest
+
+    @property
+    def size(self) -> int:
+        if self._size is None:
+            self._size = len(self.data)
+        return self._size
+
+    def open(self) -> BinaryIO:
+        """Binary stream over the content - the store copy once saved, memory before."""
+        if self._data is None and self._encoded is None and self._digest is not None:
+            stream = artifact_store.open_blob(self._digest)
+            if stream is not None:
+                return stream
+        return io.BytesIO(self.data)
+
+    def mark_saved(self, digest: str) -> None:
+        """Record that the content is in the artifact store and drop the in-memory copy."""
+        if self._size is None:
+            self._size = len(self.data)
+        self._digest = digest
+        self._data = None
+        self._encoded = None
+
+    # Read-only dict interface
+
+    _KEYS = ("path", "content")
+
+    def __getitem__(self, key: str) -> Any:
+        if key == "path":
+            return self.path
+        if key == "content":
+            return self.content
+        raise KeyError(key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self[key] if key in self._KEYS else default
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._KEYS
+
+    def keys(self):
+        return self._KEYS
+
+    def to_dict(self) -> Dict[str, str]:
+        return {"path": self.path, "content": self.content}
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, Artifact):
+            return self.path == other.path and self.digest == other.digest
+        if isinstance(other, dict):
+            return self.to_dict() == other
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        # Never decode or read the store just to log/format an artifact;
+        # prompts get the content through prompt_text()
+        size = "?" if self._size is None else self._size
+        return f"Artifact({self.path!r}, {size} bytes)"
+
+
+def to_artifacts(items) -> list:
+    """Convert a list of agent/stored file entries into Artifacts."""
+    return [Artifact.from_dict(item) for item in items]
+
+
+def prompt_text(files) -> str:
+    """
+    Render files as "### path" + content blocks for an agent prompt.
+
+    Args:
+        files: {path, content} mappings or Artifacts
+
+    Returns:
+        Prompt text with the full content of every file
+    """
+    return "\n\n".join(f"### {f['path']}\n{f['content']}" for f in files)
+
+
+def json_default(obj: Any) -> Any:
+    """json.dumps default hook for stage outputs containing Artifacts."""
+    if isinstance(obj, Artifact):
+        return obj.to_dict()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
@@ -0,0 +1,155 @@
+"""
+Artifact Store
+Content-addressed blob store shared by all generated projects.
+
+Layout under generated/.store/:
+    objects/{hh}/{sha256}    zlib-compressed blob
+
+Identical files across projects and reruns are stored (and written) once, in
+compressed form only. Project trees get ordinary, writable copies decompressed
+out of the store, and readers stream blobs without decompressing them whole
+(open_blob).
+"""
+import hashlib
+import io
+import logging
+import os
+import shutil
+import uuid
+import zlib
+from pathlib import Path
+from typing import BinaryIO, Optional
+
+logger = logging.getLogger(__name__)
+
+STORE_DIR = Path(__file__).parent.parent / "generated" / ".store"
+OBJECTS_DIR = STORE_DIR / "objects"
+
+COMPRESSION_LEVEL = 6
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _sharded(root: Path, digest: str) -> Path:
+    return root / digest[:2] / digest
+
+
+def _atomic_write(path: Path, data: bytes) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.{uuid.uuid4().hex[:8]}.tmp")
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+class _BlobReader(io.RawIOBase):
+    """Decompresses a stored blob chunk by chunk as it is read."""
+
+    def __init__(self, compressed: BinaryIO):
+        self._compressed = compressed
+        self._decompressor = zlib.decompressobj()
+        self._pending = b""
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        while not self._pending:
+            if self._decompressor.eof:
+                return 0
+            chunk = self._decompressor.unconsumed_tail or self._compressed.read(STREAM_CHUNK_SIZE)
+            if not chunk:
+                self._pending = self._decompressor.flush()
+                if not self._pending:
+                    return 0
+                break
+            self._pending = self._decompressor.decompress(chunk, len(buffer))
+        size = min(len(buffer), len(self._pending))
+        buffer[:size] = self._pending[:size]
+        self._pending = self._pending[size:]
+        return size
+
+    def close(self) -> None:
+        self._compressed.close()
+        super().close()
+
+
+def has_blob(digest: str) -> bool:
+    return _sharded(OBJECTS_DIR, digest).is_file()
+
+
+def put_blob(data: bytes) -> str:
+    """
+    Store bytes in the blob store (no-op if already present).
+
+    Args:
+        data: Raw file content
+
+    Returns:
+        sha256 hex digest of the content
+    """
+    digest = content_hash(data)
+    blob_path = _sharded(OBJECTS_DIR, digest)
+
+    if not blob_path.is_file():
+        _atomic_write(blob_path, zlib.compress(data, COMPRESSION_LEVEL))
+        logger.debug(f"Stored new blob {digest[:12]} ({len(data)} bytes)")
+
+    return digest
+
+
+def get_blob(digest: str) -> Optional[bytes]:
+    """
+    Read a blob by hash.
+
+    Args:
+        digest: sha256 hex digest
+
+    Returns:
+        Decompressed content, or None if the blob is unknown or corrupt
+    """
+    try:
+        return zlib.decompress(_sharded(OBJECTS_DIR, digest).read_bytes())
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.error(f"✗ Could not read blob {digest[:12]}: {str(e)}")
+        return None
+
+
+def open_blob(digest: str) -> Optional[BinaryIO]:
+    """
+    Open a blob for streaming reads - decompressed as it is read, never whole.
+
+    Args:
+        digest: sha256 hex digest
+
+    Returns:
+        Binary file object (close it, or use it as a context manager), or None
+        if the blob is unknown
+    """
+    try:
+        compressed = open(_sharded(OBJECTS_DIR, digest), 'rb')
+    except FileNotFoundError:
+        return None
+    return io.BufferedReader(_BlobReader(compressed), STREAM_CHUNK_SIZE)
+
+
+def materialize(digest: str, destination: Path) -> None:
+    """
+    Write a blob to destination as an ordinary (writable) file, decompressing
+    it in chunks.
+
+    Args:
+        digest: sha256 hex digest
+        destination: Target file path (parent must exist)
+    """
+    source = open_blob(digest)
+    if source is None:
+        raise FileNotFoundError(f"Unknown artifact {digest}")
+
+    with source, open(destination, 'wb') as f:
+        shutil.copyfileobj(source, f, STREAM_CHUNK_SIZE)
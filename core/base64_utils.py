@@ -4,18 +4,17 @@ import io
 import binascii
 import re
 
-def safe_b64decode(data: str) -> str:
+def safe_b64decode_bytes(data: str) -> bytes:
     """
-    Absolutely safe base64 decoder for LLM output.
+    Absolutely safe base64 decoder for LLM output, returning raw bytes.
     - Never throws
     - Handles missing padding
     - Handles non-base64 garbage
     - Handles gzip
-    - Handles invalid UTF-8
     """
 
     if not isinstance(data, str) or not data.strip():
-        return ""
+        return b""
 
     try:
         # Strip common wrappers
@@ -35,16 +34,26 @@ def safe_b64decode(data: str) -> str:
         # GZIP detection
         if raw[:2] == b"\x1f\x8b":
             try:
-                return gzip.GzipFile(fileobj=io.BytesIO(raw)).read().decode(
-                    "utf-8", errors="replace"
-                )
+                return gzip.GzipFile(fileobj=io.BytesIO(raw)).read()
             except Exception:
                 pass
 
-        return raw.decode("utf-8", errors="replace")
+        return raw
 
     except binascii.Error:
-        return ""
+        return b""
 
     except Exception:
-        return ""
+        return b""
+
+
+def safe_b64decode(data: str) -> str:
+    """
+    Absolutely safe base64 decoder for LLM output.
+    - Never throws
+    - Handles missing padding
+    - Handles non-base64 garbage
+    - Handles gzip
+    - Handles invalid UTF-8
+    """
+    return safe_b64decode_bytes(data).decode("utf-8", errors="replace")
@@ -0,0 +1,360 @@
+"""
+Component Code Generation
+Planned, per-component code generation for architectures with several components.
+
+1. Plan: every architecture component becomes a module (app/{component}.py)
+   with a primary export; data models get app/models.py and the entry point
+   app/main.py. The plan is the interface contract shared by all calls.
+2. Generate: each module is produced by its own coding + review loop, all
+   running concurrently, so stage latency follows the largest component and
+   project size is not capped by a single response.
+3. Stitch: the merged files are parsed with ast and every import between
+   generated modules is checked; modules with broken imports get one repair
+   round with the problems as review feedback.
+"""
+import ast
+import contextvars
+import logging
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import PurePosixPath
+from typing import Dict, List, Optional, Set
+
+from core.artifact import Artifact
+from core.retry_loop import generate_with_review
+from core.tracing import span
+
+logger = logging.getLogger(__name__)
+
+# "single" (default) generates the project in one coding + review loop; "planned" always plans; "auto"
+# plans architectures with at least PLANNED_MIN_COMPONENTS components. Planned generation runs one loop
+# per module (components + models + main), each prompt carrying the whole architecture and module plan,
+# so it costs roughly (components + 2)x the calls and prompt tokens of "single", plus repair rounds -
+# worth it only when a single response cannot hold the project.
+CODEGEN_MODE = os.getenv("CODEGEN_MODE", "single")
+PLANNED_MIN_COMPONENTS = int(os.getenv("PLANNED_MIN_COMPONENTS", "8"))
+CODEGEN_WORKERS = int(os.getenv("CODEGEN_WORKERS", "4"))
+PACKAGE = "app"
+
+_codegen_pool = ThreadPoolExecutor(max_workers=CODEGEN_WORKERS, thread_name_prefix="codegen")
+
+_WORD_RE = re.compile(r"[A-Z]+(?![a-z])|[A-Za-z][a-z0-9]*|\d+")
+
+
+def _component_name(component) -> str:
+    return component.get("name", "") if isinstance(component, dict) else str(component)
+
+
+def _snake(name: str) -> str:
+    return "_".join(w.lower() for w in _WORD_RE.findall(name)) or "component"
+
+
+def _camel(name: str) -> str:
+    return "".join(w.capitalize() for w in _WORD_RE.findall(name)) or "Component"
+
+
+def use_planned_generation(architecture: Dict) -> bool:
+    """Whether the code stage should generate per component."""
+    if CODEGEN_MODE == "single":
+        return False
+    if CODEGEN_MODE == "planned":
+        return True
+    return len(architecture.get("components", [])) >= PLANNED_MIN_COMPONENTS
+
+
+def build_module_plan(architecture: Dict) -> List[Dict]:
+    """
+    Turn architecture components into a module plan.
+
+    Args:
+        architecture: Design stage output
+
+    Returns:
+        List of modules with 'component', 'path', 'exports' and 'description' keys
+    """
+    plan = []
+    taken = set()
+    for component in architecture.get("components", []):
+        name = _component_name(component)
+        snake = _snake(name)
+        while f"{snake}.py" in taken or snake in ("models", "main"):
+            snake += "_component"
+        taken.add(f"{snake}.py")
+        plan.append({
+            "component": name,
+            "path": f"{PACKAGE}/{snake}.py",
+            "exports": [_camel(name)],
+            "description": component if isinstance(component, dict) else {"name": name},
+        })
+
+    model_names = [
+        model.get("name") if isinstance(model, dict) else str(model)
+        for model in architecture.get("data_models", [])
+    ]
+    plan.append({
+        "component": "Data Models",
+        "path": f"{PACKAGE}/models.py",
+        "exports": [_camel(n) for n in model_names if n],
+        "description": {"data_models": architecture.get("data_models", [])},
+    })
+    plan.append({
+        "component": "Application Entry Point",
+        "path": f"{PACKAGE}/main.py",
+        "exports": ["main"],
+        "description": {
+            "purpose": "Wire the components together and expose the application entry point",
+            "apis": architecture.get("apis", []),
+        },
+    })
+    return plan
+
+
+def _contract(plan: List[Dict]) -> List[Dict]:
+    return [{"component": m["component"], "path": m["path"], "exports": m["exports"]} for m in plan]
+
+
+def _module_prompt(architecture: Dict, plan: List[Dict], module: Dict) -> Dict:
+    private_dir = str(PurePosixPath(module["path"]).with_suffix(""))
+    return {
+        "architecture": architecture,
+        "module_plan": _contract(plan),
+        "your_task": {
+            "component": module["component"],
+            "details": module["description"],
+            "path": module["path"],
+            "must_export": module["exports"],
+            "instructions": (
+                f"Generate ONLY {module['path']} (plus optional private helpers under {private_dir}/). "
+                f"It must define {', '.join(module['exports']) or 'the component logic'} at module level. "
+                "Import other components only from their module_plan paths and exports. "
+                "Do not output files owned by other components. "
+                "The minimum file count and line rules do not apply to this single-component task."
+            ),
+        },
+    }
+
+
+def _owned_by(path: str, module: Dict) -> bool:
+    private_dir = str(PurePosixPath(module["path"]).with_suffix("")) + "/"
+    return path == module["path"] or path.startswith(private_dir)
+
+
+def _generate_module(architecture, plan, module, coding_agent, review_agent, feedback=None) -> Dict:
+    """
+    Generate one planned module.
+
+    Returns:
+        Dictionary with the module's 'files', the 'discarded' paths it output
+        outside its plan entry, and an 'error' when it produced no usable module
+    """
+    with span("codegen.component", component=module["component"]):
+        code = generate_with_review(
+            _module_prompt(architecture, plan, module), coding_agent, review_agent, initial_feedback=feedback
+        )
+    if "error" in code:
+        return {"files": [], "discarded": [], "error": code["error"]}
+
+    files = [f for f in code.get("files", []) if _owned_by(f["path"], module)]
+    discarded = [f["path"] for f in code.get("files", []) if not _owned_by(f["path"], module)]
+    if discarded:
+        logger.warning(f"✗ {module['component']}: discarded files outside its plan entry: {discarded}")
+    result = {"files": files, "discarded": discarded}
+    if not any(f["path"] == module["path"] for f in files):
+        result["error"] = f"did not generate {module['path']}"
+    return result
+
+
+# Stitching
+
+def _module_path(module_name: str, paths: Set[str]) -> Optional[str]:
+    base = module_name.replace(".", "/")
+    for candidate in (f"{base}.py", f"{base}/__init__.py"):
+        if candidate in paths:
+            return candidate
+    return None
+
+
+def _top_level_names(tree: ast.Module) -> Set[str]:
+    names = set()
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            names.add(node.name)
+        elif isinstance(node, (ast.Assign, ast.AnnAssign)):
+            targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+            for target in targets:
+                names.update(n.id for n in ast.walk(target) if isinstance(n, ast.Name))
+        elif isinstance(node, (ast.Import, ast.ImportFrom)):
+            names.update((alias.asname or alias.name).split(".")[0] for alias in node.names)
+    return names
+
+
+def check_imports(files: List) -> Dict[str, List[str]]:
+    """
+    Verify imports between generated modules.
+
+    Args:
+        files: Generated files ({path, content} mappings or Artifacts)
+
+    Returns:
+        Dictionary of file path -> list of problems (empty when everything resolves)
+    """
+    sources = {f["path"]: f["content"] for f in files if f["path"].endswith(".py")}
+    paths = set(sources)
+    roots = {p.split("/")[0] for p in paths if "/" in p} | {PurePosixPath(p).stem for p in paths if "/" not in p}
+
+    trees, problems = {}, {}
+    for path, source in sources.items():
+        try:
+            trees[path] = ast.parse(source, filename=path)
+        except SyntaxError as e:
+            problems.setdefault(path, []).append(f"SyntaxError at line {e.lineno}: {e.msg}")
+
+    exported = {path: _top_level_names(tree) for path, tree in trees.items()}
+
+    for path, tree in trees.items():
+        package = ".".join(PurePosixPath(path).parent.parts)
+        for node in ast.walk(tree):
+            if isinstance(node, ast.ImportFrom):
+                if node.level:
+                    parent = package.split(".") if package else []
+                    parent = parent[:len(parent) - (node.level - 1)] if node.level > 1 else parent
+                    module_name = ".".join(parent + ([node.module] if node.module else []))
+                else:
+                    module_name = node.module or ""
+                if module_name.split(".")[0] not in roots:
+                    continue  # stdlib / third-party
+                target = _module_path(module_name, paths)
+                if target is None:
+                    # "from app import auth" - the names may be submodules
+                    missing_modules = [
+                        a.name for a in node.names
+                        if _module_path(f"{module_name}.{a.name}", paths) is None
+                    ]
+                    if missing_modules:
+                        problems.setdefault(path, []).append(f"imports missing module {module_name}")
+                    continue
+                for alias in node.names:
+                    if alias.name == "*" or alias.name in exported.get(target, set()):
+                        continue
+                    if _module_path(f"{module_name}.{alias.name}", paths):
+                        continue
+                    problems.setdefault(path, []).append(
+                        f"imports {alias.name} from {module_name}, which {target} does not define"
+                    )
+            elif isinstance(node, ast.Import):
+                for alias in node.names:
+                    if alias.name.split(".")[0] in roots and _module_path(alias.name, paths) is None:
+                        problems.setdefault(path, []).append(f"imports missing module {alias.name}")
+
+    return problems
+
+
+def _ensure_packages(files: List) -> List:
+    """Add empty __init__.py files for generated packages that lack one."""
+    paths = {f["path"] for f in files}
+    packages = {
+        str(PurePosixPath(*PurePosixPath(p).parts[:i])) for p in paths if p.endswith(".py")
+        for i in range(1, len(PurePosixPath(p).parts))
+    }
+    missing = sorted(f"{pkg}/__init__.py" for pkg in packages if f"{pkg}/__init__.py" not in paths)
+    return list(files) + [Artifact(path, data=b"") for path in missing]
+
+
+def generate_planned(architecture: Dict, coding_agent, review_agent) -> Dict:
+    """
+    Generate code component by component and stitch the result.
+
+    Args:
+        architecture: Design stage output
+        coding_agent: Agent producing the files
+        review_agent: Agent reviewing them
+
+    Returns:
+        Dictionary with 'files' (like generate_with_review) plus 'module_plan',
+        'stitch_problems' and 'discarded_files'; or 'error' and 'module_errors'
+        when a module could not be generated
+    """
+    plan = build_module_plan(architecture)
+    logger.info(f"Planned code generation: {len(plan)} modules, {CODEGEN_WORKERS} concurrent calls")
+
+    futures = [
+        _codegen_pool.submit(
+            contextvars.copy_context().run,
+            _generate_module, architecture, plan, module, coding_agent, review_agent
+        )
+        for module in plan
+    ]
+    results = []
+    for future in futures:
+        try:
+            results.append(future.result())
+        except Exception as e:
+            results.append({"files": [], "discarded": [], "error": str(e)})
+    module_errors = {
+        plan[idx]["component"]: result["error"] for idx, result in enumerate(results) if "error" in result
+    }
+    if module_errors:
+        logger.error(f"✗ Planned code generation failed for {len(module_errors)}/{len(plan)} modules: {module_errors}")
+        return {
+            "error": f"Code generation failed for modules: {', '.join(module_errors)}",
+            "module_errors": module_errors,
+            "module_plan": _contract(plan),
+        }
+    module_files = [result["files"] for result in results]
+    discarded = {
+        plan[idx]["component"]: result["discarded"] for idx, result in enumerate(results) if result["discarded"]
+    }
+
+    def merged():
+        return _ensure_packages([f for files in module_files for f in files])
+
+    with span("codegen.stitch"):
+        problems = check_imports(merged())
+
+    broken = [
+        idx for idx, module in enumerate(plan)
+        if any(_owned_by(path, module) for path in problems)
+    ]
+    if broken:
+        logger.warning(f"✗ Stitching found import problems in {len(broken)} modules - repairing")
+        repairs = {}
+        for idx in broken:
+            issues = [p for path, items in problems.items() if _owned_by(path, plan[idx]) for p in items]
+            feedback = {
+                "status": "REJECTED",
+                "issues": issues,
+                "suggested_fixes": ["Only import names that the module plan lists as exports, and define every export."],
+            }
+            repairs[idx] = _codegen_pool.submit(
+                contextvars.copy_context().run,
+                _generate_module, architecture, plan, plan[idx], coding_agent, review_agent, feedback
+            )
+        for idx, future in repairs.items():
+            try:
+                repaired = future.result()
+            except Exception as e:
+                logger.warning(f"✗ Repair of {plan[idx]['component']} failed: {str(e)}")
+                continue
+            if "error" in repaired:
+                # Keep the original module; its import problems stay in stitch_problems
+                logger.warning(f"✗ Repair of {plan[idx]['component']} failed: {repaired['error']}")
+                continue
+            module_files[idx] = repaired["files"]
+            if repaired["discarded"]:
+                discarded[plan[idx]["component"]] = repaired["discarded"]
+        with span("codegen.stitch", repair=True):
+            problems = check_imports(merged())
+
+    files = merged()
+    if problems:
+        logger.warning(f"✗ Unresolved imports after stitching: {problems}")
+    else:
+        logger.info(f"✓ Stitched {len(files)} files - all cross-module imports resolve")
+
+    return {
+        "files": files,
+        "module_plan": _contract(plan),
+        "stitch_problems": problems,
+        "discarded_files": discarded,
+    }
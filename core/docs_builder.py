@@ -0,0 +1,238 @@
+"""
+Docs Builder
+Renders project documentation from structured pipeline data.
+
+README.md, ARCHITECTURE.md and API.md are assembled locally from the
+requirements, the architecture and the generated code (module docstrings,
+signatures, web routes). The documentation agent only writes the short
+narrative parts - an overview, how the components work together, and how to
+use the project - as plain JSON strings, so the docs stage costs a few hundred
+output tokens instead of base64-encoding every document.
+Without a narrative (agent failure, exhausted run budget) the documents are
+complete, just terser.
+"""
+import ast
+import json
+import logging
+import re
+from typing import Dict, Iterable, List, Optional
+
+from core.artifact import Artifact
+from core.symbol_index import build_symbol_index
+
+logger = logging.getLogger(__name__)
+
+NARRATIVE_KEYS = ["overview", "architecture", "usage"]
+NARRATIVE_MAX_CHARS = 1500
+
+HTTP_METHODS = ("GET", "POST", "PUT", "PATCH", "DELETE", "HEAD", "OPTIONS")
+_ENDPOINT_RE = re.compile(rf"^\s*({'|'.join(HTTP_METHODS)})\s+(\S+)\s*(?:[-:–—]\s*)?(.*)$", re.IGNORECASE)
+
+
+def _item_text(item) -> str:
+    """One architecture/requirements entry as text - entries may be strings or objects."""
+    if isinstance(item, dict):
+        name = item.get("name") or item.get("title") or ""
+        detail = item.get("purpose") or item.get("description") or ""
+        if name and detail:
+            return f"**{name}**: {detail}"
+        return name or detail or json.dumps(item)
+    return str(item)
+
+
+def _bullets(items) -> List[str]:
+    return [f"- {_item_text(item)}" for item in items or []] or ["- _None specified_"]
+
+
+def _cell(text) -> str:
+    return str(text).replace("|", "\\|").replace("\n", " ").strip()
+
+
+def _endpoint(item) -> Optional[Dict[str, str]]:
+    if isinstance(item, dict):
+        path = item.get("path") or item.get("endpoint") or item.get("route")
+        if not path:
+            return None
+        method = item.get("method", "")
+        match = _ENDPOINT_RE.match(str(path))
+        if match and not method:
+            method, path = match.group(1), match.group(2)
+        return {"method": str(method).upper(), "path": str(path), "description": item.get("description") or item.get("purpose") or ""}
+    match = _ENDPOINT_RE.match(str(item))
+    if match:
+        return {"method": match.group(1).upper(), "path": match.group(2), "description": match.group(3)}
+    return None
+
+
+def _routes(files: Iterable) -> List[Dict[str, str]]:
+    """Web routes declared in the generated code (@app.get(...), @router.post(...), @app.route(...))."""
+    routes = []
+    for f in files:
+        path = f["path"]
+        if not path.endswith(".py"):
+            continue
+        try:
+            tree = ast.parse(f["content"], filename=path)
+        except SyntaxError:
+            continue
+        for node in ast.walk(tree):
+            if not isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                continue
+            for decorator in node.decorator_list:
+                if not (isinstance(decorator, ast.Call) and isinstance(decorator.func, ast.Attribute)):
+                    continue
+                verb = decorator.func.attr.upper()
+                if verb not in HTTP_METHODS + ("ROUTE",) or not decorator.args:
+                    continue
+                if not isinstance(decorator.args[0], ast.Constant):
+                    continue
+                methods = [verb]
+                if verb == "ROUTE":
+                    methods = ["GET"]
+                    for keyword in decorator.keywords:
+                        if keyword.arg == "methods" and isinstance(keyword.value, (ast.List, ast.Tuple)):
+                            methods = [str(e.value).upper() for e in keyword.value.elts if isinstance(e, ast.Constant)]
+                doc = (ast.get_docstring(node) or "").strip().splitlines()
+                for method in methods:
+                    routes.append({
+                        "method": method,
+                        "path": str(decorator.args[0].value),
+                        "handler": f"{path}::{node.name}",
+                        "description": doc[0] if doc else "",
+                    })
+    return routes
+
+
+def _narrative(narrative: Optional[Dict], key: str) -> Optional[str]:
+    if not narrative:
+        return None
+    text = narrative.get(key)
+    if not isinstance(text, str) or not text.strip():
+        return None
+    text = text.strip()
+    return text if len(text) <= NARRATIVE_MAX_CHARS else text[:NARRATIVE_MAX_CHARS].rsplit(" ", 1)[0] + " ..."
+
+
+def _readme(project_name: str, req: Dict, arch: Dict, files: List, index: Dict, narrative: Optional[Dict]) -> str:
+    functional = req.get("functional_requirements", [])
+    overview = _narrative(narrative, "overview") or (
+        f"{project_name} implements {len(functional)} functional requirements across "
+        f"{len(arch.get('components', []))} components."
+    )
+    entry_module = next((e["module"] for p, e in index.items() if p.endswith("main.py")), None)
+    requirements = next((f["path"] for f in files if f["path"].endswith("requirements.txt")), None)
+    usage = _narrative(narrative, "usage")
+
+    lines = [f"# {project_name}", "", overview, "", "## Features", *_bullets(functional), ""]
+    lines += ["## Requirements", *_bullets(req.get("non_functional_requirements", []) + req.get("constraints", [])), ""]
+    lines += ["## Getting Started", ""]
+    if usage:
+        lines += [usage, ""]
+    lines += [
+        "```bash",
+        *([f"pip install -r src/{requirements}"] if requirements else []),
+        *([f"PYTHONPATH=src python -m {entry_module}"] if entry_module else []),
+        "PYTHONPATH=src python -m pytest tests",
+        "```",
+        "",
+        "Container setup (when generated) is under `deploy/`: `sh deploy/run.sh`.",
+        "",
+        "## Project Layout",
+    ]
+    lines += [f"- `src/{path}`" + (f" - {entry['doc']}" if entry["doc"] else "") for path, entry in sorted(index.items())]
+    lines += ["", "See [ARCHITECTURE.md](ARCHITECTURE.md) and [API.md](API.md) for details.", ""]
+    return "\n".join(lines)
+
+
+def _architecture(project_name: str, req: Dict, arch: Dict, narrative: Optional[Dict]) -> str:
+    lines = [f"# {project_name} Architecture", ""]
+    summary = _narrative(narrative, "architecture")
+    if summary:
+        lines += [summary, ""]
+    for title, key in (
+        ("Components", "components"),
+        ("Data Models", "data_models"),
+        ("Security", "security"),
+        ("Infrastructure", "infrastructure"),
+        ("Scalability", "scalability_considerations"),
+    ):
+        lines += [f"## {title}", *_bullets(arch.get(key, [])), ""]
+    lines += ["## Edge Cases", *_bullets(req.get("edge_cases", [])), ""]
+    return "\n".join(lines)
+
+
+def _api(project_name: str, arch: Dict, files: List, index: Dict) -> str:
+    lines = [f"# {project_name} API Reference", ""]
+
+    endpoints = [e for e in (_endpoint(item) for item in arch.get("apis", [])) if e]
+    others = [item for item in arch.get("apis", []) if _endpoint(item) is None]
+    if endpoints or others:
+        lines += ["## Endpoints (design)", ""]
+    if endpoints:
+        lines += ["| Method | Path | Description |", "| --- | --- | --- |"]
+        lines += [f"| {_cell(e['method'])} | `{_cell(e['path'])}` | {_cell(e['description'])} |" for e in endpoints]
+        lines.append("")
+    if others:
+        lines += [f"- {_item_text(item)}" for item in others] + [""]
+
+    routes = _routes(files)
+    if routes:
+        lines += ["## Routes (implemented)", "", "| Method | Path | Handler | Description |", "| --- | --- | --- | --- |"]
+        lines += [
+            f"| {r['method']} | `{_cell(r['path'])}` | `{_cell(r['handler'])}` | {_cell(r['description'])} |"
+            for r in routes
+        ]
+        lines.append("")
+
+    lines += ["## Python Modules", ""]
+    for path, entry in sorted(index.items()):
+        if not (entry["doc"] or entry.get("error") or entry["classes"] or entry["functions"]):
+            continue
+        lines += [f"### `{entry['module'] or path}`", ""]
+        if entry["doc"]:
+            lines += [entry["doc"], ""]
+        if entry.get("error"):
+            lines += [f"_Could not be parsed: {entry['error']}_", ""]
+        for cls in entry["classes"]:
+            lines.append(f"- `class {cls['name']}`" + (f" - {cls['doc']}" if cls["doc"] else ""))
+            lines += [f"  - `{m['signature']}`" + (f" - {m['doc']}" if m["doc"] else "") for m in cls["methods"]]
+        lines += [f"- `{fn['signature']}`" + (f" - {fn['doc']}" if fn["doc"] else "") for fn in entry["functions"]]
+        lines.append("")
+    return "\n".join(lines)
+
+
+def build_docs(project_name: str, req: Dict, arch: Dict, files: Iterable, narrative: Optional[Dict] = None) -> List[Artifact]:
+    """
+    Render README.md, ARCHITECTURE.md and API.md.
+
+    Args:
+        project_name: Name of the project
+        req: Requirements from the requirements stage
+        arch: Architecture from the design stage
+        files: Generated source files ({path, content} mappings or Artifacts)
+        narrative: Narrative sections from the documentation agent (NARRATIVE_KEYS), if any
+
+    Returns:
+        List of Artifacts
+    """
+    files = list(files)
+    index = build_symbol_index(files)
+    documents = {
+        "README.md": _readme(project_name, req, arch, files, index, narrative),
+        "ARCHITECTURE.md": _architecture(project_name, req, arch, narrative),
+        "API.md": _api(project_name, arch, files, index),
+    }
+    logger.debug(f"Rendered docs locally: { {path: len(text) for path, text in documents.items()} }")
+    return [Artifact(path, data=text.encode("utf-8")) for path, text in documents.items()]
+
+
+def narrative_prompt(project_name: str, req: Dict, arch: Dict) -> str:
+    """Compact input for the documentation agent - only what the narrative needs."""
+    summary = {
+        "project": project_name,
+        "functional_requirements": req.get("functional_requirements", []),
+        "components": arch.get("components", []),
+        "apis": arch.get("apis", []),
+        "infrastructure": arch.get("infrastructure", []),
+    }
+    return json.dumps(summary, default=str)
@@ -1,94 +1,555 @@
 """
 File Saver Utility
-Saves generated files to the proper directory structure: generated/{project_name}/{type}/
+Saves generated files to per-run workspaces: generated/{project_name}/runs/{run_id}/{type}/
+
+Every pipeline run writes into its own workspace, so concurrent runs of the
+same project never touch each other's files. A finished run is published by
+atomically replacing the project's latest.json pointer (under a file lock);
+readers that ask for "the project" get the published run's manifest.
+
+File contents go to the content-addressed store (core/artifact_store.py) and
+each run workspace keeps a manifest (manifest.json) of path -> sha256 per
+file type. Trees are materialized from the store into a versioned directory,
+then published by atomically repointing the {type} symlink at it, so readers
+never see a half-written or missing tree.
+
+Projects saved before per-run workspaces keep their generated/{project_name}/
+tree and manifest, which stay readable until a run is published.
 """
+import contextvars
+import json
 import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
 from pathlib import Path
-from typing import List, Dict
+from typing import BinaryIO, List, Dict, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows - publishing is serialized within this process only
+    fcntl = None
+
+from core import artifact_store
+from core.artifact import Artifact
+from core.logging_config import current_run_id
+from core.tracing import span
 
 logger = logging.getLogger(__name__)
 
+GENERATED_DIR = Path(__file__).parent.parent / "generated"
+MANIFEST_NAME = "manifest.json"
+RUNS_DIRNAME = "runs"
+LATEST_NAME = "latest.json"
+LOCK_NAME = ".lock"
+FILE_TYPES = ('src', 'tests', 'docs', 'deploy')
+WRITE_WORKERS = 8
+
+# Workspaces of unpublished runs beyond the newest RUN_WORKSPACES_KEEP are removed on publish,
+# once untouched for STALE_WORKSPACE_SECONDS (so in-progress runs are never pruned)
+RUN_WORKSPACES_KEEP = int(os.getenv("RUN_WORKSPACES_KEEP", "20"))
+STALE_WORKSPACE_SECONDS = 3600
+
+# Writes file contents inside one save
+_write_pool = ThreadPoolExecutor(max_workers=WRITE_WORKERS, thread_name_prefix="file-writer")
+# Runs whole saves in the background so the pipeline can move on to the next stage
+_save_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="file-saver")
+# Saves of different file types update the same run manifest
+_manifest_lock = threading.Lock()
+# flock() does not exclude threads of the same process sharing it
+_publish_lock = threading.Lock()
+
+
+def _write_file(full_path: Path, content: str) -> None:
+    with open(full_path, 'w', encoding='utf-8') as f:
+        f.write(content)
+
+
+def _write_file_bytes(full_path: Path, data: bytes) -> None:
+    with open(full_path, 'wb') as f:
+        f.write(data)
+
+
+def _write_json_atomic(path: Path, data) -> None:
+    tmp_path = path.with_name(f".{path.name}.{uuid.uuid4().hex[:8]}.tmp")
+    _write_file(tmp_path, json.dumps(data, indent=2, sort_keys=True))
+    os.replace(tmp_path, path)
+
+
+def _read_json(path: Path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception:
+        return None
+
+
+def _swap_directory(staging_dir: Path, target_dir: Path) -> None:
+    """
+    Publish staging_dir as target_dir with one atomic rename.
+
+    target_dir is a symlink to a versioned tree next to it (.src.<id>); a new
+    symlink is renamed over it, so readers resolve either the previous or the
+    new tree, never a missing one. The previous tree is kept until the next
+    swap, so a reader that resolved it just before still finds its files.
+    """
+    tree_dir = target_dir.with_name(f".{target_dir.name}.{uuid.uuid4().hex[:8]}")
+    link = target_dir.with_name(f".{target_dir.name}.link-{uuid.uuid4().hex[:8]}")
+    try:
+        os.symlink(tree_dir.name, link, target_is_directory=True)
+    except OSError:
+        # No symlinks (Windows without the privilege) - swap with two renames instead
+        shutil.rmtree(target_dir, ignore_errors=True)
+        os.replace(staging_dir, target_dir)
+        return
+
+    keep = {tree_dir.name}
+    if target_dir.is_symlink():
+        keep.add(os.readlink(target_dir))
+    elif target_dir.exists():
+        # Tree saved before versioned trees - moved aside once
+        legacy_dir = target_dir.with_name(f".{target_dir.name}.{uuid.uuid4().hex[:8]}")
+        os.replace(target_dir, legacy_dir)
+        keep.add(legacy_dir.name)
+
+    os.replace(staging_dir, tree_dir)
+    os.replace(link, target_dir)
+
+    for old_tree in target_dir.parent.glob(f".{target_dir.name}.*"):
+        if old_tree.name not in keep and "-" not in old_tree.name:  # not a staging dir or link in progress
+            shutil.rmtree(old_tree, ignore_errors=True)
+
+
+@contextmanager
+def _project_lock(project_name: str):
+    """Exclusive lock on a project's published state, across threads and processes."""
+    base_dir = GENERATED_DIR / project_name
+    base_dir.mkdir(parents=True, exist_ok=True)
+    with _publish_lock, open(base_dir / LOCK_NAME, 'a+b') as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+def run_workspace(project_name: str, run_id: str) -> Path:
+    """Workspace directory of one run of a project."""
+    return GENERATED_DIR / project_name / RUNS_DIRNAME / run_id
+
+
+def latest_run_id(project_name: str) -> Optional[str]:
+    """
+    Run published as the project's latest.
+
+    Args:
+        project_name: Name of the project
+
+    Returns:
+        Run ID, or None if no run was published yet
+    """
+    pointer = _read_json(GENERATED_DIR / project_name / LATEST_NAME)
+    return pointer.get("run_id") if isinstance(pointer, dict) else None
+
+
+def load_project_manifest(project_name: str, run_id: Optional[str] = None) -> Dict[str, Dict[str, str]]:
+    """
+    Load a project's artifact manifest.
+
+    Args:
+        project_name: Name of the project
+        run_id: Run whose workspace manifest to load (defaults to the published run)
 
-def save_generated_files(project_name: str, files: List[Dict], file_type: str) -> Dict[str, int]:
+    Returns:
+        Dictionary of file_type -> {relative path: sha256}
     """
-    Save generated files to the appropriate directory structure.
-    
+    if run_id is None:
+        run_id = latest_run_id(project_name)
+    if run_id is None:
+        # Project saved before per-run workspaces
+        manifest = _read_json(GENERATED_DIR / project_name / MANIFEST_NAME)
+    else:
+        manifest = _read_json(run_workspace(project_name, run_id) / MANIFEST_NAME)
+    return manifest if isinstance(manifest, dict) else {}
+
+
+def _update_run_manifest(project_name: str, run_id: str, file_type: str, entries: Dict[str, str]) -> None:
+    with _manifest_lock:
+        manifest = load_project_manifest(project_name, run_id)
+        manifest[file_type] = entries
+        _write_json_atomic(run_workspace(project_name, run_id) / MANIFEST_NAME, manifest)
+
+
+def publish_run(project_name: str, run_id: str) -> None:
+    """
+    Atomically make a run's workspace the project's latest.
+
+    The pointer is swapped with a rename under the project lock, so readers see
+    either the previous or the new run, never a mix; stale unpublished
+    workspaces are pruned while the lock is held.
+
+    Args:
+        project_name: Name of the project
+        run_id: Run to publish (its workspace must have a manifest)
+
+    Raises:
+        FileNotFoundError: If the run has no saved workspace
+    """
+    workspace = run_workspace(project_name, run_id)
+    if not (workspace / MANIFEST_NAME).is_file():
+        raise FileNotFoundError(f"No workspace for run {run_id} of {project_name}")
+
+    with _project_lock(project_name):
+        previous = latest_run_id(project_name)
+        _write_json_atomic(
+            GENERATED_DIR / project_name / LATEST_NAME,
+            {"run_id": run_id, "previous_run_id": previous, "published_at": time.time()}
+        )
+        _prune_workspaces(project_name, keep={run_id})
+
+    logger.info(f"✓ Published run {run_id} as latest of {project_name}")
+
+
+def _prune_workspaces(project_name: str, keep) -> None:
+    runs_dir = GENERATED_DIR / project_name / RUNS_DIRNAME
+    try:
+        workspaces = sorted(
+            (p for p in runs_dir.iterdir() if p.is_dir()), key=lambda p: p.stat().st_mtime, reverse=True
+        )
+    except OSError:
+        return
+
+    cutoff = time.time() - STALE_WORKSPACE_SECONDS
+    for workspace in workspaces[RUN_WORKSPACES_KEEP:]:
+        try:
+            if workspace.name in keep or workspace.stat().st_mtime > cutoff:
+                continue
+        except OSError:
+            continue
+        shutil.rmtree(workspace, ignore_errors=True)
+        logger.debug(f"Pruned workspace of run {workspace.name}")
+
+
+def list_project_runs(project_name: str) -> List[Dict]:
+    """
+    List the run workspaces of a project, newest first.
+
+    Args:
+        project_name: Name of the project
+
+    Returns:
+        List of dictionaries with run_id, path, updated_at, file counts per
+        type ('files') and latest (True for the published run)
+    """
+    runs_dir = GENERATED_DIR / project_name / RUNS_DIRNAME
+    if not runs_dir.is_dir():
+        return []
+
+    latest = latest_run_id(project_name)
+    runs = []
+    for workspace in runs_dir.iterdir():
+        manifest_path = workspace / MANIFEST_NAME
+        manifest = _read_json(manifest_path)
+        if not isinstance(manifest, dict):
+            continue  # still saving its first files, or pruned meanwhile
+        try:
+            updated_at = manifest_path.stat().st_mtime
+        except OSError:
+            continue
+        runs.append({
+            "run_id": workspace.name,
+            "path": str(workspace),
+            "updated_at": updated_at,
+            "files": {file_type: len(entries) for file_type, entries in manifest.items()},
+            "latest": workspace.name == latest,
+        })
+
+    runs.sort(key=lambda r: r["updated_at"], reverse=True)
+    return runs
+
+
+def _store_and_write(data: Optional[bytes], digest: str, destination: Path) -> None:
+    if data is None:
+        artifact_store.materialize(digest, destination)
+        return
+    artifact_store.put_blob(data)
+    _write_file_bytes(destination, data)
+
+
+def save_generated_files(
+    project_name: str, files: List[Dict], file_type: str, run_id: Optional[str] = None
+) -> Dict[str, int]:
+    """
+    Save generated files into a run's workspace.
+
     Args:
         project_name: Name of the project (used as folder name)
         files: List of file dictionaries with 'path' and 'content' keys
         file_type: Type of files - 'src', 'tests', 'docs', or 'deploy'
-    
+        run_id: Run whose workspace to write (defaults to the run bound to the
+            current context, else a new workspace)
+
     Returns:
-        Dictionary with save statistics (saved_count, failed_count)
-    """
-    # Create the base directory for this project
-    base_dir = Path(__file__).parent.parent / "generated" / project_name
-    
-    # Map file types to their target directories
-    type_dirs = {
-        'src': base_dir / 'src',
-        'tests': base_dir / 'tests',
-        'docs': base_dir / 'docs',
-        'deploy': base_dir / 'deploy'
-    }
-    
-    if file_type not in type_dirs:
-        logger.error(f"Invalid file_type: {file_type}. Must be one of {list(type_dirs.keys())}")
+        Dictionary with save statistics (saved_count, failed_count, skipped_count)
+    """
+    run_id = run_id or current_run_id() or uuid.uuid4().hex[:8]
+    with span("save_generated_files", file_type=file_type, files=len(files)):
+        return _save_files(project_name, files, file_type, run_id)
+
+
+def _save_files(project_name: str, files: List[Dict], file_type: str, run_id: str) -> Dict[str, int]:
+    # Create the workspace of this run
+    base_dir = run_workspace(project_name, run_id)
+
+    if file_type not in FILE_TYPES:
+        logger.error(f"Invalid file_type: {file_type}. Must be one of {list(FILE_TYPES)}")
         return {"saved_count": 0, "failed_count": len(files)}
-    
-    target_dir = type_dirs[file_type]
-    target_dir.mkdir(parents=True, exist_ok=True)
-    
+
+    target_dir = base_dir / file_type
+    staging_dir = base_dir / f".{file_type}.staging-{uuid.uuid4().hex[:8]}"
+
     logger.info(f"Saving {len(files)} {file_type} files to {target_dir}")
-    
+
+    # Unchanged files of this run (a re-save) or of the published run skip the store write
+    previous_entries = (
+        load_project_manifest(project_name, run_id).get(file_type)
+        or load_project_manifest(project_name).get(file_type, {})
+    )
+    manifest = {}
+
     saved_count = 0
     failed_count = 0
-    
+    skipped_count = 0
+
+    # Collect valid entries; later duplicates of a path win, as with sequential writes
+    entries = {}
+    artifacts = {}
     for file_info in files:
-        try:
-            file_path = file_info.get('path', '')
-            content = file_info.get('content', '')
-            
-            if not file_path:
-                logger.warning(f"Skipping file with empty path in {file_type}")
-                failed_count += 1
-                continue
-            
-            # Create full file path
-            full_path = target_dir / file_path
-            
-            # Create parent directories if needed
-            full_path.parent.mkdir(parents=True, exist_ok=True)
-            
-            # Write the file
-            with open(full_path, 'w', encoding='utf-8') as f:
-                f.write(content)
-            
-            logger.info(f"✓ Saved: {full_path}")
-            saved_count += 1
-            
-        except Exception as e:
-            logger.error(f"✗ Failed to save file {file_info.get('path', 'unknown')}: {str(e)}")
+        file_path = file_info.get('path', '')
+        if not file_path:
+            logger.warning(f"Skipping file with empty path in {file_type}")
             failed_count += 1
-    
-    logger.info(f"Save complete: {saved_count} succeeded, {failed_count} failed")
-    
+            continue
+        if isinstance(file_info, Artifact):
+            entries[file_path] = file_info.data
+            artifacts[file_path] = file_info
+        else:
+            entries[file_path] = file_info.get('content', '').encode('utf-8')
+
+    try:
+        # Pre-create the whole directory tree once
+        staging_dir.mkdir(parents=True, exist_ok=True)
+        for parent in sorted({(staging_dir / p).parent for p in entries}):
+            parent.mkdir(parents=True, exist_ok=True)
+
+        pending = {}
+        for file_path, data in entries.items():
+            digest = artifact_store.content_hash(data)
+            unchanged = previous_entries.get(file_path) == digest and artifact_store.has_blob(digest)
+            pending[file_path] = (
+                digest,
+                unchanged,
+                _write_pool.submit(
+                    contextvars.copy_context().run,
+                    _store_and_write, None if unchanged else data, digest, staging_dir / file_path
+                )
+            )
+
+        for file_path, (digest, unchanged, future) in pending.items():
+            try:
+                future.result()
+                manifest[file_path] = digest
+                if file_path in artifacts:
+                    # Content is in the store now - release the in-memory copy
+                    artifacts[file_path].mark_saved(digest)
+                if unchanged:
+                    skipped_count += 1
+                else:
+                    logger.info(f"✓ Saved: {target_dir / file_path}")
+                    saved_count += 1
+            except Exception as e:
+                logger.error(f"✗ Failed to save file {file_path}: {str(e)}")
+                failed_count += 1
+
+        _swap_directory(staging_dir, target_dir)
+        _update_run_manifest(project_name, run_id, file_type, manifest)
+
+    except Exception as e:
+        logger.error(f"✗ Failed to save {file_type} files for {project_name}: {str(e)}")
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        return {
+            "saved_count": 0,
+            "failed_count": len(files),
+            "skipped_count": 0,
+            "target_directory": str(target_dir)
+        }
+
+    logger.info(f"Save complete: {saved_count} written, {skipped_count} unchanged, {failed_count} failed")
+
     return {
-        "saved_count": saved_count,
+        "saved_count": saved_count + skipped_count,
         "failed_count": failed_count,
+        "skipped_count": skipped_count,
         "target_directory": str(target_dir)
     }
 
 
+def save_generated_files_async(
+    project_name: str, files: List[Dict], file_type: str, run_id: Optional[str] = None
+) -> Future:
+    """
+    Start save_generated_files in the background.
+
+    Args:
+        project_name: Name of the project (used as folder name)
+        files: List of file dictionaries with 'path' and 'content' keys (must not be mutated afterwards)
+        file_type: Type of files - 'src', 'tests', 'docs', or 'deploy'
+        run_id: Run whose workspace to write (defaults to the run bound to the current context)
+
+    Returns:
+        Future resolving to the save statistics dictionary
+    """
+    # Copy the caller's context so background log records stay tagged with its run
+    return _save_pool.submit(
+        contextvars.copy_context().run, save_generated_files, project_name, files, file_type, run_id
+    )
+
+
+def materialize_project(project_name: str, run_id: Optional[str] = None) -> Dict[str, int]:
+    """
+    Rebuild a run workspace's file tree from its manifest and the artifact store.
+
+    Args:
+        project_name: Name of the project
+        run_id: Run to rebuild (defaults to the published run)
+
+    Returns:
+        Dictionary of file_type -> number of files materialized
+    """
+    run_id = run_id or latest_run_id(project_name)
+    if run_id is None:
+        logger.warning(f"No published run of {project_name} to materialize")
+        return {}
+    manifest = load_project_manifest(project_name, run_id)
+    counts = {}
+
+    for file_type, entries in manifest.items():
+        files = []
+        for path, digest in entries.items():
+            content = get_artifact_by_hash(digest)
+            if content is None:
+                logger.warning(f"Artifact {digest[:12]} for {file_type}/{path} missing from store")
+                continue
+            files.append({"path": path, "content": content})
+        counts[file_type] = save_generated_files(project_name, files, file_type, run_id)["saved_count"]
+
+    return counts
+
+
+def get_artifact_by_hash(digest: str) -> Optional[str]:
+    """
+    Look up an artifact's content by its sha256 hash.
+
+    Args:
+        digest: sha256 hex digest
+
+    Returns:
+        File content as text, or None if unknown
+    """
+    data = artifact_store.get_blob(digest)
+    if data is None:
+        return None
+    return data.decode('utf-8', errors='replace')
+
+
+def open_artifact(digest: str) -> Optional[BinaryIO]:
+    """
+    Open an artifact for streaming without loading it.
+
+    Args:
+        digest: sha256 hex digest
+
+    Returns:
+        Binary file object, or None if unknown
+    """
+    return artifact_store.open_blob(digest)
+
+
+def read_artifact_preview(digest: str, max_bytes: int) -> Optional[Tuple[str, bool]]:
+    """
+    Read the beginning of an artifact without loading the whole file.
+
+    Args:
+        digest: sha256 hex digest
+        max_bytes: Maximum number of bytes to read
+
+    Returns:
+        Tuple of (text, truncated), or None if unknown
+    """
+    source = artifact_store.open_blob(digest)
+    if source is None:
+        return None
+
+    with source:
+        data = source.read(max_bytes + 1)
+
+    truncated = len(data) > max_bytes
+    # A cut may land inside a multi-byte character - drop the partial tail
+    text = data[:max_bytes].decode('utf-8', errors='ignore' if truncated else 'replace')
+    return text, truncated
+
+
+def find_artifacts_by_hash(digest: str) -> List[Dict[str, str]]:
+    """
+    Find every project file whose content has the given hash.
+
+    Args:
+        digest: sha256 hex digest
+
+    Returns:
+        List of dictionaries with 'project', 'run_id' (None for pre-workspace
+        projects), 'file_type' and 'path' keys
+    """
+    matches = []
+    if not GENERATED_DIR.exists():
+        return matches
+
+    manifest_paths = [
+        (path.parent.parent.parent.name, path.parent.name, path)
+        for path in GENERATED_DIR.glob(f"*/{RUNS_DIRNAME}/*/{MANIFEST_NAME}")
+    ]
+    manifest_paths += [(path.parent.name, None, path) for path in GENERATED_DIR.glob(f"*/{MANIFEST_NAME}")]
+
+    for project_name, run_id, manifest_path in manifest_paths:
+        manifest = _read_json(manifest_path)
+        if not isinstance(manifest, dict):
+            continue
+        for file_type, entries in manifest.items():
+            for path, file_digest in entries.items():
+                if file_digest == digest:
+                    matches.append({"project": project_name, "run_id": run_id, "file_type": file_type, "path": path})
+
+    return matches
+
+
 def get_project_directory(project_name: str) -> str:
     """
     Get the full path to a project's generated directory.
-    
+
     Args:
         project_name: Name of the project
-    
+
     Returns:
-        Full path as string
+        Full path as string - the published run's workspace, or the project
+        directory if no run was published yet
     """
-    base_dir = Path(__file__).parent.parent / "generated" / project_name
-    return str(base_dir)
+    run_id = latest_run_id(project_name)
+    if run_id is None:
+        return str(GENERATED_DIR / project_name)
+    return str(run_workspace(project_name, run_id))
@@ -0,0 +1,187 @@
+"""
+Hedged Requests
+Duplicate slow agent calls to cut tail latency, within a bounded extra load.
+
+Opt-in (HEDGE_REQUESTS=1). The call runs on the hedge pool while the caller
+waits up to the agent's learned p90 latency (see core.adaptive_params). If no
+answer came by then and the agent's hedge budget allows, the same request is
+sent again - to HEDGE_MODEL when set, else to the same model - and the first
+valid response wins. A response is valid when it parses as the JSON the caller
+expects, so a failed or malformed first answer does not end the race.
+
+The losing request is cancelled if it has not started yet. One already in
+flight cannot be interrupted (the provider client is synchronous): its result
+is discarded, and its tokens still count against the run budget.
+
+Hedge budgets are token buckets per agent: every call adds HEDGE_BUDGET_RATIO
+of a hedge (up to HEDGE_BURST) and every hedge takes one, so hedges add at
+most ~HEDGE_BUDGET_RATIO to each agent's request load.
+"""
+import contextvars
+import logging
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, TimeoutError, wait
+from typing import Dict, List, Optional
+
+from core.adaptive_params import MIN_SAMPLES, agent_key, agent_stats
+from core.json_guard import safe_parse_json
+from core.llm_client import call_overrides, last_call, reset_last_call, set_last_call
+from core.schema_validator import validate_json
+from core.tracing import span
+
+logger = logging.getLogger(__name__)
+
+HEDGE_REQUESTS = os.getenv("HEDGE_REQUESTS", "0") == "1"
+HEDGE_MODEL = os.getenv("HEDGE_MODEL") or None
+HEDGE_BUDGET_RATIO = float(os.getenv("HEDGE_BUDGET_RATIO", "0.1"))
+HEDGE_BURST = float(os.getenv("HEDGE_BURST", "2"))
+HEDGE_MIN_DELAY_MS = float(os.getenv("HEDGE_MIN_DELAY_MS", "500"))
+HEDGE_WORKERS = int(os.getenv("HEDGE_WORKERS", "32"))
+
+_hedge_pool = ThreadPoolExecutor(max_workers=HEDGE_WORKERS, thread_name_prefix="llm-hedge")
+
+_lock = threading.Lock()
+_buckets = {}
+_metrics = {"calls": 0, "hedged": 0, "hedge_wins": 0, "budget_denied": 0}
+
+
+def _count(key: str) -> None:
+    with _lock:
+        _metrics[key] += 1
+
+
+def hedge_metrics() -> Dict[str, int]:
+    """Snapshot of the hedging counters of this process."""
+    with _lock:
+        return dict(_metrics)
+
+
+def _deposit(agent_name: str) -> None:
+    with _lock:
+        _metrics["calls"] += 1
+        # A fresh agent starts with one hedge available
+        _buckets[agent_name] = min(HEDGE_BURST, _buckets.get(agent_name, 1.0) + HEDGE_BUDGET_RATIO)
+
+
+def _take_hedge(agent_name: str) -> bool:
+    with _lock:
+        if _buckets.get(agent_name, 0.0) < 1.0:
+            _metrics["budget_denied"] += 1
+            return False
+        _buckets[agent_name] -= 1.0
+        return True
+
+
+def hedge_delay(agent_name: str) -> Optional[float]:
+    """
+    Seconds to wait before hedging a call of an agent.
+
+    Returns:
+        The agent's p90 call latency (at least HEDGE_MIN_DELAY_MS), or None
+        while there is too little history to learn it
+    """
+    stats = agent_stats(agent_name)
+    if stats["calls"] < MIN_SAMPLES or stats["p90_latency_ms"] is None:
+        return None
+    return max(stats["p90_latency_ms"], HEDGE_MIN_DELAY_MS) / 1000
+
+
+def _attempt(agent, messages, overrides):
+    reset_last_call()
+    with call_overrides(**overrides):
+        response = agent.generate_reply(messages=messages)
+    return response, last_call()
+
+
+def _is_valid(response, required_keys) -> bool:
+    try:
+        validate_json(safe_parse_json(response["content"]), required_keys or [])
+        return True
+    except Exception:
+        return False
+
+
+def _discard(future) -> None:
+    if not future.cancel():
+        future.add_done_callback(lambda f: f.exception())  # retrieve, so failures are not reported as unhandled
+
+
+def hedged_reply(agent, messages: List[Dict], agent_name: Optional[str] = None, required_keys=None):
+    """
+    agent.generate_reply, hedged with a duplicate request when it runs past the agent's p90 latency.
+
+    Generation parameter overrides active in the caller's context apply to both
+    requests; last_call() afterwards reports the usage of the winning one.
+
+    Args:
+        agent: Agent to call
+        messages: Messages for generate_reply
+        agent_name: Name for logs and statistics when the agent has none
+        required_keys: Keys a valid JSON response must have
+
+    Returns:
+        The response, as from agent.generate_reply
+
+    Raises:
+        Whatever the call raises; when hedged, the primary request's error if both failed
+    """
+    name = agent_key(agent, agent_name)
+    delay = hedge_delay(name) if HEDGE_REQUESTS and name else None
+    if delay is None:
+        return agent.generate_reply(messages=messages)
+
+    _deposit(name)
+    started = time.monotonic()
+    primary = _hedge_pool.submit(contextvars.copy_context().run, _attempt, agent, messages, {})
+    try:
+        response, usage = primary.result(timeout=delay)
+        set_last_call(usage)
+        return response
+    except TimeoutError:
+        pass
+
+    if not _take_hedge(name):
+        response, usage = primary.result()
+        set_last_call(usage)
+        return response
+
+    _count("hedged")
+    overrides = {"model": HEDGE_MODEL} if HEDGE_MODEL else {}
+    with span("llm.hedge", agent=name, delay_ms=round(delay * 1000), model=HEDGE_MODEL or "same") as hedge_span:
+        logger.info(f"⏱️ {name} slower than {delay:.1f}s - hedging with {HEDGE_MODEL or 'the same model'}")
+        hedge = _hedge_pool.submit(contextvars.copy_context().run, _attempt, agent, messages, overrides)
+
+        pending = {primary: "primary", hedge: "hedge"}
+        answers, errors = {}, {}
+        winner = None
+        while pending and winner is None:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                role = pending.pop(future)
+                try:
+                    answers[role] = future.result()
+                except Exception as e:
+                    errors[role] = e
+                    continue
+                if winner is None and _is_valid(answers[role][0], required_keys):
+                    winner = role
+
+        for future in pending:
+            _discard(future)
+
+        if winner is None:
+            # Neither answer is valid - let the caller's retry handling see the primary's outcome
+            if not answers:
+                raise errors.get("primary") or errors["hedge"]
+            winner = "primary" if "primary" in answers else "hedge"
+        if winner == "hedge":
+            _count("hedge_wins")
+        if hedge_span is not None:
+            hedge_span.set(winner=winner)
+        logger.debug(f"Hedged {name} call answered by the {winner} request after {(time.monotonic() - started) * 1000:.0f}ms")
+
+    response, usage = answers[winner]
+    set_last_call(usage)
+    return response
@@ -0,0 +1,413 @@
+"""
+Job Queue
+Durable, SQLite-backed queue of pipeline runs executed by a pool of worker
+processes, so pipeline work never runs on (or blocks) a Streamlit script thread.
+
+- Jobs survive UI disconnects and server restarts; jobs left 'running' by a
+  dead worker are re-queued when their heartbeat goes stale.
+- Workers import the pipeline (and all agents) and pre-warm the LLM client
+  once at start, then loop claiming jobs.
+- Claiming is fair across users: the next job comes from the user with the
+  fewest running jobs, then by priority, then by age.
+- User IDs are stable across sessions (the UI keeps them in the URL), so a
+  user can reach their queued and running jobs again after a reload.
+
+Run standalone workers with:  python -m core.job_queue --workers 4
+"""
+import argparse
+import contextvars
+import logging
+import multiprocessing
+import os
+import re
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import closing
+from pathlib import Path
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DB_PATH = Path(__file__).parent.parent / "data" / "jobs.db"
+
+POLL_INTERVAL = 1.0
+HEARTBEAT_INTERVAL = 10.0
+STALE_AFTER = 60.0
+DEFAULT_WORKERS = int(os.getenv("PIPELINE_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL,
+    project_name TEXT NOT NULL,
+    requirement TEXT NOT NULL,
+    reuse TEXT NOT NULL DEFAULT 'auto',
+    worker_id TEXT,
+    log_file TEXT,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    heartbeat_at REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status_priority ON jobs (status, priority DESC, created_at);
+CREATE INDEX IF NOT EXISTS idx_jobs_user_status ON jobs (user_id, status);
+"""
+
+# Columns added after the first release of the schema
+_MIGRATIONS = (
+    "ALTER TABLE jobs ADD COLUMN reuse TEXT NOT NULL DEFAULT 'auto'",
+)
+
+USER_ID_RE = re.compile(r"[0-9a-f]{8,32}")
+
+_init_lock = threading.Lock()
+_initialized = False
+
+
+def _connect() -> sqlite3.Connection:
+    global _initialized
+
+    DB_PATH.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(DB_PATH, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+
+    if not _initialized:
+        with _init_lock:
+            if not _initialized:
+                conn.execute("PRAGMA journal_mode = WAL")
+                conn.executescript(_SCHEMA)
+                for migration in _MIGRATIONS:
+                    try:
+                        conn.execute(migration)
+                    except sqlite3.OperationalError:
+                        pass  # already applied
+                _initialized = True
+
+    return conn
+
+
+def resolve_user_id(candidate: Optional[str]) -> str:
+    """
+    Stable user ID from a client-held value.
+
+    Args:
+        candidate: Previously issued ID (e.g. from a query parameter), if any
+
+    Returns:
+        The candidate when it is a well-formed ID, else a new one
+    """
+    if candidate and USER_ID_RE.fullmatch(candidate):
+        return candidate
+    return uuid.uuid4().hex[:16]
+
+
+def submit_job(user_id: str, requirement: str, project_name: str, priority: int = 0, reuse: str = "auto") -> str:
+    """
+    Queue a pipeline run.
+
+    Args:
+        user_id: Submitting user's stable ID (used for fairness and to list their jobs)
+        requirement: User requirement text
+        project_name: Sanitized project name
+        priority: Higher runs sooner among the same user's jobs
+        reuse: Near-duplicate requirement handling passed to run_pipeline
+
+    Returns:
+        Job ID (also used as the run ID in logs, traces and the run store)
+    """
+    job_id = uuid.uuid4().hex[:12]
+    with closing(_connect()) as conn:
+        conn.execute(
+            "INSERT INTO jobs (job_id, user_id, priority, status, project_name, requirement, reuse, created_at) "
+            "VALUES (?, ?, ?, 'queued', ?, ?, ?, ?)",
+            (job_id, user_id, priority, project_name, requirement, reuse, time.time())
+        )
+    logger.info(f"Job {job_id} queued for {project_name} (user={user_id}, priority={priority})")
+    return job_id
+
+
+def get_job(job_id: str) -> Optional[Dict]:
+    with closing(_connect()) as conn:
+        row = conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+    return dict(row) if row else None
+
+
+def list_jobs(user_id: Optional[str] = None, limit: int = 50, statuses: Optional[List[str]] = None) -> List[Dict]:
+    """
+    List jobs, newest first.
+
+    Args:
+        user_id: Only this user's jobs
+        limit: Maximum number of jobs
+        statuses: Only jobs in these states (e.g. ['queued', 'running'])
+
+    Returns:
+        List of job dictionaries
+    """
+    clauses, params = [], []
+    if user_id:
+        clauses.append("user_id = ?")
+        params.append(user_id)
+    if statuses:
+        clauses.append(f"status IN ({', '.join('?' for _ in statuses)})")
+        params.extend(statuses)
+    where = f"WHERE {' AND '.join(clauses)} " if clauses else ""
+    with closing(_connect()) as conn:
+        rows = conn.execute(
+            f"SELECT * FROM jobs {where}ORDER BY created_at DESC LIMIT ?", (*params, limit)
+        ).fetchall()
+    return [dict(row) for row in rows]
+
+
+def queue_position(job_id: str) -> Optional[int]:
+    """Number of queued jobs ahead of this one by priority and age (None if not queued)."""
+    job = get_job(job_id)
+    if not job or job["status"] != "queued":
+        return None
+    with closing(_connect()) as conn:
+        ahead = conn.execute(
+            "SELECT COUNT(*) FROM jobs WHERE status = 'queued' AND "
+            "(priority > ? OR (priority = ? AND created_at < ?))",
+            (job["priority"], job["priority"], job["created_at"])
+        ).fetchone()[0]
+    return ahead
+
+
+def cancel_job(job_id: str) -> bool:
+    """Cancel a job that has not started yet. Returns True if it was cancelled."""
+    with closing(_connect()) as conn:
+        cursor = conn.execute(
+            "UPDATE jobs SET status = 'cancelled', finished_at = ? WHERE job_id = ? AND status = 'queued'",
+            (time.time(), job_id)
+        )
+    return cursor.rowcount == 1
+
+
+def claim_next_job(worker_id: str) -> Optional[Dict]:
+    """
+    Atomically claim the next job for a worker.
+
+    Args:
+        worker_id: Claiming worker
+
+    Returns:
+        Claimed job dictionary, or None if the queue is empty
+    """
+    with closing(_connect()) as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                """
+                SELECT j.job_id FROM jobs j
+                LEFT JOIN (
+                    SELECT user_id, COUNT(*) AS running FROM jobs WHERE status = 'running' GROUP BY user_id
+                ) r ON r.user_id = j.user_id
+                WHERE j.status = 'queued'
+                ORDER BY COALESCE(r.running, 0) ASC, j.priority DESC, j.created_at ASC
+                LIMIT 1
+                """
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+
+            now = time.time()
+            conn.execute(
+                "UPDATE jobs SET status = 'running', worker_id = ?, started_at = ?, heartbeat_at = ?, "
+                "attempts = attempts + 1 WHERE job_id = ?",
+                (worker_id, now, now, row["job_id"])
+            )
+            job = conn.execute("SELECT * FROM jobs WHERE job_id = ?", (row["job_id"],)).fetchone()
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    return dict(job)
+
+
+def heartbeat(job_id: str) -> None:
+    with closing(_connect()) as conn:
+        conn.execute("UPDATE jobs SET heartbeat_at = ? WHERE job_id = ?", (time.time(), job_id))
+
+
+def set_job_log_file(job_id: str, log_file: str) -> None:
+    with closing(_connect()) as conn:
+        conn.execute("UPDATE jobs SET log_file = ? WHERE job_id = ?", (log_file, job_id))
+
+
+def complete_job(job_id: str, status: str, error: Optional[str] = None) -> None:
+    """
+    Mark a job finished.
+
+    Args:
+        job_id: Job identifier
+        status: 'succeeded' or 'failed'
+        error: Error message for failed jobs
+    """
+    with closing(_connect()) as conn:
+        conn.execute(
+            "UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE job_id = ?",
+            (status, error, time.time(), job_id)
+        )
+
+
+def requeue_stale_jobs(max_attempts: int = 3) -> int:
+    """
+    Re-queue jobs whose worker stopped heartbeating (fail them after max_attempts).
+
+    Returns:
+        Number of jobs re-queued
+    """
+    cutoff = time.time() - STALE_AFTER
+    with closing(_connect()) as conn:
+        conn.execute(
+            "UPDATE jobs SET status = 'failed', error = 'Worker lost too many times', finished_at = ? "
+            "WHERE status = 'running' AND heartbeat_at < ? AND attempts >= ?",
+            (time.time(), cutoff, max_attempts)
+        )
+        cursor = conn.execute(
+            "UPDATE jobs SET status = 'queued', worker_id = NULL "
+            "WHERE status = 'running' AND heartbeat_at < ?",
+            (cutoff,)
+        )
+    if cursor.rowcount:
+        logger.warning(f"Re-queued {cursor.rowcount} job(s) from lost workers")
+    return cursor.rowcount
+
+
+def _heartbeat_loop(job_id: str, stop: threading.Event) -> None:
+    while not stop.wait(HEARTBEAT_INTERVAL):
+        try:
+            heartbeat(job_id)
+        except Exception as e:
+            logger.warning(f"Heartbeat for job {job_id} failed: {str(e)}")
+
+
+def _run_job(job: Dict, run_pipeline) -> None:
+    from core.logging_config import setup_logging, close_run_logging
+
+    job_id = job["job_id"]
+    log_file = setup_logging(job["project_name"], run_id=job_id)
+    set_job_log_file(job_id, log_file)
+
+    stop = threading.Event()
+    beat = threading.Thread(target=_heartbeat_loop, args=(job_id, stop), daemon=True)
+    beat.start()
+
+    try:
+        result = run_pipeline(job["requirement"], job["project_name"], reuse=job["reuse"], user_id=job["user_id"])
+        if "error" in result:
+            complete_job(job_id, "failed", result["error"])
+        else:
+            complete_job(job_id, "succeeded")
+    except Exception as e:
+        logger.exception(f"Job {job_id} crashed: {str(e)}")
+        complete_job(job_id, "failed", str(e))
+    finally:
+        stop.set()
+        close_run_logging(job_id)
+
+
+def worker_main(worker_id: str) -> None:
+    """
+    Worker process entry point: load agents once, pre-warm, then process jobs forever.
+
+    Args:
+        worker_id: Identifier recorded on claimed jobs
+    """
+    from core.logging_config import setup_logging
+    from core.llm_client import prewarm
+    from orchestrator.pipeline import run_pipeline
+
+    setup_logging(f"worker_{worker_id}", run_id=f"worker-{worker_id}")
+    try:
+        prewarm()
+    except Exception as e:
+        logger.warning(f"Worker {worker_id} could not pre-warm the LLM client: {str(e)}")
+    logger.info(f"Worker {worker_id} ready (pid={os.getpid()})")
+
+    while True:
+        try:
+            job = claim_next_job(worker_id)
+        except Exception as e:
+            logger.error(f"Worker {worker_id} could not claim a job: {str(e)}")
+            job = None
+
+        if job is None:
+            time.sleep(POLL_INTERVAL)
+            continue
+
+        logger.info(f"Worker {worker_id} picked up job {job['job_id']}")
+        # Run in a copied context so the job's log binding does not leak into the idle loop
+        contextvars.copy_context().run(_run_job, job, run_pipeline)
+
+
+class WorkerPool:
+    """Supervises worker processes and restarts any that exit."""
+
+    def __init__(self, num_workers: int = DEFAULT_WORKERS):
+        self.num_workers = max(1, num_workers)
+        self._ctx = multiprocessing.get_context("spawn")
+        self._processes = {}
+        self._stop = threading.Event()
+        self._supervisor = None
+
+    def start(self) -> "WorkerPool":
+        requeue_stale_jobs()
+        for idx in range(self.num_workers):
+            self._spawn(f"w{idx}")
+        self._supervisor = threading.Thread(target=self._supervise, name="job-pool-supervisor", daemon=True)
+        self._supervisor.start()
+        logger.info(f"Worker pool started with {self.num_workers} process(es)")
+        return self
+
+    def _spawn(self, worker_id: str) -> None:
+        process = self._ctx.Process(
+            target=worker_main,
+            args=(f"{worker_id}-{uuid.uuid4().hex[:4]}",),
+            name=f"pipeline-worker-{worker_id}",
+            daemon=True
+        )
+        process.start()
+        self._processes[worker_id] = process
+
+    def _supervise(self) -> None:
+        while not self._stop.wait(HEARTBEAT_INTERVAL):
+            for worker_id, process in list(self._processes.items()):
+                if not process.is_alive():
+                    logger.warning(f"Worker {worker_id} exited with code {process.exitcode} - restarting")
+                    self._spawn(worker_id)
+            try:
+                requeue_stale_jobs()
+            except Exception as e:
+                logger.warning(f"Stale job check failed: {str(e)}")
+
+    def alive_workers(self) -> int:
+        return sum(1 for p in self._processes.values() if p.is_alive())
+
+    def stop(self) -> None:
+        self._stop.set()
+        for process in self._processes.values():
+            process.terminate()
+        for process in self._processes.values():
+            process.join(timeout=10)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run pipeline worker processes")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    args = parser.parse_args()
+
+    pool = WorkerPool(args.workers).start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pool.stop()
@@ -0,0 +1,238 @@
+"""
+Artifact Lineage
+Dependency tracking between pipeline artifacts for incremental regeneration.
+
+- Every stage's input is hashed (together with the agent's system message), so
+  a stage whose input did not change can reuse an earlier output.
+- Lineage links requirement items -> architecture components -> source files
+  -> test files, so an edited requirement only invalidates the components and
+  files it actually reaches.
+
+Mappings are lexical (shared identifiers and words), which is cheap and good
+enough to decide what can be kept. Source files no component maps to are kept
+as they are; tests that map to no source file are regenerated.
+"""
+import hashlib
+import json
+import re
+from pathlib import PurePosixPath
+from typing import Any, Dict, List, Optional, Set
+
+from core.artifact import json_default
+
+REQUIREMENT_KINDS = ("functional_requirements", "non_functional_requirements", "constraints", "edge_cases")
+
+# Minimum number of shared words for a requirement to be linked to a component
+MIN_SHARED_WORDS = 2
+
+_WORD_RE = re.compile(r"[A-Za-z][a-z0-9]+|[A-Z]+(?![a-z])|\d+")
+_STOP_WORDS = {
+    "the", "and", "for", "with", "that", "this", "from", "into", "must", "should", "will",
+    "can", "are", "all", "any", "each", "via", "use", "uses", "using", "able", "allow",
+    "allows", "support", "supports", "system", "user", "users", "data", "service",
+}
+
+
+def stage_input_hash(stage: str, agent: Any, payload: Any) -> str:
+    """
+    Hash of everything that determines a stage's output.
+
+    Args:
+        stage: Stage name
+        agent: Agent producing the output (its system message is part of the hash)
+        payload: Stage input
+
+    Returns:
+        sha256 hex digest
+    """
+    system_message = getattr(agent, "system_message", "") or ""
+    body = json.dumps({"stage": stage, "system": system_message, "input": payload}, sort_keys=True, default=json_default)
+    return hashlib.sha256(body.encode("utf-8")).hexdigest()
+
+
+def _words(text: str) -> Set[str]:
+    return {w.lower() for w in _WORD_RE.findall(text) if len(w) > 2} - _STOP_WORDS
+
+
+def _component_name(component: Any) -> str:
+    return component.get("name", "") if isinstance(component, dict) else str(component)
+
+
+def _component_words(component: Any) -> Set[str]:
+    if isinstance(component, dict):
+        return _words(" ".join(str(v) for v in component.values()))
+    return _words(str(component))
+
+
+def requirement_items(requirements: Dict) -> List[str]:
+    """Flatten a requirements document into 'kind: text' items."""
+    return [
+        f"{kind}: {item}"
+        for kind in REQUIREMENT_KINDS
+        for item in requirements.get(kind, [])
+    ]
+
+
+def diff_requirements(old: Dict, new: Dict) -> Dict[str, List[str]]:
+    """
+    Requirement items added and removed between two requirement documents.
+
+    Returns:
+        Dictionary with 'added' and 'removed' lists
+    """
+    old_items, new_items = requirement_items(old), requirement_items(new)
+    return {
+        "added": [item for item in new_items if item not in set(old_items)],
+        "removed": [item for item in old_items if item not in set(new_items)],
+    }
+
+
+def components_for_requirements(items: List[str], architecture: Dict) -> Set[str]:
+    """Names of the components that share enough vocabulary with any of the requirement items."""
+    linked = set()
+    for item in items:
+        item_words = _words(item)
+        for component in architecture.get("components", []):
+            if len(item_words & _component_words(component)) >= MIN_SHARED_WORDS:
+                linked.add(_component_name(component))
+    return linked
+
+
+def _module_names(path: str) -> Set[str]:
+    pure = PurePosixPath(path.replace("\\", "/"))
+    parts = [p for p in pure.with_suffix("").parts if p not in ("src", ".")]
+    names = {pure.stem}
+    if parts:
+        names.add(".".join(parts))
+    return {n for n in names if n and n != "__init__"}
+
+
+def files_for_components(architecture: Dict, files: List[Dict]) -> Dict[str, List[str]]:
+    """
+    Map each component to the source files that implement it, by matching the
+    component name against file paths and contents.
+
+    Returns:
+        Dictionary of component name -> list of file paths
+    """
+    mapping = {}
+    for component in architecture.get("components", []):
+        name = _component_name(component)
+        name_words = _words(name)
+        snake = "_".join(w.lower() for w in _WORD_RE.findall(name))
+        camel = "".join(w.capitalize() for w in _WORD_RE.findall(name))
+        paths = []
+        for f in files:
+            path_words = _words(f["path"].replace("_", " ").replace("/", " "))
+            content = f.get("content", "")
+            if (name_words and name_words <= path_words) or (snake and snake in content) or (camel and camel in content):
+                paths.append(f["path"])
+        mapping[name] = paths
+    return mapping
+
+
+def sources_for_tests(tests: List[Dict], files: List[Dict]) -> Dict[str, List[str]]:
+    """
+    Map each test file to the source files it imports.
+
+    Returns:
+        Dictionary of test path -> list of source paths
+    """
+    modules = {path: _module_names(path) for path in (f["path"] for f in files)}
+    mapping = {}
+    for test in tests:
+        content = test.get("content", "")
+        mapping[test["path"]] = [
+            path for path, names in modules.items()
+            if any(re.search(rf"\b{re.escape(name)}\b", content) for name in names)
+        ]
+    return mapping
+
+
+def build_lineage(requirements: Dict, architecture: Dict, files: List[Dict], tests: List[Dict]) -> Dict:
+    """
+    Link requirement items to components, components to files and tests to files.
+
+    Returns:
+        Dictionary with 'requirements', 'components' and 'tests' mappings
+    """
+    return {
+        "requirements": {
+            item: sorted(components_for_requirements([item], architecture))
+            for item in requirement_items(requirements)
+        },
+        "components": files_for_components(architecture, files),
+        "tests": sources_for_tests(tests, files),
+    }
+
+
+def diff_architecture(old: Dict, new: Dict) -> Dict[str, Any]:
+    """
+    Components changed between two architectures.
+
+    Returns:
+        Dictionary with 'changed', 'added' and 'removed' component name sets, and
+        'shared_changed' - True when data models or APIs changed (they cut across components)
+    """
+    old_components = {_component_name(c): c for c in old.get("components", [])}
+    new_components = {_component_name(c): c for c in new.get("components", [])}
+    return {
+        "changed": {n for n in new_components.keys() & old_components.keys() if new_components[n] != old_components[n]},
+        "added": set(new_components.keys() - old_components.keys()),
+        "removed": set(old_components.keys() - new_components.keys()),
+        "shared_changed": any(old.get(key) != new.get(key) for key in ("data_models", "apis")),
+    }
+
+
+def plan_code_update(previous_files: List[Dict], lineage: Dict, architecture_diff: Dict) -> Optional[Dict]:
+    """
+    Decide which previous source files survive an architecture change.
+
+    Args:
+        previous_files: Source files of the previous run
+        lineage: Lineage of the previous run
+        architecture_diff: Output of diff_architecture
+
+    Returns:
+        Dictionary with 'keep' (files to reuse as-is: everything not owned by
+        an affected component) and 'regenerate' (component names to generate
+        code for), or None when only a full regeneration is safe
+    """
+    if architecture_diff["shared_changed"]:
+        return None
+
+    affected = architecture_diff["changed"] | architecture_diff["added"] | architecture_diff["removed"]
+    component_files = lineage.get("components", {})
+    if not affected:
+        return {"keep": previous_files, "regenerate": []}
+
+    # Files owned by an affected component are regenerated (or dropped with a removed one);
+    # files no component owns (package __init__, entry point, config) are kept as-is
+    stale = {path for name in affected for path in component_files.get(name, [])}
+    keep = [f for f in previous_files if f["path"] not in stale]
+    if not keep:
+        return None
+
+    return {
+        "keep": keep,
+        "regenerate": sorted(architecture_diff["changed"] | architecture_diff["added"]),
+    }
+
+
+def plan_test_update(previous_tests: List[Dict], lineage: Dict, changed_sources: Set[str]) -> List[Dict]:
+    """
+    Previous test files that only exercise unchanged source files.
+
+    Args:
+        previous_tests: Test files of the previous run
+        lineage: Lineage of the previous run
+        changed_sources: Paths of source files that are new or changed
+
+    Returns:
+        Test files that can be kept as-is
+    """
+    test_sources = lineage.get("tests", {})
+    return [
+        t for t in previous_tests
+        if test_sources.get(t["path"]) and not set(test_sources[t["path"]]) & changed_sources
+    ]
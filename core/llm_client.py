@@ -0,0 +1,318 @@
+"""
+Shared LLM HTTP Client
+One pooled, keep-alive HTTP client per process, shared by every agent.
+
+All agents in agents/*.py build their llm_config with build_llm_config() and
+call attach_pooled_client() so their Groq calls go through the same
+connection pool instead of opening a fresh client (and TLS session) per call.
+
+Callers can override generation parameters for the calls made in a block
+(call_overrides) and read the usage of the last call made in their context
+(last_call), which is how tuned parameters are applied and measured.
+"""
+import contextvars
+import importlib.util
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+import httpx
+from groq import Groq
+
+from core.run_budget import current_budget
+
+logger = logging.getLogger(__name__)
+
+GROQ_BASE_URL = "https://api.groq.com"
+
+# Pool tuning - overridable through the environment
+POOL_MAX_CONNECTIONS = int(os.getenv("LLM_POOL_MAX_CONNECTIONS", "20"))
+POOL_MAX_KEEPALIVE = int(os.getenv("LLM_POOL_MAX_KEEPALIVE", "10"))
+POOL_KEEPALIVE_EXPIRY = float(os.getenv("LLM_POOL_KEEPALIVE_EXPIRY", "120"))
+HTTP_TIMEOUT = float(os.getenv("LLM_HTTP_TIMEOUT", "120"))
+HTTP2_SETTING = os.getenv("LLM_HTTP2", "auto").lower()
+
+# Parameters forwarded to the Groq chat completions endpoint
+_FORWARDED_PARAMS = (
+    "model", "messages", "temperature", "max_tokens",
+    "top_p", "stop", "seed", "response_format",
+)
+
+_call_overrides = contextvars.ContextVar("llm_call_overrides", default=None)
+_last_call = contextvars.ContextVar("llm_last_call", default=None)
+
+_client_lock = threading.Lock()
+_http_client: Optional[httpx.Client] = None
+
+_metrics_lock = threading.Lock()
+_metrics = {
+    "requests": 0,
+    "new_connections": 0,
+    "tls_handshakes": 0,
+    "http2_requests": 0,
+    "prompt_tokens": 0,
+    "completion_tokens": 0,
+}
+
+
+def _bump(key: str, amount: int = 1) -> None:
+    with _metrics_lock:
+        _metrics[key] += amount
+
+
+def _trace(event_name: str, info: dict) -> None:
+    """httpcore trace callback - counts connection setup vs. reuse."""
+    if event_name == "connection.connect_tcp.complete":
+        _bump("new_connections")
+    elif event_name == "connection.start_tls.complete":
+        _bump("tls_handshakes")
+    elif event_name == "http2.send_request_headers.started":
+        _bump("http2_requests")
+
+
+def _on_request(request: httpx.Request) -> None:
+    _bump("requests")
+    request.extensions["trace"] = _trace
+
+
+def _http2_enabled() -> bool:
+    if HTTP2_SETTING in ("0", "false", "no", "off"):
+        return False
+    available = importlib.util.find_spec("h2") is not None
+    if HTTP2_SETTING in ("1", "true", "yes", "on") and not available:
+        logger.warning("LLM_HTTP2 requested but the 'h2' package is not installed - using HTTP/1.1")
+    return available
+
+
+def get_http_client() -> httpx.Client:
+    """
+    Get the process-wide pooled HTTP client, creating it on first use.
+
+    Returns:
+        Shared httpx.Client with keep-alive pooling (and HTTP/2 when 'h2' is installed)
+    """
+    global _http_client
+
+    if _http_client is not None:
+        return _http_client
+
+    with _client_lock:
+        if _http_client is None:
+            http2 = _http2_enabled()
+            _http_client = httpx.Client(
+                http2=http2,
+                timeout=HTTP_TIMEOUT,
+                limits=httpx.Limits(
+                    max_connections=POOL_MAX_CONNECTIONS,
+                    max_keepalive_connections=POOL_MAX_KEEPALIVE,
+                    keepalive_expiry=POOL_KEEPALIVE_EXPIRY,
+                ),
+                event_hooks={"request": [_on_request]},
+            )
+            logger.info(
+                f"Pooled LLM HTTP client created (max_connections={POOL_MAX_CONNECTIONS}, "
+                f"keepalive={POOL_MAX_KEEPALIVE}, http2={http2})"
+            )
+
+    return _http_client
+
+
+def prewarm(connections: int = 1) -> Dict[str, int]:
+    """
+    Open connections to the LLM provider ahead of the first agent call.
+
+    Meant to be called once at worker start so the DNS lookup and TLS
+    handshake are not paid by the first requirement/design call.
+
+    Args:
+        connections: Number of connections to open concurrently
+
+    Returns:
+        Connection metrics after warming
+    """
+    client = get_http_client()
+
+    def _touch():
+        try:
+            client.head(GROQ_BASE_URL, timeout=10)
+        except Exception as e:
+            logger.warning(f"LLM client pre-warm request failed: {str(e)}")
+
+    threads = [threading.Thread(target=_touch, daemon=True) for _ in range(max(1, connections))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    metrics = connection_metrics()
+    logger.info(f"LLM client pre-warmed: {metrics['new_connections']} connection(s) open")
+    return metrics
+
+
+@contextmanager
+def call_overrides(**params):
+    """
+    Override generation parameters (e.g. max_tokens, temperature, model) of the
+    LLM calls made in this block and context. Nested blocks add to the outer
+    overrides.
+    """
+    merged = dict(_call_overrides.get() or {})
+    merged.update({k: v for k, v in params.items() if v is not None})
+    token = _call_overrides.set(merged)
+    try:
+        yield
+    finally:
+        _call_overrides.reset(token)
+
+
+def last_call() -> Optional[Dict[str, Any]]:
+    """Usage of the last LLM call made in this context (prompt/completion tokens, max_tokens, truncated)."""
+    return _last_call.get()
+
+
+def reset_last_call() -> None:
+    _last_call.set(None)
+
+
+def set_last_call(usage: Optional[Dict[str, Any]]) -> None:
+    """Report usage as this context's last call - for calls made on another thread."""
+    _last_call.set(usage)
+
+
+def record_usage(
+    prompt_tokens: Optional[int],
+    completion_tokens: Optional[int],
+    max_tokens: Optional[int] = None,
+    truncated: bool = False
+) -> None:
+    """
+    Account one completion: process token metrics, the current run budget and last_call().
+
+    Args:
+        prompt_tokens: Prompt tokens reported by the provider (None if unknown)
+        completion_tokens: Completion tokens reported by the provider (None if unknown)
+        max_tokens: Output token cap the call was made with
+        truncated: Whether the output was cut off at the cap
+    """
+    _last_call.set({
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "max_tokens": max_tokens,
+        "truncated": truncated,
+    })
+    if prompt_tokens is None and completion_tokens is None:
+        return
+    _bump("prompt_tokens", prompt_tokens or 0)
+    _bump("completion_tokens", completion_tokens or 0)
+    budget = current_budget()
+    if budget is not None:
+        budget.add_tokens((prompt_tokens or 0) + (completion_tokens or 0))
+
+
+def connection_metrics() -> Dict[str, Any]:
+    """
+    Snapshot of the shared client's connection-reuse metrics.
+
+    Returns:
+        Dictionary with request/connection counters and the reuse ratio
+    """
+    with _metrics_lock:
+        snapshot = dict(_metrics)
+
+    reused = max(0, snapshot["requests"] - snapshot["new_connections"])
+    snapshot["reused_connections"] = reused
+    snapshot["reuse_ratio"] = round(reused / snapshot["requests"], 3) if snapshot["requests"] else 0.0
+    return snapshot
+
+
+class PooledGroqClient:
+    """
+    AutoGen model client that sends Groq chat completions through the shared pool.
+    Registered on each agent with attach_pooled_client().
+    """
+
+    def __init__(self, config: Dict[str, Any], **kwargs):
+        self.model = config.get("model")
+        self._client = Groq(
+            api_key=config.get("api_key"),
+            http_client=get_http_client(),
+            max_retries=config.get("max_retries", 2),
+        )
+
+    def create(self, params: Dict[str, Any]):
+        request = {k: params[k] for k in _FORWARDED_PARAMS if params.get(k) is not None}
+        request.update(_call_overrides.get() or {})
+        request.setdefault("model", self.model)
+
+        response = self._client.chat.completions.create(**request)
+
+        usage = getattr(response, "usage", None)
+        choices = getattr(response, "choices", None) or []
+        record_usage(
+            getattr(usage, "prompt_tokens", None),
+            getattr(usage, "completion_tokens", None),
+            max_tokens=request.get("max_tokens"),
+            truncated=any(getattr(c, "finish_reason", None) == "length" for c in choices),
+        )
+
+        return response
+
+    def message_retrieval(self, response) -> List:
+        return [choice.message for choice in response.choices]
+
+    def cost(self, response) -> float:
+        return 0.0
+
+    @staticmethod
+    def get_usage(response) -> Dict:
+        usage = getattr(response, "usage", None)
+        return {
+            "prompt_tokens": getattr(usage, "prompt_tokens", 0) or 0,
+            "completion_tokens": getattr(usage, "completion_tokens", 0) or 0,
+            "total_tokens": getattr(usage, "total_tokens", 0) or 0,
+            "cost": 0.0,
+            "model": getattr(response, "model", None),
+        }
+
+
+def build_llm_config(model: str, api_key: str, temperature: float, max_tokens: int) -> Dict[str, Any]:
+    """
+    Build an agent llm_config that routes calls through PooledGroqClient.
+
+    Args:
+        model: Groq model name
+        api_key: Groq API key
+        temperature: Sampling temperature
+        max_tokens: Output token cap
+
+    Returns:
+        llm_config dictionary for AssistantAgent
+    """
+    return {
+        "config_list": [
+            {
+                "model": model,
+                "api_type": "groq",
+                "api_key": api_key,
+                "model_client_cls": "PooledGroqClient",
+            }
+        ],
+        "temperature": temperature,
+        "max_tokens": max_tokens,
+    }
+
+
+def attach_pooled_client(agent):
+    """
+    Register the pooled model client on an agent built with build_llm_config().
+
+    Args:
+        agent: AssistantAgent instance
+
+    Returns:
+        The same agent, for chaining
+    """
+    agent.register_model_client(model_client_cls=PooledGroqClient)
+    return agent
@@ -0,0 +1,147 @@
+"""
+Log Viewer
+Paged, filtered reads of run log files without loading them.
+
+Run logs are up to 10 MB per file with 5 rotated backups (log, log.1 ...
+log.5, newest first). Pages are read backwards from a cursor - a position in
+one of those files - by memory-mapping the file and scanning for line breaks,
+so reading the last page of a large log touches only the bytes on that page.
+Multi-line records (tracebacks) stay together and are filtered by the level
+and stage of their header line:
+
+    2024-01-01 12:00:00 | INFO     | code        | core.retry_loop      | ...
+
+Older pages are fetched by passing a page's cursor back in; a live tail is just
+the newest page, re-read on every poll.
+"""
+import mmap
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple
+
+LOG_LEVELS = ("DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL")
+LOG_STAGES = (
+    "-", "requirements", "design", "code", "tests", "docs", "deploy",
+    "save_wait", "test_gate", "test_run", "test_repair",
+)
+MAX_BACKUPS = 5
+# Upper bound on bytes scanned for one page, so a filter matching almost nothing cannot scan 60 MB per rerun
+MAX_SCAN_BYTES = 8 * 1024 * 1024
+
+_HEADER_RE = re.compile(rb"^\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2} \| (\w+)\s*\| ([^|]*?)\s*\|")
+
+# Position to read backwards from: (file index, byte offset) - index 0 is the live file, 1 is log.1, ...
+Cursor = Tuple[int, int]
+
+
+@dataclass
+class LogPage:
+    lines: List[str]
+    cursor: Optional[Cursor]  # where the next older page starts, None at the beginning of the log
+    scanned_bytes: int
+    truncated_scan: bool  # stopped at MAX_SCAN_BYTES before filling the page
+
+
+def log_segments(log_file) -> List[Path]:
+    """The log file and its rotated backups that exist, newest first."""
+    path = Path(log_file)
+    segments = [path] if path.exists() else []
+    for index in range(1, MAX_BACKUPS + 1):
+        backup = path.with_name(f"{path.name}.{index}")
+        if backup.exists():
+            segments.append(backup)
+    return segments
+
+
+def _matches(header: bytes, levels, stages) -> bool:
+    match = _HEADER_RE.match(header)
+    if match is None:
+        return not levels and not stages
+    level, stage = match.group(1).decode("ascii", "replace"), match.group(2).decode("utf-8", "replace")
+    return (not levels or level in levels) and (not stages or stage in stages)
+
+
+def _scan_segment(path: Path, end: Optional[int], wanted: int, levels, stages, budget: int):
+    """
+    Collect up to wanted matching records from path, reading backwards from end.
+
+    Returns:
+        Tuple of (records newest first, offset of the oldest byte consumed, bytes scanned)
+    """
+    with open(path, "rb") as f:
+        size = f.seek(0, 2)
+        end = size if end is None else min(end, size)
+        if end == 0:
+            return [], 0, 0
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            position = end
+            # A partially written last line belongs to the next read
+            if data[end - 1:end] != b"\n":
+                position = data.rfind(b"\n", 0, end) + 1
+            start = resume = position
+
+            records = []
+            group = []  # continuation lines of a record whose header is further up
+            while position > 0 and len(records) < wanted and end - position < budget:
+                line_start = data.rfind(b"\n", 0, position - 1) + 1
+                line = data[line_start:position].rstrip(b"\r\n")
+                position = line_start
+                if _HEADER_RE.match(line) or line_start == 0:
+                    if _matches(line, levels, stages):
+                        records.append([line] + group[::-1])
+                    group = []
+                    resume = position
+                else:
+                    group.append(line)
+
+    if resume == start and position < start:
+        resume = position  # a single record larger than the scan budget - split it
+    # An unfinished record is read whole by the next page, from resume
+    return records, resume, end - resume
+
+
+def read_page(
+    log_file,
+    cursor: Optional[Cursor] = None,
+    max_records: int = 200,
+    levels: Optional[Iterable[str]] = None,
+    stages: Optional[Iterable[str]] = None,
+) -> LogPage:
+    """
+    Read one page of log records, newest last, ending at a cursor.
+
+    Args:
+        log_file: Path of the run's log file
+        cursor: Where to read back from - a previous page's cursor, or None for the end of the log
+        max_records: Records per page
+        levels: Only records with these levels (all when empty)
+        stages: Only records of these pipeline stages (all when empty)
+
+    Returns:
+        LogPage with the lines of the page and the cursor of the next older page
+    """
+    levels, stages = set(levels or ()), set(stages or ())
+    segments = log_segments(log_file)
+    index, end = cursor if cursor is not None else (0, None)
+
+    records, scanned = [], 0
+    while index < len(segments) and len(records) < max_records and scanned < MAX_SCAN_BYTES:
+        found, position, used = _scan_segment(
+            segments[index], end, max_records - len(records), levels, stages, MAX_SCAN_BYTES - scanned
+        )
+        records.extend(found)
+        scanned += used
+        if position > 0:
+            end = position
+            break
+        index, end = index + 1, None
+
+    next_cursor = (index, end) if index < len(segments) and (end is None or end > 0) else None
+    lines = [line.decode("utf-8", "replace") for record in reversed(records) for line in record]
+    return LogPage(
+        lines=lines,
+        cursor=next_cursor,
+        scanned_bytes=scanned,
+        truncated_scan=scanned >= MAX_SCAN_BYTES and len(records) < max_records,
+    )
@@ -1,65 +1,217 @@
+import atexit
+import contextvars
 import logging
-from logging.handlers import RotatingFileHandler
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 import os
+import queue
+import threading
+import uuid
+from collections import OrderedDict
 from pathlib import Path
 from datetime import datetime
 
+LOGS_DIR = Path(__file__).parent.parent / "logs"
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+MAX_OPEN_RUN_LOGS = 64
 
-def setup_logging(project_name=None):
+# Run the current thread/task is logging for - copied into worker threads via contextvars
+_current_run = contextvars.ContextVar("current_run", default=None)
+_current_log_file = contextvars.ContextVar("current_log_file", default=None)
+# Pipeline stage the current thread/task works on - set by tracing.span("stage.*")
+_current_stage = contextvars.ContextVar("current_stage", default=None)
+
+_init_lock = threading.Lock()
+_log_queue = None
+_listener = None
+_router = None
+
+DETAILED_FORMATTER = logging.Formatter(
+    "%(asctime)s | %(levelname)-8s | %(stage)-11s | %(name)-20s | %(funcName)-15s | %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S"
+)
+
+SIMPLE_FORMATTER = logging.Formatter(
+    "%(asctime)s | %(levelname)-8s | %(message)s",
+    datefmt="%H:%M:%S"
+)
+
+
+class RunContextFilter(logging.Filter):
+    """Stamps each record with the run ID and pipeline stage bound in the calling context."""
+
+    def filter(self, record):
+        record.run_id = _current_run.get()
+        record.stage = _current_stage.get() or "-"
+        return True
+
+
+class RunFileRouter(logging.Handler):
+    """
+    Writes each record to the log file of the run that emitted it.
+    Runs on the QueueListener thread, so file I/O never blocks the pipeline.
+
+    At most MAX_OPEN_RUN_LOGS files are held open; the least recently written
+    one is closed to make room and reopened (appending) when its run logs again.
+    Records are dropped only for runs that were never opened or already closed.
+    """
+
+    def __init__(self):
+        super().__init__(logging.DEBUG)
+        self._paths = {}
+        # Touched by the listener thread only, apart from close()
+        self._files = OrderedDict()
+
+    def open_run(self, run_id, log_filename):
+        with self.lock:
+            self._paths[run_id] = log_filename
+
+    def _file_handler(self, run_id):
+        file_handler = self._files.get(run_id)
+        if file_handler is not None:
+            self._files.move_to_end(run_id)
+            return file_handler
+
+        with self.lock:
+            log_filename = self._paths.get(run_id)
+        if log_filename is None:
+            return None
+
+        # File Handler - DEBUG and above with rotation (10MB per file, keep 5 backups)
+        file_handler = RotatingFileHandler(
+            log_filename,
+            mode='a',
+            maxBytes=10 * 1024 * 1024,  # 10MB
+            backupCount=5,
+            encoding='utf-8'
+        )
+        file_handler.setLevel(logging.DEBUG)
+        file_handler.setFormatter(DETAILED_FORMATTER)
+
+        self._files[run_id] = file_handler
+        while len(self._files) > MAX_OPEN_RUN_LOGS:
+            _, idle_handler = self._files.popitem(last=False)
+            idle_handler.close()
+        return file_handler
+
+    def emit(self, record):
+        closing = getattr(record, "close_run", None)
+        if closing is not None:
+            with self.lock:
+                self._paths.pop(closing, None)
+            file_handler = self._files.pop(closing, None)
+            if file_handler:
+                file_handler.close()
+            return
+
+        file_handler = self._file_handler(getattr(record, "run_id", None))
+        if file_handler is not None:
+            file_handler.handle(record)
+
+    def close(self):
+        with self.lock:
+            for file_handler in self._files.values():
+                file_handler.close()
+            self._files.clear()
+            self._paths.clear()
+        super().close()
+
+
+def _init_process_logging():
+    """Install the queue-based handlers once per process."""
+    global _log_queue, _listener, _router
+
+    with _init_lock:
+        if _listener is not None:
+            return
+
+        _log_queue = queue.SimpleQueue()
+
+        # Console Handler - INFO and above
+        console_handler = logging.StreamHandler()
+        console_handler.setLevel(logging.INFO)
+        console_handler.setFormatter(SIMPLE_FORMATTER)
+
+        _router = RunFileRouter()
+
+        _listener = QueueListener(_log_queue, console_handler, _router, respect_handler_level=True)
+        _listener.start()
+        atexit.register(_listener.stop)
+
+        queue_handler = QueueHandler(_log_queue)
+        queue_handler.addFilter(RunContextFilter())
+
+        root_logger = logging.getLogger()
+        root_logger.setLevel(getattr(logging, LOG_LEVEL, logging.INFO))
+        root_logger.handlers.clear()
+        root_logger.addHandler(queue_handler)
+
+
+def current_run_id():
+    """Run ID bound to the current context, or None."""
+    return _current_run.get()
+
+
+def current_log_file():
+    """Log file path of the run bound to the current context, or None."""
+    return _current_log_file.get()
+
+
+def bind_stage(stage):
+    """Tag log records of the current context with a pipeline stage; reset with unbind_stage(token)."""
+    return _current_stage.set(stage)
+
+
+def unbind_stage(token):
+    _current_stage.reset(token)
+
+
+def setup_logging(project_name=None, run_id=None):
     """
     Setup comprehensive logging with both console and file handlers.
-    Logs are saved to logs/{project_name}_{timestamp}.log
+    Logs are saved to logs/{project_name}_{timestamp}_{run_id}.log
+
+    Handlers are installed once per process; each call opens a new run log
+    and binds the current context to it, so concurrent runs log to their
+    own files.
     """
+    _init_process_logging()
+
     # Create logs directory if it doesn't exist
-    logs_dir = Path(__file__).parent.parent / "logs"
-    logs_dir.mkdir(exist_ok=True)
-    
-    # Create a unique log file name with timestamp
+    LOGS_DIR.mkdir(exist_ok=True)
+
+    run_id = run_id or uuid.uuid4().hex[:8]
+
+    # Create a unique log file name with timestamp and run ID
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     if project_name:
-        log_filename = logs_dir / f"{project_name}_{timestamp}.log"
+        log_filename = LOGS_DIR / f"{project_name}_{timestamp}_{run_id}.log"
     else:
-        log_filename = logs_dir / f"codegen_{timestamp}.log"
-    
-    # Create root logger
-    root_logger = logging.getLogger()
-    root_logger.setLevel(logging.INFO)
-    
-    # Clear existing handlers
-    root_logger.handlers.clear()
-    
-    # Create formatters
-    detailed_formatter = logging.Formatter(
-        "%(asctime)s | %(levelname)-8s | %(name)-20s | %(funcName)-15s | %(message)s",
-        datefmt="%Y-%m-%d %H:%M:%S"
-    )
-    
-    simple_formatter = logging.Formatter(
-        "%(asctime)s | %(levelname)-8s | %(message)s",
-        datefmt="%H:%M:%S"
-    )
-    
-    # Console Handler - INFO and above
-    console_handler = logging.StreamHandler()
-    console_handler.setLevel(logging.INFO)
-    console_handler.setFormatter(simple_formatter)
-    root_logger.addHandler(console_handler)
-    
-    # File Handler - DEBUG and above with rotation (10MB per file, keep 5 backups)
-    file_handler = RotatingFileHandler(
-        log_filename,
-        maxBytes=10 * 1024 * 1024,  # 10MB
-        backupCount=5,
-        encoding='utf-8'
-    )
-    file_handler.setLevel(logging.DEBUG)
-    file_handler.setFormatter(detailed_formatter)
-    root_logger.addHandler(file_handler)
-    
+        log_filename = LOGS_DIR / f"codegen_{timestamp}_{run_id}.log"
+
+    _router.open_run(run_id, log_filename)
+    _current_run.set(run_id)
+    _current_log_file.set(str(log_filename))
+
     # Log the initialization
     logger = logging.getLogger(__name__)
     logger.info("=" * 80)
     logger.info(f"Logging initialized - Log file: {log_filename}")
     logger.info("=" * 80)
-    
-    return str(log_filename)
\ No newline at end of file
+
+    return str(log_filename)
+
+
+def close_run_logging(run_id=None):
+    """
+    Close a run's log file once every record queued before this call is written.
+
+    Args:
+        run_id: Run to close (defaults to the run bound to the current context)
+    """
+    run_id = run_id or _current_run.get()
+    if run_id is None or _log_queue is None:
+        return
+
+    marker = logging.LogRecord(__name__, logging.DEBUG, __file__, 0, "close run log", None, None)
+    marker.close_run = run_id
+    _log_queue.put_nowait(marker)
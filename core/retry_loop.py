@@ -1,106 +1,273 @@
 import base64
+import hashlib
 import logging
+import time
+from pathlib import PurePosixPath
 from core.json_guard import safe_parse_json
 from core.schema_validator import validate_json
-from core.base64_utils import safe_b64decode
+from core.artifact import prompt_text, to_artifacts
+from core.symbol_index import build_symbol_index, render_signatures
+from core.tracing import span
+from core.run_budget import current_budget
+from core.llm_client import call_overrides, reset_last_call
+from core.adaptive_params import agent_key, llm_params, record_call, retry_limit, REVIEW_LOOP
+from core.hedging import hedged_reply
 
 logger = logging.getLogger(__name__)
 
+# Upper bounds - the limits actually used are tuned from history (see core.adaptive_params)
 MAX_LOGIC_RETRIES = 3
 MAX_FORMAT_RETRIES = 5
 
-def generate_with_review(architecture_json, coding_agent, review_agent):
+
+def _timed_reply(agent, content, budget, required_keys=None):
+    """
+    generate_reply with the agent's tuned parameters (hedged when slow), and
+    the call's duration and tokens recorded on the run budget.
+
+    Returns:
+        Tuple of (response, monotonic start time)
+    """
+    reset_last_call()
+    started, tokens_before = time.monotonic(), budget.tokens_used if budget else 0
+    with call_overrides(**llm_params(agent)):
+        response = hedged_reply(agent, [{"role": "user", "content": content}], required_keys=required_keys)
+    if budget is not None:
+        budget.record_attempt(time.monotonic() - started, budget.tokens_used - tokens_before)
+    return response, started
+
+
+def _submission_hash(files) -> str:
+    """Identity of a whole submission: its paths and file contents."""
+    digest = hashlib.sha256()
+    for path, file_digest in sorted((f["path"], f.digest) for f in files):
+        digest.update(f"{path}\0{file_digest}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _issues_for(path, issues):
+    """Review issues that name a file (by path or file name)."""
+    name = PurePosixPath(path).name
+    return [issue for issue in issues if path in issue or name in issue]
+
+
+def _review_prompt(changed, unchanged, verdicts):
+    """
+    Changed files in full - the reviewer gates them, so it reads all of their
+    code - and unchanged ones as their interface (imports, signatures) and earlier issues.
+    """
+    content = prompt_text(changed)
+    if unchanged:
+        index = build_symbol_index(unchanged)
+        summaries = [
+            f"- {f['path']}: " + "; ".join(verdicts[f.digest]["issues"])
+            for f in unchanged
+        ]
+        content += (
+            "\n\nPREVIOUSLY REJECTED FILES (unchanged since your last review, source not shown):\n"
+            + "\n".join(summaries)
+        )
+        if index:
+            content += (
+                "\n\nTHEIR IMPORTS AND SIGNATURES (for checking the changed files against them):\n"
+                + "\n\n".join(render_signatures(path, entry) for path, entry in index.items())
+            )
+    return content
+
+
+def _record_verdicts(verdicts, files, review_json):
+    """
+    Cache a rejection for every file the review names.
+
+    Files a rejecting review does not name get no verdict of their own - the
+    status belongs to the whole submission - so they are reviewed again.
+    """
+    if review_json["status"] != "REJECTED":
+        return
+    for f in files:
+        issues = _issues_for(f["path"], review_json.get("issues", []))
+        if issues:
+            verdicts[f.digest] = {"status": "REJECTED", "issues": issues}
+
+
+def _with_cached_issues(review_json, unchanged, verdicts):
+    """Carry issues of unchanged, previously rejected files into the feedback (and the status)."""
+    issues = list(review_json.get("issues", []))
+    for f in unchanged:
+        issues.extend(i for i in verdicts[f.digest]["issues"] if i not in issues)
+    if unchanged:
+        return {**review_json, "status": "REJECTED", "issues": issues}
+    return {**review_json, "issues": issues}
+
+
+def generate_with_review(architecture_json, coding_agent, review_agent, initial_feedback=None):
+    """
+    Generate code and iterate with the review agent until it is approved.
+
+    Args:
+        architecture_json: Architecture the code implements
+        coding_agent: Agent producing the files
+        review_agent: Agent reviewing them
+        initial_feedback: Review-style feedback for the first attempt
+            (e.g. failures from running the generated tests)
+
+    Rejections are memoized per file content hash for the files a review
+    names, so later rounds send those files only as their interface while
+    they are unchanged; every other file is reviewed again. Verdicts of whole
+    submissions are memoized by submission hash: an identical resubmission is
+    sent back for a forced variation (or, on the last attempt, gets its
+    earlier verdict) without a review call.
+    """
     logger.info("="*60)
     logger.info("Starting Code Generation with Review Loop")
     logger.info("="*60)
     
-    feedback = None
+    feedback = initial_feedback
     logic_attempts = 0
     format_attempts = 0
+    round_number = 0
+    verdicts = {}  # file digest -> {status, issues} of files a rejecting review named
+    submission_verdicts = {}  # submission hash -> review verdict
+    repeats = 0
+    last_reviewed = None  # most recent code that got a (rejecting) review
+    budget = current_budget()
+    coder, reviewer = agent_key(coding_agent, "coding_agent"), agent_key(review_agent, "review_agent")
+    max_logic = retry_limit(REVIEW_LOOP, MAX_LOGIC_RETRIES)
+    max_format = retry_limit(coder, MAX_FORMAT_RETRIES)
 
-    while logic_attempts < MAX_LOGIC_RETRIES:
-        logger.info(f"📝 Coding logic attempt {logic_attempts + 1}/{MAX_LOGIC_RETRIES}")
+    while logic_attempts < max_logic:
+        if round_number and budget is not None and not budget.allow_retry("review_loop", calls=2):
+            if last_reviewed is None:
+                raise RuntimeError("Code generation stopped: stage budget exhausted before any code was reviewed")
+            logger.warning("⚠️  Accepting the last reviewed code - stage budget exhausted")
+            return last_reviewed
+        round_number += 1
+        with span("review_loop.round", round=round_number, logic_attempt=logic_attempts + 1):
+            logger.info(f"📝 Coding logic attempt {logic_attempts + 1}/{max_logic}")
 
-        prompt = architecture_json if not feedback else {
-            "architecture": architecture_json,
-            "review_feedback": feedback
-        }
+            prompt = architecture_json if not feedback else {
+                "architecture": architecture_json,
+                "review_feedback": feedback
+            }
+            if repeats:
+                prompt = {
+                    **prompt,
+                    "resubmission_notice": (
+                        "Your previous output was identical to an already rejected submission. "
+                        "Produce a different implementation that resolves the review feedback."
+                    ),
+                    "variation": repeats,
+                }
         
-        if feedback:
-            logger.info(f"Applying review feedback: {feedback.get('issues', 'N/A')}")
+            if feedback:
+                logger.info(f"Applying review feedback: {feedback.get('issues', 'N/A')}")
 
-        # CODE GENERATION 
-        logger.info("Generating code...")
-        code_response = coding_agent.generate_reply(
-            messages=[{"role": "user", "content": str(prompt)}]
-        )
-        logger.debug(f"Code response length: {len(code_response.get('content', ''))} characters")
+            # CODE GENERATION 
+            logger.info("Generating code...")
+            with span("llm.wait", agent="coding_agent"):
+                code_response, call_started = _timed_reply(coding_agent, str(prompt), budget, ["files"])
+            logger.debug(f"Code response length: {len(code_response.get('content', ''))} characters")
         
-        # CODE FORMAT HANDLING 
-        try:
-            code_json = validate_json(
-                safe_parse_json(code_response["content"]),
-                ["files"]
-            )
-            logger.info(f"✓ Code JSON validated - {len(code_json.get('files', []))} files generated")
-        except Exception as e:
-            format_attempts += 1
-            logger.warning(f"✗ Code JSON format error (attempt {format_attempts}/{MAX_FORMAT_RETRIES}): {str(e)}")
+            # CODE FORMAT HANDLING 
+            try:
+                code_json = validate_json(
+                    safe_parse_json(code_response["content"]),
+                    ["files"]
+                )
+                logger.info(f"✓ Code JSON validated - {len(code_json.get('files', []))} files generated")
+                # Base64 content is decoded lazily, on first read
+                code_json["files"] = to_artifacts(code_json["files"])
+                record_call(coder, format_attempts + 1, "ok", call_started)
+            except Exception as e:
+                record_call(coder, format_attempts + 1, "format_error", call_started)
+                format_attempts += 1
+                logger.warning(f"✗ Code JSON format error (attempt {format_attempts}/{max_format}): {str(e)}")
 
-            if format_attempts >= MAX_FORMAT_RETRIES:
-                logger.error("Too many code JSON format failures - aborting")
-                raise RuntimeError("Too many code JSON format failures")
+                if format_attempts >= max_format:
+                    logger.error("Too many code JSON format failures - aborting")
+                    raise RuntimeError("Too many code JSON format failures")
 
-            continue  
+                continue  
 
-        #  REVIEW
-        logger.info("Submitting code for review...")
-        review_response = review_agent.generate_reply(
-            messages=[{"role": "user", "content": str(code_json)}]
-        )
+            submission = _submission_hash(code_json["files"])
+            if submission in submission_verdicts and logic_attempts < max_logic - 1:
+                repeats += 1
+                logic_attempts += 1
+                logger.warning("✗ Identical resubmission of rejected code - retrying with forced variation")
+                continue
 
-        # REVIEW FORMAT HANDLING 
-        try:
-            review_json = validate_json(
-                safe_parse_json(review_response["content"]),
-                ["status", "issues", "suggested_fixes"]
-            )
-            logger.info(f"Review status: {review_json.get('status', 'UNKNOWN')}")
-        except Exception as e:
-            format_attempts += 1
-            logger.warning(f"✗ Review JSON format error (attempt {format_attempts}/{MAX_FORMAT_RETRIES}): {str(e)}")
-
-            if format_attempts >= MAX_FORMAT_RETRIES:
-                logger.error("Too many review JSON format failures - returning error")
-                return {
-                    "files": [],
-                    "error": "Code generation failed due to repeated JSON format errors"
+            changed = [f for f in code_json["files"] if f.digest not in verdicts]
+            unchanged = [f for f in code_json["files"] if f.digest in verdicts]
+
+            #  REVIEW
+            if submission in submission_verdicts:
+                review_json = dict(submission_verdicts[submission])
+                logger.info(f"Review status: {review_json['status']} (from cached submission verdict)")
+            elif not changed:
+                # Every file is an unchanged, previously rejected one (e.g. a file was only removed)
+                review_json = {
+                    "status": "REJECTED",
+                    "issues": [],
+                    "suggested_fixes": feedback.get("suggested_fixes", []) if feedback else [],
                 }
-            continue 
+                review_json = _with_cached_issues(review_json, unchanged, verdicts)
+                logger.info(f"Review status: {review_json['status']} (from cached file verdicts)")
+            else:
+                logger.info(
+                    f"Submitting code for review ({len(changed)} changed files, {len(unchanged)} verdicts reused)..."
+                )
+                with span("llm.wait", agent="review_agent", files=len(changed), cached=len(unchanged)):
+                    review_response, call_started = _timed_reply(
+                        review_agent, _review_prompt(changed, unchanged, verdicts), budget,
+                        ["status", "issues", "suggested_fixes"]
+                    )
+
+                # REVIEW FORMAT HANDLING 
+                try:
+                    review_json = validate_json(
+                        safe_parse_json(review_response["content"]),
+                        ["status", "issues", "suggested_fixes"]
+                    )
+                    logger.info(f"Review status: {review_json.get('status', 'UNKNOWN')}")
+                    record_call(reviewer, format_attempts + 1, str(review_json["status"]).lower(), call_started)
+                except Exception as e:
+                    record_call(reviewer, format_attempts + 1, "format_error", call_started)
+                    format_attempts += 1
+                    logger.warning(f"✗ Review JSON format error (attempt {format_attempts}/{max_format}): {str(e)}")
+
+                    if format_attempts >= max_format:
+                        logger.error("Too many review JSON format failures - returning error")
+                        return {
+                            "files": [],
+                            "error": "Code generation failed due to repeated JSON format errors"
+                        }
+                    continue 
+
+                _record_verdicts(verdicts, changed, review_json)
+                review_json = _with_cached_issues(review_json, unchanged, verdicts)
     
-        if review_json["status"] == "REJECTED" and logic_attempts >= 2:
-            logger.warning("⚠️  Forcing approval after multiple advisory reviews")
-            review_json["status"] = "APPROVED"
+            forced = review_json["status"] == "REJECTED" and logic_attempts >= max_logic - 1
+            if forced:
+                logger.warning("⚠️  Forcing approval after multiple advisory reviews")
+                review_json["status"] = "APPROVED"
 
-        # DECISION 
-        if review_json["status"] == "APPROVED":
-            logger.info("✓ Code APPROVED by reviewer")
+            # DECISION 
+            if review_json["status"] == "APPROVED":
+                logger.info("✓ Code APPROVED by reviewer")
+                record_call(REVIEW_LOOP, logic_attempts + 1, "forced" if forced else "approved")
             
-            # Decode base64 content
-            for f in code_json["files"]:
-                f["content"] = safe_b64decode(f["content_base64"])
-                del f["content_base64"]
-                logger.debug(f"Decoded file: {f['path']}")
-
-            logger.info(f"Code generation completed successfully with {len(code_json['files'])} files")
-            return code_json
-
-        logger.warning(f"✗ Code REJECTED by reviewer")
-        logger.warning(f"Issues: {review_json['issues']}")
-        logger.info(f"Suggested fixes: {review_json.get('suggested_fixes', 'None provided')}")
+                logger.info(f"Code generation completed successfully with {len(code_json['files'])} files")
+                return code_json
+
+            logger.warning(f"✗ Code REJECTED by reviewer")
+            logger.warning(f"Issues: {review_json['issues']}")
+            logger.info(f"Suggested fixes: {review_json.get('suggested_fixes', 'None provided')}")
         
-        feedback = review_json
-        logic_attempts += 1 
+            feedback = review_json
+            last_reviewed = code_json
+            submission_verdicts[submission] = review_json
+            repeats = 0
+            logic_attempts += 1 
 
     logger.error("✗ Code generation failed after max logical retries")
     raise RuntimeError("Code generation failed after max logical retries")
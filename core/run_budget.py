@@ -0,0 +1,185 @@
+"""
+Run Budget
+Wall-clock and token budget of one pipeline run, split across its stages.
+
+- Each stage gets a window of the budget still left when it starts, in
+  proportion to its share among the stages not yet run, so time a fast stage
+  does not use carries over to the later ones.
+- Agent retries (format retries, review rounds) are only started while the
+  stage window has room for another attempt of the length seen so far.
+- Optional stages (docs, deploy, test repair) are degraded instead of run
+  when the remaining run budget cannot cover them; the reasons end up in the
+  pipeline result.
+
+The budget of the current run is bound through contextvars (like the run ID
+for logging), so agent runners and the LLM client can consult it without
+threading it through every call.
+"""
+import contextvars
+import logging
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+RUN_DEADLINE_SECONDS = float(os.getenv("PIPELINE_DEADLINE_SECONDS", "600"))
+RUN_MAX_TOKENS = int(os.getenv("PIPELINE_MAX_TOKENS", "250000"))  # 0 disables either limit
+
+# Relative share of the run budget per stage
+STAGE_SHARES = {
+    "requirements": 0.10,
+    "design": 0.15,
+    "code": 0.40,
+    "tests": 0.15,
+    "docs": 0.10,
+    "deploy": 0.10,
+}
+OPTIONAL_STAGES = ("docs", "deploy", "test_repair")
+
+_current_budget = contextvars.ContextVar("current_budget", default=None)
+
+
+class RunBudget:
+    """Deadline and token allowance of one run, tracked per stage."""
+
+    def __init__(
+        self,
+        deadline_seconds: float = RUN_DEADLINE_SECONDS,
+        max_tokens: int = RUN_MAX_TOKENS,
+        shares: Optional[Dict[str, float]] = None,
+    ):
+        self.deadline_seconds = deadline_seconds
+        self.max_tokens = max_tokens
+        self.shares = dict(shares or STAGE_SHARES)
+        self.started = time.monotonic()
+        self.tokens_used = 0
+        self.stage = None
+        self.stage_deadline = None
+        self.stage_tokens = None
+        self.stage_tokens_start = 0
+        self.attempts = 0
+        self.attempt_seconds = 0.0
+        self.attempt_tokens = 0
+        self.cut_retries = {}
+        self.degraded = {}
+        self._lock = threading.Lock()
+        self._pending = [s for s in self.shares]
+
+    # Accounting
+
+    def add_tokens(self, tokens: int) -> None:
+        with self._lock:
+            self.tokens_used += tokens
+
+    def record_attempt(self, seconds: float, tokens: int = 0) -> None:
+        """Record one finished LLM attempt, used to predict the next one."""
+        with self._lock:
+            self.attempts += 1
+            self.attempt_seconds += seconds
+            self.attempt_tokens += tokens
+
+    def remaining_seconds(self) -> float:
+        return self.deadline_seconds - (time.monotonic() - self.started)
+
+    def remaining_tokens(self) -> int:
+        return self.max_tokens - self.tokens_used
+
+    def _expected_attempt(self):
+        """Mean (seconds, tokens) of the attempts of this run so far."""
+        if not self.attempts:
+            return 0.0, 0
+        return self.attempt_seconds / self.attempts, self.attempt_tokens // self.attempts
+
+    # Stages
+
+    def start_stage(self, stage: str) -> None:
+        """Open the budget window of a stage."""
+        pending_share = sum(self.shares.get(s, 0.0) for s in self._pending) or 1.0
+        # Stages without a share (e.g. test repair) get whatever is left
+        fraction = min(1.0, self.shares[stage] / pending_share) if stage in self._pending else 1.0
+        if stage in self._pending:
+            self._pending.remove(stage)
+
+        self.stage = stage
+        self.stage_deadline = time.monotonic() + max(0.0, self.remaining_seconds()) * fraction
+        self.stage_tokens = max(0, self.remaining_tokens()) * fraction
+        self.stage_tokens_start = self.tokens_used
+
+    def allow_retry(self, what: str, calls: int = 1) -> bool:
+        """
+        Whether another attempt fits in the current stage window.
+
+        Args:
+            what: Name of the retried step, for logging and the summary
+            calls: LLM calls one attempt makes
+
+        Returns:
+            True if the retry should run
+        """
+        if self.stage is None:
+            return True
+        expected_seconds, expected_tokens = self._expected_attempt()
+        expected_seconds, expected_tokens = expected_seconds * calls, expected_tokens * calls
+        seconds_left = self.stage_deadline - time.monotonic()
+        tokens_left = self.stage_tokens - (self.tokens_used - self.stage_tokens_start)
+
+        reason = None
+        if self.deadline_seconds > 0 and (seconds_left < expected_seconds or seconds_left <= 0):
+            reason = f"{max(0.0, seconds_left):.1f}s left in the {self.stage} window, an attempt takes ~{expected_seconds:.1f}s"
+        elif self.max_tokens and (tokens_left < expected_tokens or tokens_left <= 0):
+            reason = f"{tokens_left:.0f} tokens left in the {self.stage} window, an attempt uses ~{expected_tokens}"
+        if reason is None:
+            return True
+
+        with self._lock:
+            self.cut_retries[f"{self.stage}:{what}"] = reason
+        logger.warning(f"⏱️ Budget: not retrying {what} - {reason}")
+        return False
+
+    def degrade_reason(self, stage: str) -> Optional[str]:
+        """
+        Reason to degrade an optional stage, or None if it fits the remaining budget.
+        Required stages are never degraded.
+        """
+        if stage not in OPTIONAL_STAGES:
+            return None
+        expected_seconds, expected_tokens = self._expected_attempt()
+        seconds_left = self.remaining_seconds()
+        tokens_left = self.remaining_tokens()
+
+        reason = None
+        if self.deadline_seconds > 0 and (seconds_left <= 0 or seconds_left < expected_seconds):
+            reason = f"run deadline: {max(0.0, seconds_left):.0f}s of {self.deadline_seconds:.0f}s left"
+        elif self.max_tokens and (tokens_left <= 0 or tokens_left < expected_tokens):
+            reason = f"token budget: {max(0, tokens_left)} of {self.max_tokens} tokens left"
+        if reason:
+            self.degraded[stage] = reason
+            logger.warning(f"⏱️ Budget: degrading {stage} - {reason}")
+        return reason
+
+    def summary(self) -> Dict:
+        """JSON-serializable budget usage for the run result."""
+        return {
+            "deadline_seconds": self.deadline_seconds,
+            "elapsed_seconds": round(time.monotonic() - self.started, 1),
+            "max_tokens": self.max_tokens,
+            "tokens_used": self.tokens_used,
+            "cut_retries": dict(self.cut_retries),
+            "degraded": dict(self.degraded),
+        }
+
+
+def current_budget() -> Optional[RunBudget]:
+    """Budget of the run executing in this context, if any."""
+    return _current_budget.get()
+
+
+def bind_budget(budget: Optional[RunBudget]) -> contextvars.Token:
+    """Bind a budget to the current context; reset with unbind_budget(token)."""
+    return _current_budget.set(budget)
+
+
+def unbind_budget(token: contextvars.Token) -> None:
+    _current_budget.reset(token)
@@ -0,0 +1,469 @@
+"""
+Run Store
+SQLite-backed history of pipeline runs: inputs, per-stage outputs,
+artifact manifests, latencies and retry counts.
+
+Written by run_pipeline; read by the UI to reopen past runs without calling
+an LLM. Writes never raise - a broken history database must not fail a run.
+"""
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from core.artifact import json_default
+
+logger = logging.getLogger(__name__)
+
+DB_PATH = Path(__file__).parent.parent / "data" / "runs.db"
+
+# Stage name -> key in the run_pipeline result dict
+STAGE_RESULT_KEYS = {
+    "requirements": "requirements",
+    "design": "architecture",
+    "code": "code",
+    "tests": "tests",
+    "docs": "docs",
+    "deploy": "deploy",
+    "test_run": "test_results",
+    "lineage": "lineage",
+    "budget": "budget",
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    user_id TEXT,
+    project_name TEXT NOT NULL,
+    requirement TEXT NOT NULL,
+    requirement_hash TEXT NOT NULL,
+    status TEXT NOT NULL,
+    error TEXT,
+    log_file TEXT,
+    created_at REAL NOT NULL,
+    finished_at REAL,
+    duration_ms REAL,
+    manifest_json TEXT,
+    save_stats_json TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_runs_requirement_hash ON runs (requirement_hash);
+CREATE INDEX IF NOT EXISTS idx_runs_project_created ON runs (project_name, created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_runs_created ON runs (created_at DESC);
+
+CREATE TABLE IF NOT EXISTS stages (
+    run_id TEXT NOT NULL REFERENCES runs (run_id) ON DELETE CASCADE,
+    stage TEXT NOT NULL,
+    status TEXT NOT NULL,
+    output_json TEXT,
+    latency_ms REAL,
+    attempts INTEGER,
+    input_hash TEXT,
+    recorded_at REAL NOT NULL,
+    PRIMARY KEY (run_id, stage)
+);
+CREATE INDEX IF NOT EXISTS idx_stages_stage ON stages (stage);
+
+CREATE TABLE IF NOT EXISTS agent_calls (
+    run_id TEXT,
+    agent TEXT NOT NULL,
+    attempt INTEGER NOT NULL,
+    outcome TEXT NOT NULL,
+    prompt_tokens INTEGER,
+    completion_tokens INTEGER,
+    max_tokens INTEGER,
+    truncated INTEGER NOT NULL DEFAULT 0,
+    latency_ms REAL,
+    recorded_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_agent_calls_agent ON agent_calls (agent, recorded_at DESC);
+CREATE INDEX IF NOT EXISTS idx_agent_calls_run ON agent_calls (run_id);
+"""
+
+# Applied after _SCHEMA; each may already be applied on existing databases
+_MIGRATIONS = (
+    "ALTER TABLE stages ADD COLUMN input_hash TEXT",
+    "CREATE INDEX IF NOT EXISTS idx_stages_input ON stages (stage, input_hash)",
+    "ALTER TABLE runs ADD COLUMN user_id TEXT",
+    "CREATE INDEX IF NOT EXISTS idx_runs_user_created ON runs (user_id, created_at DESC)",
+)
+
+_init_lock = threading.Lock()
+_initialized = False
+
+
+def requirement_hash(requirement: str) -> str:
+    """sha256 of the requirement text with whitespace normalized."""
+    normalized = " ".join(requirement.split())
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+def _connect() -> sqlite3.Connection:
+    global _initialized
+
+    conn = sqlite3.connect(DB_PATH, timeout=30)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA foreign_keys = ON")
+
+    if not _initialized:
+        with _init_lock:
+            if not _initialized:
+                conn.execute("PRAGMA journal_mode = WAL")
+                conn.executescript(_SCHEMA)
+                for migration in _MIGRATIONS:
+                    try:
+                        conn.execute(migration)
+                    except sqlite3.OperationalError:
+                        pass  # already applied
+                _initialized = True
+
+    return conn
+
+
+def _write(sql: str, params: tuple) -> None:
+    try:
+        DB_PATH.parent.mkdir(parents=True, exist_ok=True)
+        with closing(_connect()) as conn, conn:
+            conn.execute(sql, params)
+    except Exception as e:
+        logger.warning(f"Run store write failed: {str(e)}")
+
+
+def start_run(
+    run_id: str,
+    project_name: str,
+    requirement: str,
+    log_file: Optional[str] = None,
+    user_id: Optional[str] = None
+) -> None:
+    """
+    Record the start of a run.
+
+    Args:
+        run_id: Run identifier
+        project_name: Project name
+        requirement: User requirement text
+        log_file: Path of the run's log file
+        user_id: User the run belongs to (the UI's stable user ID; None for runs outside the UI)
+    """
+    _write(
+        "INSERT OR REPLACE INTO runs (run_id, user_id, project_name, requirement, requirement_hash, status, log_file, created_at) "
+        "VALUES (?, ?, ?, ?, ?, 'running', ?, ?)",
+        (run_id, user_id, project_name, requirement, requirement_hash(requirement), log_file, time.time())
+    )
+
+
+def record_stage(
+    run_id: str,
+    stage: str,
+    output: Any,
+    latency_ms: Optional[float] = None,
+    attempts: Optional[int] = None,
+    status: str = "ok",
+    input_hash: Optional[str] = None
+) -> None:
+    """
+    Record one stage's output and timing.
+
+    Args:
+        run_id: Run identifier
+        stage: Stage name (see STAGE_RESULT_KEYS)
+        output: JSON-serializable stage output
+        latency_ms: Stage wall-clock time
+        attempts: LLM attempts/rounds used by the stage
+        status: 'ok', 'failed' or 'skipped'
+        input_hash: Hash of the stage input, for reuse by later runs (see core.lineage)
+    """
+    _write(
+        "INSERT OR REPLACE INTO stages (run_id, stage, status, output_json, latency_ms, attempts, input_hash, recorded_at) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        (run_id, stage, status, json.dumps(output, default=json_default), latency_ms, attempts, input_hash, time.time())
+    )
+
+
+def finish_run(
+    run_id: str,
+    status: str,
+    error: Optional[str] = None,
+    duration_ms: Optional[float] = None,
+    manifest: Optional[Dict] = None,
+    save_stats: Optional[Dict] = None
+) -> None:
+    """
+    Record the end of a run.
+
+    Args:
+        run_id: Run identifier
+        status: 'succeeded' or 'failed'
+        error: Error message for failed runs
+        duration_ms: Total wall-clock time
+        manifest: Project artifact manifest (file_type -> {path: sha256})
+        save_stats: Save statistics from run_pipeline
+    """
+    _write(
+        "UPDATE runs SET status = ?, error = ?, finished_at = ?, duration_ms = ?, manifest_json = ?, save_stats_json = ? "
+        "WHERE run_id = ?",
+        (
+            status, error, time.time(), duration_ms,
+            json.dumps(manifest) if manifest is not None else None,
+            json.dumps(save_stats) if save_stats is not None else None,
+            run_id
+        )
+    )
+
+
+def record_agent_call(
+    run_id: Optional[str],
+    agent: str,
+    attempt: int,
+    outcome: str,
+    usage: Optional[Dict] = None,
+    latency_ms: Optional[float] = None
+) -> None:
+    """
+    Record one LLM call of an agent, for parameter tuning and run estimates.
+
+    Args:
+        run_id: Run the call belongs to
+        agent: Agent name (or 'review_loop' for whole review rounds)
+        attempt: Attempt number within the retry loop
+        outcome: 'ok', 'format_error', 'approved', 'rejected', ...
+        usage: prompt_tokens, completion_tokens, max_tokens and truncated of the call
+        latency_ms: Call duration
+    """
+    usage = usage or {}
+    _write(
+        "INSERT INTO agent_calls (run_id, agent, attempt, outcome, prompt_tokens, completion_tokens, max_tokens, truncated, latency_ms, recorded_at) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        (
+            run_id, agent, attempt, outcome,
+            usage.get("prompt_tokens"), usage.get("completion_tokens"), usage.get("max_tokens"),
+            int(bool(usage.get("truncated"))), latency_ms, time.time()
+        )
+    )
+
+
+def _read(sql: str, params: tuple) -> List[sqlite3.Row]:
+    if not DB_PATH.exists():
+        return []
+    try:
+        with closing(_connect()) as conn:
+            return conn.execute(sql, params).fetchall()
+    except Exception as e:
+        logger.warning(f"Run store read failed: {str(e)}")
+        return []
+
+
+def list_runs(
+    project_name: Optional[str] = None,
+    status: Optional[str] = None,
+    limit: int = 50,
+    since: Optional[float] = None,
+    user_id: Optional[str] = None
+) -> List[Dict]:
+    """
+    List recent runs, newest first.
+
+    Args:
+        project_name: Only runs of this project
+        status: Only runs with this status
+        limit: Maximum number of runs
+        since: Only runs that finished after this timestamp
+        user_id: Only runs of this user
+
+    Returns:
+        List of run summary dictionaries
+    """
+    clauses, params = [], []
+    if user_id:
+        clauses.append("user_id = ?")
+        params.append(user_id)
+    if project_name:
+        clauses.append("project_name = ?")
+        params.append(project_name)
+    if status:
+        clauses.append("status = ?")
+        params.append(status)
+    if since is not None:
+        clauses.append("finished_at > ?")
+        params.append(since)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+
+    rows = _read(
+        "SELECT run_id, user_id, project_name, requirement, requirement_hash, status, error, log_file, created_at, finished_at, duration_ms "
+        f"FROM runs {where} ORDER BY created_at DESC LIMIT ?",
+        (*params, limit)
+    )
+    return [dict(row) for row in rows]
+
+
+def find_runs_by_requirement(requirement: str, status: str = "succeeded", limit: int = 10) -> List[Dict]:
+    """
+    Find runs whose requirement text matches exactly (whitespace-insensitive).
+
+    Args:
+        requirement: Requirement text
+        status: Only runs with this status
+        limit: Maximum number of runs
+
+    Returns:
+        List of run summary dictionaries, newest first
+    """
+    rows = _read(
+        "SELECT run_id, project_name, status, created_at, duration_ms FROM runs "
+        "WHERE requirement_hash = ? AND status = ? ORDER BY created_at DESC LIMIT ?",
+        (requirement_hash(requirement), status, limit)
+    )
+    return [dict(row) for row in rows]
+
+
+def completed_stages(run_id: str) -> List[str]:
+    """Names of the stages a (possibly still running) run has finished."""
+    rows = _read("SELECT stage FROM stages WHERE run_id = ? AND status = 'ok'", (run_id,))
+    return [row["stage"] for row in rows]
+
+
+def get_stage_output(run_id: str, stage: str) -> Optional[Any]:
+    """
+    Get one stage's recorded output.
+
+    Args:
+        run_id: Run identifier
+        stage: Stage name
+
+    Returns:
+        Decoded output, or None if not recorded
+    """
+    rows = _read(
+        "SELECT output_json FROM stages WHERE run_id = ? AND stage = ? AND status = 'ok'",
+        (run_id, stage)
+    )
+    return json.loads(rows[0]["output_json"]) if rows else None
+
+
+def find_stage_by_input(stage: str, input_hash: str) -> Optional[Dict]:
+    """
+    Find the most recent successful output of a stage for an identical input.
+
+    Args:
+        stage: Stage name
+        input_hash: Hash of the stage input
+
+    Returns:
+        Dictionary with 'run_id' and 'output' keys, or None
+    """
+    rows = _read(
+        "SELECT run_id, output_json FROM stages WHERE stage = ? AND input_hash = ? AND status = 'ok' "
+        "ORDER BY recorded_at DESC LIMIT 1",
+        (stage, input_hash)
+    )
+    if not rows:
+        return None
+    return {"run_id": rows[0]["run_id"], "output": json.loads(rows[0]["output_json"])}
+
+
+def recent_agent_calls(agent: str, limit: int = 200) -> List[Dict]:
+    """Most recent recorded calls of an agent, newest first."""
+    rows = _read(
+        "SELECT run_id, attempt, outcome, prompt_tokens, completion_tokens, max_tokens, truncated, latency_ms "
+        "FROM agent_calls WHERE agent = ? ORDER BY recorded_at DESC LIMIT ?",
+        (agent, limit)
+    )
+    return [dict(row) for row in rows]
+
+
+def run_costs(run_ids: Optional[List[str]] = None, limit: int = 50) -> List[Dict]:
+    """
+    Token totals and durations of succeeded runs.
+
+    Args:
+        run_ids: Only these runs (default: the most recent ones)
+        limit: Maximum number of runs
+
+    Returns:
+        List of dictionaries with run_id, tokens, calls and duration_ms, newest first
+    """
+    where = "r.status = 'succeeded'"
+    params = []
+    if run_ids is not None:
+        if not run_ids:
+            return []
+        where += f" AND r.run_id IN ({', '.join('?' * len(run_ids))})"
+        params.extend(run_ids)
+    rows = _read(
+        "SELECT r.run_id, r.duration_ms, COUNT(c.agent) AS calls, "
+        "SUM(COALESCE(c.prompt_tokens, 0) + COALESCE(c.completion_tokens, 0)) AS tokens "
+        f"FROM runs r JOIN agent_calls c ON c.run_id = r.run_id AND c.agent != 'review_loop' WHERE {where} "
+        "GROUP BY r.run_id ORDER BY r.created_at DESC LIMIT ?",
+        (*params, limit)
+    )
+    return [dict(row) for row in rows]
+
+
+def stage_latencies(run_ids: List[str]) -> Dict[str, List[float]]:
+    """
+    Recorded stage latencies of a set of runs.
+
+    Returns:
+        Dictionary of stage name -> list of latencies in milliseconds
+    """
+    latencies = {}
+    for start in range(0, len(run_ids), 500):
+        chunk = run_ids[start:start + 500]
+        rows = _read(
+            f"SELECT stage, latency_ms FROM stages WHERE run_id IN ({', '.join('?' * len(chunk))}) "
+            "AND latency_ms IS NOT NULL",
+            tuple(chunk)
+        )
+        for row in rows:
+            latencies.setdefault(row["stage"], []).append(row["latency_ms"])
+    return latencies
+
+
+def load_run(run_id: str) -> Optional[Dict]:
+    """
+    Rebuild a run_pipeline-shaped result from the store.
+
+    Args:
+        run_id: Run identifier
+
+    Returns:
+        Result dictionary (plus 'run' and 'stage_metrics' keys), or None if unknown
+    """
+    runs = _read("SELECT * FROM runs WHERE run_id = ?", (run_id,))
+    if not runs:
+        return None
+    run = dict(runs[0])
+
+    stages = _read(
+        "SELECT stage, status, output_json, latency_ms, attempts FROM stages WHERE run_id = ?",
+        (run_id,)
+    )
+
+    result = {}
+    stage_metrics = {}
+    for row in stages:
+        stage_metrics[row["stage"]] = {
+            "status": row["status"],
+            "latency_ms": row["latency_ms"],
+            "attempts": row["attempts"],
+        }
+        key = STAGE_RESULT_KEYS.get(row["stage"])
+        if key and row["status"] == "ok" and row["output_json"] is not None:
+            result[key] = json.loads(row["output_json"])
+
+    if run.get("save_stats_json"):
+        result["save_stats"] = json.loads(run["save_stats_json"])
+    if run["status"] == "failed":
+        result["error"] = run.get("error") or "Run failed"
+
+    result["manifest"] = json.loads(run["manifest_json"]) if run.get("manifest_json") else {}
+    result["stage_metrics"] = stage_metrics
+    result["run"] = {
+        k: run[k] for k in ("run_id", "user_id", "project_name", "requirement", "status", "log_file", "created_at", "duration_ms")
+    }
+    return result
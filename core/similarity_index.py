@@ -0,0 +1,183 @@
+"""
+Requirement Similarity Index
+Local MinHash index over the requirement texts of past successful runs, used
+to reuse (or draft from) their requirements and architecture outputs.
+
+- Texts are normalized to lowercase word tokens and shingled into word 3-grams.
+- Each text gets a MinHash signature; LSH banding narrows lookups to candidate
+  runs before the estimated Jaccard similarity is compared.
+- The index is built from the run store on first use and refreshed with newer
+  runs on every lookup, so runs finished by other processes are picked up.
+- Lookups only match runs of the same user (the UI's stable user ID), so one user's
+  requirements are never offered to another.
+"""
+import hashlib
+import logging
+import os
+import random
+import re
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from core import run_store
+
+logger = logging.getLogger(__name__)
+
+NUM_PERMUTATIONS = 128
+LSH_BANDS = 32
+SHINGLE_SIZE = 3
+MAX_INDEXED_RUNS = 2000
+
+# Estimated Jaccard similarity at which prior outputs are reused as-is / offered as a draft
+REUSE_THRESHOLD = float(os.getenv("REQUIREMENT_REUSE_THRESHOLD", "0.9"))
+DRAFT_THRESHOLD = float(os.getenv("REQUIREMENT_DRAFT_THRESHOLD", "0.6"))
+
+_MAX_HASH = (1 << 64) - 1
+_ROWS_PER_BAND = NUM_PERMUTATIONS // LSH_BANDS
+
+# Fixed seed - signatures must be comparable across processes and restarts
+_MASKS = [random.Random(7919 + i).getrandbits(64) for i in range(NUM_PERMUTATIONS)]
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def _shingles(text: str) -> set:
+    tokens = _TOKEN_RE.findall(text.lower())
+    if len(tokens) < SHINGLE_SIZE:
+        return {" ".join(tokens)} if tokens else set()
+    return {" ".join(tokens[i:i + SHINGLE_SIZE]) for i in range(len(tokens) - SHINGLE_SIZE + 1)}
+
+
+def minhash_signature(text: str) -> Tuple[int, ...]:
+    """
+    MinHash signature of a text's word shingles.
+
+    Args:
+        text: Requirement text
+
+    Returns:
+        Tuple of NUM_PERMUTATIONS minimum hash values
+    """
+    hashes = [
+        int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "big")
+        for s in _shingles(text)
+    ]
+    if not hashes:
+        return tuple([_MAX_HASH] * NUM_PERMUTATIONS)
+    return tuple(min(h ^ mask for h in hashes) for mask in _MASKS)
+
+
+def estimate_similarity(a: Tuple[int, ...], b: Tuple[int, ...]) -> float:
+    """Estimated Jaccard similarity of the shingle sets behind two signatures."""
+    return sum(1 for x, y in zip(a, b) if x == y) / NUM_PERMUTATIONS
+
+
+def requirement_similarity(a: str, b: str) -> float:
+    """Estimated Jaccard similarity of two requirement texts."""
+    return estimate_similarity(minhash_signature(a), minhash_signature(b))
+
+
+def _bands(signature: Tuple[int, ...]):
+    for band in range(LSH_BANDS):
+        start = band * _ROWS_PER_BAND
+        yield band, signature[start:start + _ROWS_PER_BAND]
+
+
+class RequirementIndex:
+    """In-memory MinHash/LSH index of run_id -> requirement signature."""
+
+    def __init__(self):
+        self._signatures: Dict[str, Tuple[int, ...]] = {}
+        self._projects: Dict[str, str] = {}
+        self._users: Dict[str, Optional[str]] = {}
+        self._buckets: Dict[Tuple[int, Tuple[int, ...]], List[str]] = {}
+        self._last_seen = None
+        self._lock = threading.Lock()
+
+    def add(self, run_id: str, requirement: str, project_name: str = "", user_id: Optional[str] = None) -> None:
+        signature = minhash_signature(requirement)
+        with self._lock:
+            if run_id in self._signatures:
+                return
+            self._signatures[run_id] = signature
+            self._projects[run_id] = project_name
+            self._users[run_id] = user_id
+            for key in _bands(signature):
+                self._buckets.setdefault(key, []).append(run_id)
+
+    def refresh(self) -> int:
+        """Index successful runs recorded since the last refresh. Returns the number added."""
+        runs = run_store.list_runs(status="succeeded", since=self._last_seen, limit=MAX_INDEXED_RUNS)
+        for run in runs:
+            self.add(run["run_id"], run["requirement"], run["project_name"], run["user_id"])
+        if runs:
+            self._last_seen = max(run["finished_at"] for run in runs)
+            logger.debug(f"Similarity index: +{len(runs)} runs ({len(self._signatures)} total)")
+        return len(runs)
+
+    def query(
+        self, requirement: str, min_similarity: float = DRAFT_THRESHOLD, limit: int = 5, user_id: Optional[str] = None
+    ) -> List[Dict]:
+        """
+        Find indexed runs with similar requirement texts.
+
+        Args:
+            requirement: Requirement text to look up
+            min_similarity: Minimum estimated Jaccard similarity
+            limit: Maximum number of matches
+            user_id: Only runs of this user (None: only runs recorded without a user)
+
+        Returns:
+            List of dictionaries with run_id, project_name and similarity, best first
+        """
+        signature = minhash_signature(requirement)
+        with self._lock:
+            candidates = {run_id for key in _bands(signature) for run_id in self._buckets.get(key, ())}
+            scored = [
+                (estimate_similarity(signature, self._signatures[run_id]), run_id)
+                for run_id in candidates
+                if self._users[run_id] == user_id
+            ]
+
+        matches = [
+            {"run_id": run_id, "project_name": self._projects[run_id], "similarity": round(score, 3)}
+            for score, run_id in sorted(scored, reverse=True)
+            if score >= min_similarity
+        ]
+        return matches[:limit]
+
+
+_index = RequirementIndex()
+
+
+def find_similar_run(
+    requirement: str, min_similarity: float = DRAFT_THRESHOLD, user_id: Optional[str] = None
+) -> Optional[Dict]:
+    """
+    Find the most similar past run of a user that has reusable requirements and architecture.
+
+    Args:
+        requirement: Requirement text
+        min_similarity: Minimum estimated Jaccard similarity
+        user_id: User whose runs to search (None: runs recorded without a user)
+
+    Returns:
+        Dictionary with run_id, project_name, similarity, requirements and
+        architecture keys, or None if no run is similar enough
+    """
+    if not requirement.strip():
+        return None
+
+    try:
+        _index.refresh()
+        matches = _index.query(requirement, min_similarity, user_id=user_id)
+    except Exception as e:
+        logger.warning(f"Similarity lookup failed: {str(e)}")
+        return None
+
+    for match in matches:
+        requirements = run_store.get_stage_output(match["run_id"], "requirements")
+        architecture = run_store.get_stage_output(match["run_id"], "design")
+        if requirements and architecture:
+            return {**match, "requirements": requirements, "architecture": architecture}
+    return None
@@ -0,0 +1,230 @@
+"""
+Symbol Index
+ast-based index of generated code, used to build compact agent prompts.
+
+Files are parsed once into a symbol table (modules, classes, functions,
+signatures, docstrings, imports and call edges). pack_context then fills the
+token budget with source, most relevant first:
+    1. whole focus files (e.g. the files a test targets), then whole small files
+    2. functions and classes other code calls the most, from the files that
+       did not fit whole
+Modules not shown whole are listed by name and contribute their signatures,
+so downstream agents see the whole project's interface without the full
+text of every file - and know which files they have only seen in part.
+"""
+import ast
+import logging
+import os
+from pathlib import PurePosixPath
+from typing import Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Rough chars-per-token ratio used for budgeting
+CHARS_PER_TOKEN = 4
+DOCSTRING_CHARS = 120
+
+# Context budget of the agents that read generated code (the reviewer reads changed files in full)
+TEST_CONTEXT_TOKENS = int(os.getenv("TEST_CONTEXT_TOKENS", "6000"))
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def _module_name(path: str) -> str:
+    parts = list(PurePosixPath(path).with_suffix("").parts)
+    if parts and parts[0] == "src":
+        parts = parts[1:]
+    if parts and parts[-1] == "__init__":
+        parts = parts[:-1]
+    return ".".join(parts)
+
+
+def _signature(node) -> str:
+    prefix = "async def" if isinstance(node, ast.AsyncFunctionDef) else "def"
+    returns = f" -> {ast.unparse(node.returns)}" if node.returns is not None else ""
+    return f"{prefix} {node.name}({ast.unparse(node.args)}){returns}"
+
+
+def _short_doc(node) -> str:
+    doc = ast.get_docstring(node) or ""
+    first = doc.strip().splitlines()[0] if doc.strip() else ""
+    return first[:DOCSTRING_CHARS]
+
+
+def _calls(node) -> List[str]:
+    names = []
+    for child in ast.walk(node):
+        if isinstance(child, ast.Call):
+            func = child.func
+            if isinstance(func, ast.Name):
+                names.append(func.id)
+            elif isinstance(func, ast.Attribute):
+                names.append(func.attr)
+    return sorted(set(names))
+
+
+def _function_entry(node, source_lines, qualname) -> Dict:
+    return {
+        "name": qualname,
+        "signature": _signature(node),
+        "doc": _short_doc(node),
+        "calls": _calls(node),
+        "source": "\n".join(source_lines[node.lineno - 1 - len(node.decorator_list):node.end_lineno]),
+    }
+
+
+def build_symbol_index(files: Iterable) -> Dict[str, Dict]:
+    """
+    Parse generated Python files into a symbol table.
+
+    Args:
+        files: Generated files ({path, content} mappings or Artifacts)
+
+    Returns:
+        Dictionary of path -> module entry with module, doc, imports, classes,
+        functions and (for unparsable files) error keys
+    """
+    index = {}
+    for f in files:
+        path = f["path"]
+        if not path.endswith(".py"):
+            continue
+        source = f["content"]
+        entry = {"module": _module_name(path), "doc": "", "imports": [], "classes": [], "functions": [], "source": source}
+        index[path] = entry
+        try:
+            tree = ast.parse(source, filename=path)
+        except SyntaxError as e:
+            entry["error"] = f"SyntaxError at line {e.lineno}: {e.msg}"
+            continue
+
+        lines = source.splitlines()
+        entry["doc"] = _short_doc(tree)
+        for node in tree.body:
+            if isinstance(node, (ast.Import, ast.ImportFrom)):
+                entry["imports"].append(ast.unparse(node))
+            elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                entry["functions"].append(_function_entry(node, lines, node.name))
+            elif isinstance(node, ast.ClassDef):
+                entry["classes"].append({
+                    "name": node.name,
+                    "bases": [ast.unparse(b) for b in node.bases],
+                    "doc": _short_doc(node),
+                    "methods": [
+                        _function_entry(item, lines, f"{node.name}.{item.name}")
+                        for item in node.body
+                        if isinstance(item, (ast.FunctionDef, ast.AsyncFunctionDef))
+                    ],
+                    "source": "\n".join(lines[node.lineno - 1 - len(node.decorator_list):node.end_lineno]),
+                })
+    return index
+
+
+def call_counts(index: Dict[str, Dict]) -> Dict[str, int]:
+    """How often each defined function/class/method name is called across the project."""
+    counts = {}
+    for entry in index.values():
+        callables = entry["functions"] + [m for c in entry["classes"] for m in c["methods"]]
+        for fn in callables:
+            for name in fn["calls"]:
+                counts[name] = counts.get(name, 0) + 1
+    return counts
+
+
+def render_signatures(path: str, entry: Dict) -> str:
+    """One module's interface: imports, class and function signatures with short docstrings."""
+    lines = [f"# {path}" + (f" - {entry['doc']}" if entry["doc"] else "")]
+    if entry.get("error"):
+        lines.append(f"# ({entry['error']})")
+    lines.extend(entry["imports"])
+    for cls in entry["classes"]:
+        bases = f"({', '.join(cls['bases'])})" if cls["bases"] else ""
+        lines.append(f"class {cls['name']}{bases}:" + (f"  # {cls['doc']}" if cls["doc"] else ""))
+        for method in cls["methods"]:
+            lines.append(f"    {method['signature']}" + (f"  # {method['doc']}" if method["doc"] else ""))
+    for fn in entry["functions"]:
+        lines.append(fn["signature"] + (f"  # {fn['doc']}" if fn["doc"] else ""))
+    return "\n".join(lines)
+
+
+def pack_context(files: Iterable, budget_tokens: int, focus: Optional[Iterable[str]] = None) -> str:
+    """
+    Render a token-bounded view of the project for an agent prompt.
+
+    Args:
+        files: Generated files ({path, content} mappings or Artifacts)
+        budget_tokens: Approximate token budget for the whole context
+        focus: Paths whose full source matters most
+
+    Returns:
+        Text with a SOURCE section holding whole modules, slices of the rest
+        and a note naming every module that is not shown in full, preceded by
+        a SIGNATURES section for the modules not shown in full
+    """
+    files = list(files)
+    index = build_symbol_index(files)
+    focus = [p for p in (focus or []) if p in index]
+    other_files = [f for f in files if not f["path"].endswith(".py")]
+    rendered = {path: render_signatures(path, entry) for path, entry in index.items()}
+
+    # 1. Whole focus files, then whole small files while they fit; a whole file
+    #    replaces its signatures, so it only costs the difference
+    note = "# NOT SHOWN IN FULL (signatures and slices only): "
+    used = estimate_tokens("SIGNATURES (modules not shown in full):\n\nSOURCE:\n" + note + ", ".join(index))
+    used += sum(estimate_tokens(text) for text in rendered.values())
+    included = []
+    by_size = sorted(index, key=lambda p: len(index[p]["source"]))
+    for path in focus + [p for p in by_size if p not in focus]:
+        cost = estimate_tokens(f"### {path}\n{index[path]['source']}") - estimate_tokens(rendered[path])
+        if used + cost <= budget_tokens:
+            included.append(path)
+            used += cost
+
+    partial = [path for path in index if path not in included]
+    parts = []
+    if partial:
+        signatures = "\n\n".join(rendered[path] for path in partial)
+        max_signature_chars = budget_tokens * CHARS_PER_TOKEN
+        if len(signatures) > max_signature_chars:
+            signatures = signatures[:max_signature_chars] + "\n# ... (signatures truncated)"
+            used = estimate_tokens(signatures) + sum(
+                estimate_tokens(f"### {p}\n{index[p]['source']}") for p in included
+            )
+        parts += ["SIGNATURES (modules not shown in full):", signatures, ""]
+    parts.append("SOURCE:")
+    parts += [f"### {path}\n{index[path]['source']}" for path in included]
+
+    def add(text):
+        nonlocal used
+        cost = estimate_tokens(text)
+        if used + cost > budget_tokens:
+            return False
+        parts.append(text)
+        used += cost
+        return True
+
+    # 2. Most-called symbols of the files that did not fit
+    counts = call_counts(index)
+    slices = []
+    for path in partial:
+        entry = index[path]
+        for symbol in entry["functions"] + entry["classes"]:
+            name = symbol["name"]
+            slices.append((path in focus, counts.get(name, 0), path, name, symbol["source"]))
+    for _, _, path, name, source in sorted(slices, key=lambda s: (not s[0], -s[1], len(s[4]))):
+        add(f"### {path} :: {name}\n{source}")
+
+    # Non-Python files (configs, templates) only if room is left
+    for f in other_files:
+        add(f"### {f['path']}\n{f['content']}")
+
+    if partial:
+        parts.append(note + ", ".join(partial))
+    context = "\n".join(parts)
+    logger.debug(
+        f"Packed context: {len(included)}/{len(index)} files whole, "
+        f"~{estimate_tokens(context)} tokens (budget {budget_tokens})"
+    )
+    return context
@@ -0,0 +1,408 @@
+"""
+Generated Test Runner
+Executes a project's generated test suite against its generated source as a
+quality gate.
+
+- Each test file runs in its own pytest subprocess inside a throwaway sandbox
+  (src/ and tests/ materialized from the artifact store), with CPU, memory,
+  process-count and wall-clock limits and a scrubbed environment.
+- Generated code is untrusted. Where user namespaces are available (Linux),
+  each subprocess gets no network and a private filesystem root holding only
+  the interpreter, the system libraries (read-only), its src/ and tests/
+  (read-only) and a scratch directory - not the server's repo, databases,
+  secrets or other projects. Limits are set by a small bootstrap that execs
+  pytest, so nothing runs between fork and exec in this threaded process.
+- Test files run in parallel across cores.
+- Results are cached under generated/.test_results/ by the content hash of
+  src + tests, so unchanged code is never re-tested.
+- Failures are condensed into review-style feedback for the coding loop.
+"""
+import hashlib
+import json
+import logging
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+import xml.etree.ElementTree as ET
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from core import artifact_store
+from core.file_saver import GENERATED_DIR, load_project_manifest
+
+logger = logging.getLogger(__name__)
+
+RESULTS_CACHE_DIR = GENERATED_DIR / ".test_results"
+RUNNER_VERSION = 1
+
+TEST_TIMEOUT = float(os.getenv("GENERATED_TEST_TIMEOUT", "60"))
+TEST_CPU_SECONDS = int(os.getenv("GENERATED_TEST_CPU_SECONDS", "30"))
+TEST_MEMORY_MB = int(os.getenv("GENERATED_TEST_MEMORY_MB", "512"))
+# RLIMIT_NPROC counts every process and thread of the uid, the server's own included
+TEST_MAX_PROCESSES = int(os.getenv("GENERATED_TEST_MAX_PROCESSES", "512"))
+# auto - isolate when user namespaces are available, else run with resource limits only
+# namespace - require isolation (test runs report an environment error without it)
+# none - resource limits only
+TEST_ISOLATION = os.getenv("GENERATED_TEST_ISOLATION", "auto")
+TEST_WORKERS = int(os.getenv("GENERATED_TEST_WORKERS", str(os.cpu_count() or 1)))
+MAX_MESSAGE_CHARS = 2000
+
+# Failures caused by packages missing from the sandbox interpreter are not code bugs
+_MISSING_MODULE_MARKERS = ("ModuleNotFoundError", "No module named")
+
+
+def _suite_hash(src: Dict[str, str], tests: Dict[str, str]) -> str:
+    payload = json.dumps({"src": src, "tests": tests, "runner": RUNNER_VERSION}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+# Runs as `python -c _BOOTSTRAP config-json` (inside the namespaces when isolated):
+# builds the private root, sets the resource limits, then execs pytest
+_BOOTSTRAP = """
+import json, os, resource, subprocess, sys
+config = json.loads(sys.argv[1])
+root = config["root"]
+if root:
+    def mount(*args):
+        subprocess.run(["mount", *args], check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    mount("-t", "tmpfs", "-o", "mode=755", "tmpfs", root)
+    for source, target, writable in config["binds"]:
+        inner = root + target
+        if os.path.isdir(source):
+            os.makedirs(inner, exist_ok=True)
+        else:
+            os.makedirs(os.path.dirname(inner), exist_ok=True)
+            open(inner, "a").close()
+        mount("--rbind", source, inner)
+        if not writable:
+            mount("-o", "remount,bind,ro", inner)
+    os.makedirs(root + "/tmp", mode=0o1777, exist_ok=True)
+    os.chroot(root)
+os.chdir(config["cwd"])
+limits = config["limits"]
+resource.setrlimit(resource.RLIMIT_CPU, (limits["cpu"], limits["cpu"]))
+resource.setrlimit(resource.RLIMIT_AS, (limits["memory"], limits["memory"]))
+resource.setrlimit(resource.RLIMIT_NPROC, (limits["processes"], limits["processes"]))
+os.execve(config["command"][0], config["command"], config["env"])
+"""
+_UNSHARE = ["unshare", "--user", "--map-root-user", "--net", "--mount"]
+# Read-only system directories a Python interpreter and pytest need
+_SYSTEM_DIRS = ("/usr", "/bin", "/lib", "/lib64", "/etc/alternatives", "/dev")
+# Paths of the sandbox as seen inside the private root
+_INNER_SANDBOX = "/sandbox"
+
+
+@lru_cache(maxsize=1)
+def _namespaces_available() -> bool:
+    if os.name != "posix" or shutil.which("unshare") is None:
+        return False
+    try:
+        return subprocess.run(
+            [*_UNSHARE, "true"], stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL, timeout=10
+        ).returncode == 0
+    except (OSError, subprocess.SubprocessError):
+        return False
+
+
+def _isolated() -> bool:
+    return TEST_ISOLATION != "none" and _namespaces_available()
+
+
+def _interpreter_dirs() -> List[str]:
+    """Directories holding the interpreter and its packages, outside the system directories."""
+    dirs = {os.path.realpath(p) for p in (sys.prefix, sys.base_prefix, sys.exec_prefix)}
+    dirs.add(os.path.dirname(os.path.realpath(sys.executable)))
+    dirs = {d for d in dirs if not d.startswith(tuple(f"{system}/" for system in _SYSTEM_DIRS)) and d not in _SYSTEM_DIRS}
+    # Nested directories are covered by their parent's bind
+    return sorted(d for d in dirs if not any(d != other and d.startswith(other + os.sep) for other in dirs))
+
+
+def _sandbox_command(sandbox: Path, test_path: str, index: int) -> List[str]:
+    """Command line running one test file through the bootstrap, isolated when possible."""
+    isolated = _isolated()
+    inner = Path(_INNER_SANDBOX) if isolated else sandbox
+    python = os.path.realpath(sys.executable) if isolated else sys.executable
+    config = {
+        "root": str(sandbox / ".root") if isolated else None,
+        "binds": [
+            *((d, d, False) for d in _SYSTEM_DIRS if os.path.exists(d)),
+            *((d, d, False) for d in _interpreter_dirs()),
+            (str(sandbox / "src"), f"{_INNER_SANDBOX}/src", False),
+            (str(sandbox / "tests"), f"{_INNER_SANDBOX}/tests", False),
+            (str(sandbox / ".out"), f"{_INNER_SANDBOX}/.out", True),
+        ],
+        "cwd": str(inner),
+        "limits": {
+            "cpu": TEST_CPU_SECONDS,
+            "memory": TEST_MEMORY_MB * 1024 * 1024,
+            "processes": TEST_MAX_PROCESSES,
+        },
+        "command": [
+            python, "-m", "pytest", "-q", "-p", "no:cacheprovider",
+            f"--junitxml={inner / '.out' / f'report-{index}.xml'}", str(Path("tests") / test_path)
+        ],
+        "env": {
+            "PATH": os.environ.get("PATH", ""),
+            "HOME": str(inner / ".out"),
+            "TMPDIR": "/tmp" if isolated else str(inner / ".out"),
+            "PYTHONPATH": os.pathsep.join([str(inner / "src"), str(inner)]),
+            "PYTHONDONTWRITEBYTECODE": "1",
+            "PYTHONHASHSEED": "0",
+        },
+    }
+    bootstrap = [sys.executable, "-c", _BOOTSTRAP, json.dumps(config)]
+    return [*_UNSHARE, *bootstrap] if isolated else bootstrap
+
+
+def _test_files(tests: Dict[str, str]) -> List[str]:
+    py_files = sorted(path for path in tests if path.endswith(".py"))
+    named = [
+        path for path in py_files
+        if Path(path).name.startswith("test_") or Path(path).name.endswith("_test.py")
+    ]
+    return named or [path for path in py_files if Path(path).name != "conftest.py"]
+
+
+def _materialize_sandbox(sandbox: Path, src: Dict[str, str], tests: Dict[str, str]) -> None:
+    for root, entries in (("src", src), ("tests", tests)):
+        (sandbox / root).mkdir(parents=True, exist_ok=True)
+        for path, digest in entries.items():
+            destination = sandbox / root / path
+            destination.parent.mkdir(parents=True, exist_ok=True)
+            artifact_store.materialize(digest, destination)
+
+
+def _parse_junit(report: Path) -> Dict:
+    counts = {"passed": 0, "failed": 0, "errors": 0, "skipped": 0}
+    failures = []
+
+    root = ET.parse(report).getroot()
+    for case in root.iter("testcase"):
+        name = f"{case.get('classname', '')}::{case.get('name', '')}".strip(":")
+        outcome = "passed"
+        for child in case:
+            if child.tag in ("failure", "error", "skipped"):
+                outcome = child.tag
+                if child.tag != "skipped":
+                    message = (child.get("message") or "") + "\n" + (child.text or "")
+                    failures.append({
+                        "test": name,
+                        "kind": child.tag,
+                        "message": message.strip()[:MAX_MESSAGE_CHARS],
+                    })
+                break
+        key = {"failure": "failed", "error": "errors"}.get(outcome, outcome)
+        counts[key] += 1
+
+    # Collection errors (e.g. an ImportError in the module) have no testcase entries
+    if not failures:
+        for suite in root.iter("testsuite"):
+            if int(suite.get("errors", 0)) > counts["errors"]:
+                counts["errors"] = int(suite.get("errors", 0))
+
+    return {**counts, "failures": failures}
+
+
+def _run_test_file(sandbox: Path, test_path: str, index: int) -> Dict:
+    report = sandbox / ".out" / f"report-{index}.xml"
+    posix = os.name == "posix"
+
+    started = time.time()
+    process = subprocess.Popen(
+        _sandbox_command(sandbox, test_path, index) if posix else [
+            sys.executable, "-m", "pytest", "-q", "-p", "no:cacheprovider",
+            f"--junitxml={report}", str(Path("tests") / test_path)
+        ],
+        cwd=sandbox,
+        env={"PATH": os.environ.get("PATH", ""), "PYTHONDONTWRITEBYTECODE": "1"},
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        start_new_session=posix,
+    )
+    try:
+        output, _ = process.communicate(timeout=TEST_TIMEOUT)
+        timed_out = False
+    except subprocess.TimeoutExpired:
+        if posix:
+            os.killpg(process.pid, signal.SIGKILL)
+        else:
+            process.kill()
+        output, _ = process.communicate()
+        timed_out = True
+
+    result = {
+        "path": test_path,
+        "duration_ms": round((time.time() - started) * 1000, 1),
+        "exit_code": process.returncode,
+        "passed": 0, "failed": 0, "errors": 0, "skipped": 0,
+        "failures": [],
+    }
+    output_text = output.decode("utf-8", errors="replace")
+
+    if timed_out:
+        result["errors"] = 1
+        result["failures"] = [{"test": test_path, "kind": "timeout", "message": f"Timed out after {TEST_TIMEOUT:.0f}s"}]
+    elif report.is_file():
+        try:
+            result.update(_parse_junit(report))
+        except ET.ParseError as e:
+            result["errors"] = 1
+            result["failures"] = [{"test": test_path, "kind": "error", "message": f"Unreadable report: {e}"}]
+    else:
+        # pytest died before writing a report (CPU/memory limit, crash)
+        message = output_text[-MAX_MESSAGE_CHARS:]
+        if process.returncode < 0:
+            signal_name = signal.Signals(-process.returncode).name
+            message = f"Killed by {signal_name} (limits: {TEST_CPU_SECONDS}s CPU, {TEST_MEMORY_MB}MB memory)\n{message}"
+        result["errors"] = 1
+        result["failures"] = [{"test": test_path, "kind": "crash", "message": message.strip()}]
+
+    if result["errors"] and not result["failures"]:
+        result["failures"] = [{"test": test_path, "kind": "error", "message": output_text[-MAX_MESSAGE_CHARS:]}]
+
+    for failure in result["failures"]:
+        failure["environment"] = any(marker in failure["message"] for marker in _MISSING_MODULE_MARKERS)
+    return result
+
+
+def _summarize(files: List[Dict]) -> Dict:
+    totals = {key: sum(f[key] for f in files) for key in ("passed", "failed", "errors", "skipped")}
+    failures = [{"file": f["path"], **failure} for f in files for failure in f["failures"]]
+    code_failures = [failure for failure in failures if not failure["environment"]]
+
+    if not files:
+        status = "skipped"
+    elif not failures:
+        status = "passed"
+    elif code_failures:
+        status = "failed"
+    else:
+        status = "error"  # only environment problems, e.g. missing third-party packages
+
+    return {"status": status, **totals, "failures": failures, "files": files}
+
+
+def run_generated_tests(project_name: str, manifest: Optional[Dict] = None) -> Dict:
+    """
+    Run a project's generated tests against its generated source.
+
+    Args:
+        project_name: Name of the project
+        manifest: Artifact manifest to test (defaults to the project's current one)
+
+    Returns:
+        Dictionary with status ('passed', 'failed', 'error' or 'skipped'),
+        passed/failed/errors/skipped counts, failures, per-file results,
+        content_hash, cached and duration_ms
+    """
+    manifest = manifest if manifest is not None else load_project_manifest(project_name)
+    src = manifest.get("src", {})
+    tests = manifest.get("tests", {})
+    content_hash = _suite_hash(src, tests)
+    cache_path = RESULTS_CACHE_DIR / f"{content_hash}.json"
+
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            cached = json.load(f)
+        logger.info(f"✓ Test results reused from cache ({content_hash[:12]}): {cached['status']}")
+        return {**cached, "cached": True}
+    except (OSError, ValueError):
+        pass
+
+    test_files = _test_files(tests)
+    if TEST_ISOLATION == "namespace" and not _isolated():
+        logger.error("✗ GENERATED_TEST_ISOLATION=namespace but user namespaces are unavailable - not running generated tests")
+        message = "Test isolation required but unavailable (unshare --user failed)"
+        files = [
+            {"path": path, "duration_ms": 0.0, "exit_code": None, "passed": 0, "failed": 0, "errors": 1, "skipped": 0,
+             "failures": [{"test": path, "kind": "error", "message": message, "environment": True}]}
+            for path in test_files
+        ]
+        return {**_summarize(files), "content_hash": content_hash, "duration_ms": 0.0, "cached": False}
+
+    logger.info(
+        f"Running {len(test_files)} generated test files for {project_name} "
+        f"({TEST_WORKERS} workers, {'isolated' if _isolated() else 'resource limits only'})"
+    )
+
+    started = time.time()
+    sandbox = Path(tempfile.mkdtemp(prefix="codeforge-tests-"))
+    try:
+        _materialize_sandbox(sandbox, src, tests)
+        (sandbox / ".out").mkdir()
+        (sandbox / ".root").mkdir()
+        with ThreadPoolExecutor(max_workers=max(1, min(TEST_WORKERS, len(test_files) or 1))) as pool:
+            files = list(pool.map(
+                lambda item: _run_test_file(sandbox, item[1], item[0]),
+                enumerate(test_files)
+            ))
+    finally:
+        shutil.rmtree(sandbox, ignore_errors=True)
+
+    result = {
+        **_summarize(files),
+        "content_hash": content_hash,
+        "duration_ms": round((time.time() - started) * 1000, 1),
+    }
+
+    RESULTS_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    tmp_path = cache_path.with_suffix(f".{os.getpid()}.tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(result, f)
+    os.replace(tmp_path, cache_path)
+
+    logger.info(
+        f"{'✓' if result['status'] == 'passed' else '✗'} Generated tests {result['status']}: "
+        f"{result['passed']} passed, {result['failed']} failed, {result['errors']} errors "
+        f"in {result['duration_ms']:.0f}ms"
+    )
+    return {**result, "cached": False}
+
+
+def build_test_feedback(results: Dict, max_failures: int = 10) -> Optional[Dict]:
+    """
+    Turn test failures into feedback in the review agent's format.
+
+    Args:
+        results: Output of run_generated_tests
+        max_failures: Maximum number of failures to include
+
+    Returns:
+        Dictionary with status, issues and suggested_fixes keys, or None if
+        there is nothing the code can fix
+    """
+    code_failures = [failure for failure in results.get("failures", []) if not failure["environment"]]
+    if not code_failures:
+        return None
+
+    issues = [
+        f"{failure['file']} :: {failure['test']} ({failure['kind']}): {failure['message'][:500]}"
+        for failure in code_failures[:max_failures]
+    ]
+    return {
+        "status": "REJECTED",
+        "issues": issues,
+        "suggested_fixes": [
+            f"Make the generated test suite pass: {results['failed']} failing and "
+            f"{results['errors']} erroring tests. Fix the source code so the tested "
+            "functions and classes exist with the expected names, signatures and behavior."
+        ],
+    }
+
+
+def failing_test_files(results: Dict) -> List[str]:
+    """Test files with failures the source code can fix (not environment problems)."""
+    return sorted({failure["file"] for failure in results.get("failures", []) if not failure["environment"]})
+
+
+def repair_improved(before: Dict, after: Dict) -> bool:
+    """Whether repaired code fails fewer tests than the code it would replace."""
+    return after["failed"] + after["errors"] < before["failed"] + before["errors"]
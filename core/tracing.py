@@ -0,0 +1,254 @@
+"""
+Run Tracing
+Lightweight span instrumentation for pipeline runs.
+
+Spans are collected in memory per run (bound through contextvars, so spans
+opened in worker threads attach to the right run) and exported to traces/ as:
+    {run_id}.trace.json   Chrome trace events - open in Perfetto or chrome://tracing
+    {run_id}.otlp.jsonl   one OTLP-shaped span per line
+"""
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from core.logging_config import bind_stage, unbind_stage
+
+logger = logging.getLogger(__name__)
+
+TRACES_DIR = Path(__file__).parent.parent / "traces"
+SERVICE_NAME = "codeforge-pipeline"
+
+_current_trace = contextvars.ContextVar("current_trace", default=None)
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    __slots__ = ("name", "span_id", "parent_id", "start_ns", "end_ns", "thread_id", "attributes", "error")
+
+    def __init__(self, name: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.name = name
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.thread_id = threading.get_ident()
+        self.attributes = attributes
+        self.error = None
+
+    def set(self, **attributes) -> None:
+        self.attributes.update(attributes)
+
+    @property
+    def duration_ms(self) -> float:
+        end_ns = self.end_ns if self.end_ns is not None else time.time_ns()
+        return (end_ns - self.start_ns) / 1e6
+
+
+class Trace:
+    def __init__(self, name: str, run_id: Optional[str] = None):
+        self.name = name
+        self.run_id = run_id or uuid.uuid4().hex[:8]
+        self.trace_id = uuid.uuid4().hex
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+
+    def add(self, span_obj: Span) -> None:
+        with self._lock:
+            self.spans.append(span_obj)
+
+    def count_descendants(self, root: Optional[Span], names) -> int:
+        """Number of finished spans named in names that sit below root."""
+        if root is None:
+            return 0
+        with self._lock:
+            parents = {s.span_id: s.parent_id for s in self.spans}
+            candidates = [s for s in self.spans if s.name in names]
+
+        count = 0
+        for s in candidates:
+            parent_id = s.parent_id
+            while parent_id is not None and parent_id != root.span_id:
+                parent_id = parents.get(parent_id)
+            if parent_id == root.span_id:
+                count += 1
+        return count
+
+
+def start_trace(name: str, run_id: Optional[str] = None) -> Trace:
+    """
+    Start collecting spans for a run in the current context.
+
+    Args:
+        name: Trace name (e.g. "run_pipeline")
+        run_id: Run identifier used for the export file names
+
+    Returns:
+        The new Trace
+    """
+    trace = Trace(name, run_id)
+    _current_trace.set(trace)
+    _current_span.set(None)
+    return trace
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """
+    Record a span around a block. A no-op outside of a trace, except that
+    stage spans ("stage.*") always tag log records with their stage.
+
+    Args:
+        name: Span name (e.g. "stage.design", "agent.attempt")
+        **attributes: Span attributes
+
+    Yields:
+        The Span (or None when no trace is active)
+    """
+    # Log records of a stage (and of work it hands to other threads) carry the stage name
+    stage_token = bind_stage(name[len("stage."):]) if name.startswith("stage.") else None
+    try:
+        trace = _current_trace.get()
+        if trace is None:
+            yield None
+            return
+
+        parent = _current_span.get()
+        span_obj = Span(name, parent.span_id if parent else None, attributes)
+        token = _current_span.set(span_obj)
+        try:
+            yield span_obj
+        except BaseException as e:
+            span_obj.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            span_obj.end_ns = time.time_ns()
+            _current_span.reset(token)
+            trace.add(span_obj)
+    finally:
+        if stage_token is not None:
+            unbind_stage(stage_token)
+
+
+def _chrome_events(trace: Trace) -> Dict[str, Any]:
+    pid = os.getpid()
+    events = [{
+        "name": "process_name", "ph": "M", "pid": pid,
+        "args": {"name": f"{trace.name} {trace.run_id}"}
+    }]
+    for s in sorted(trace.spans, key=lambda s: s.start_ns):
+        args = {k: str(v) for k, v in s.attributes.items()}
+        if s.error:
+            args["error"] = s.error
+        events.append({
+            "name": s.name,
+            "cat": s.name.split(".")[0],
+            "ph": "X",
+            "ts": s.start_ns / 1000,
+            "dur": (s.end_ns - s.start_ns) / 1000,
+            "pid": pid,
+            "tid": s.thread_id,
+            "args": args,
+        })
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_span(trace: Trace, s: Span) -> Dict[str, Any]:
+    return {
+        "resource": {"attributes": [
+            {"key": "service.name", "value": {"stringValue": SERVICE_NAME}},
+            {"key": "run.id", "value": {"stringValue": trace.run_id}},
+        ]},
+        "traceId": trace.trace_id,
+        "spanId": s.span_id,
+        "parentSpanId": s.parent_id or "",
+        "name": s.name,
+        "startTimeUnixNano": str(s.start_ns),
+        "endTimeUnixNano": str(s.end_ns),
+        "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in s.attributes.items()],
+        "status": {"code": 2, "message": s.error} if s.error else {"code": 1},
+    }
+
+
+def export_trace(trace: Trace, directory: Optional[Path] = None) -> Dict[str, str]:
+    """
+    Write a finished trace to disk in Chrome-trace and OTLP-JSONL formats.
+
+    Args:
+        trace: Trace to export
+        directory: Output directory (default TRACES_DIR)
+
+    Returns:
+        Dictionary with 'chrome' and 'otlp' file paths
+    """
+    directory = directory or TRACES_DIR
+    directory.mkdir(parents=True, exist_ok=True)
+    chrome_path = directory / f"{trace.run_id}.trace.json"
+    otlp_path = directory / f"{trace.run_id}.otlp.jsonl"
+
+    spans = [s for s in trace.spans if s.end_ns is not None]
+    with open(chrome_path, 'w', encoding='utf-8') as f:
+        json.dump(_chrome_events(trace), f)
+    with open(otlp_path, 'w', encoding='utf-8') as f:
+        for s in sorted(spans, key=lambda s: s.start_ns):
+            f.write(json.dumps(_otlp_span(trace, s)) + "\n")
+
+    logger.info(f"Trace exported: {chrome_path} ({len(spans)} spans)")
+    return {"chrome": str(chrome_path), "otlp": str(otlp_path)}
+
+
+def load_timeline(run_id: str, directory: Optional[Path] = None) -> List[Dict[str, Any]]:
+    """
+    Load an exported trace as timeline rows for display.
+
+    Args:
+        run_id: Run identifier
+        directory: Directory containing exported traces (default TRACES_DIR)
+
+    Returns:
+        List of rows with span, start_ms, end_ms, duration_ms and thread keys
+        (empty if the trace does not exist)
+    """
+    directory = directory or TRACES_DIR
+    try:
+        with open(directory / f"{run_id}.trace.json", 'r', encoding='utf-8') as f:
+            events = [e for e in json.load(f)["traceEvents"] if e.get("ph") == "X"]
+    except Exception:
+        return []
+
+    if not events:
+        return []
+
+    origin = min(e["ts"] for e in events)
+    threads = {tid: idx for idx, tid in enumerate(dict.fromkeys(e["tid"] for e in events))}
+    return [
+        {
+            "span": e["name"],
+            "start_ms": round((e["ts"] - origin) / 1000, 2),
+            "end_ms": round((e["ts"] + e["dur"] - origin) / 1000, 2),
+            "duration_ms": round(e["dur"] / 1000, 2),
+            "thread": f"thread-{threads[e['tid']]}",
+            "details": ", ".join(f"{k}={v}" for k, v in e.get("args", {}).items()),
+        }
+        for e in events
+    ]
@@ -0,0 +1,146 @@
+"""
+ZIP Export
+Builds downloadable project archives from the artifact store.
+
+Archives are cached under generated/.zips/ keyed by the hash of the project's
+artifact manifest, so an unchanged project (or a rerun producing identical
+files) is compressed once and every later download reuses the same file.
+Entries are streamed from disk, so memory stays flat regardless of project size.
+"""
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import uuid
+import zipfile
+from pathlib import Path
+from typing import Dict, Optional
+
+from core import artifact_store
+from core.file_saver import GENERATED_DIR, load_project_manifest
+
+logger = logging.getLogger(__name__)
+
+ZIP_CACHE_DIR = GENERATED_DIR / ".zips"
+MAX_CACHED_ZIPS = 50
+STREAM_CHUNK_SIZE = 64 * 1024
+ZIP_ENTRY_TIME = (1980, 1, 1, 0, 0, 0)
+
+_build_lock = threading.Lock()
+
+
+def project_content_hash(project_name: str, manifest: Optional[Dict] = None) -> Optional[str]:
+    """
+    Hash identifying a project's contents.
+
+    Args:
+        project_name: Name of the project
+        manifest: Artifact manifest to hash instead of the project's current one
+
+    Returns:
+        sha256 of the manifest, or None if there is no manifest
+    """
+    if manifest is None:
+        manifest = load_project_manifest(project_name)
+    if not manifest:
+        return None
+    return hashlib.sha256(json.dumps(manifest, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def _zip_path(content_hash: str) -> Path:
+    return ZIP_CACHE_DIR / f"{content_hash}.zip"
+
+
+def get_cached_zip(project_name: str, manifest: Optional[Dict] = None) -> Optional[Path]:
+    """
+    Get the cached archive for a project's contents, if already built.
+
+    Args:
+        project_name: Name of the project
+        manifest: Artifact manifest of a specific run (defaults to the project's current one)
+
+    Returns:
+        Path to the archive, or None
+    """
+    content_hash = project_content_hash(project_name, manifest)
+    if content_hash is None:
+        return None
+    path = _zip_path(content_hash)
+    return path if path.is_file() else None
+
+
+def _prune_cache() -> None:
+    archives = sorted(ZIP_CACHE_DIR.glob("*.zip"), key=lambda p: p.stat().st_mtime, reverse=True)
+    for stale in archives[MAX_CACHED_ZIPS:]:
+        try:
+            stale.unlink()
+        except OSError:
+            pass
+
+
+def build_project_zip(project_name: str, manifest: Optional[Dict] = None) -> Optional[Path]:
+    """
+    Get the project archive, building it on first request.
+
+    Args:
+        project_name: Name of the project
+        manifest: Artifact manifest of a specific run (defaults to the project's current one)
+
+    Returns:
+        Path to the archive, or None if there is no manifest
+
+    Raises:
+        FileNotFoundError: If content of a manifest entry is missing from the
+            store (an incomplete archive is never cached)
+    """
+    if manifest is None:
+        manifest = load_project_manifest(project_name)
+    content_hash = project_content_hash(project_name, manifest)
+    if content_hash is None:
+        logger.warning(f"No manifest for {project_name} - nothing to export")
+        return None
+
+    zip_path = _zip_path(content_hash)
+    if zip_path.is_file():
+        os.utime(zip_path)
+        logger.debug(f"Reusing cached archive {zip_path.name}")
+        return zip_path
+
+    with _build_lock:
+        if zip_path.is_file():
+            return zip_path
+
+        ZIP_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        tmp_path = ZIP_CACHE_DIR / f".{content_hash}.{uuid.uuid4().hex[:8]}.tmp"
+
+        missing = []
+        try:
+            with zipfile.ZipFile(tmp_path, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+                for file_type in sorted(manifest):
+                    for path, digest in sorted(manifest[file_type].items()):
+                        arcname = f"{file_type}/{path}"
+                        # The store matches the manifest even if the project tree moved on
+                        source = artifact_store.open_blob(digest)
+                        if source is None:
+                            missing.append(arcname)
+                            continue
+                        # Fixed timestamps keep archives of identical content identical
+                        info = zipfile.ZipInfo(arcname, date_time=ZIP_ENTRY_TIME)
+                        info.external_attr = 0o644 << 16
+                        info.compress_type = zipfile.ZIP_DEFLATED
+                        with source as src, zip_file.open(info, 'w') as dst:
+                            shutil.copyfileobj(src, dst, STREAM_CHUNK_SIZE)
+            if missing:
+                raise FileNotFoundError(f"Content not found in the artifact store for: {', '.join(missing)}")
+            os.replace(tmp_path, zip_path)
+        except Exception as e:
+            tmp_path.unlink(missing_ok=True)
+            logger.error(f"✗ Could not build archive for {project_name}: {str(e)}")
+            raise
+
+        logger.info(f"Built project archive {zip_path.name} ({zip_path.stat().st_size} bytes)")
+        _prune_cache()
+
+    return zip_path
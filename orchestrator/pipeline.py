@@ -1,180 +1,720 @@
-import logging
-from core.agent_runner import run_agent_json
-from core.retry_loop import generate_with_review
-from core.base64_utils import safe_b64decode
-from core.file_saver import save_generated_files
-
-from agents.requirement_agent import requirement_agent
-from agents.design_agent import design_agent
-from agents.coding_agent import coding_agent
-from agents.review_agent import review_agent
-from agents.test_agent import test_agent
-from agents.documentation_agent import documentation_agent
-from agents.deployment_agent import deployment_agent
-
-logger = logging.getLogger(__name__)
-
-
-def run_pipeline(user_requirement: str, project_name: str = "generated_project"):
-    """
-    Run the complete multi-agent SDLC pipeline.
-    
-    Args:
-        user_requirement: User's project description
-        project_name: Name of the project (used for folder structure and logging)
-    
-    Returns:
-        Dictionary containing all generated artifacts
-    """
-    logger.info("="*80)
-    logger.info("🚀 STARTING MULTI-AGENT SDLC PIPELINE")
-    logger.info("="*80)
-    logger.info(f"Project Name: {project_name}")
-    logger.info(f"User Requirement: {user_requirement}")
-    logger.info("="*80)
-    
-    try:
-
-        # 1️⃣ Requirements
-        logger.info("STAGE 1: Requirements Analysis")
-        req = run_agent_json(
-            requirement_agent,
-            [{"role": "user", "content": user_requirement}],
-            ["functional_requirements", "non_functional_requirements", "constraints", "edge_cases"],
-            agent_name="Requirement Agent"
-        )
-        if "error" in req:
-            logger.error(f"Requirements stage failed: {req['error']}")
-            return req
-        logger.info(f"✓ Requirements generated: {len(req.get('functional_requirements', []))} functional, {len(req.get('non_functional_requirements', []))} non-functional")
-
-        # 2️⃣ Design
-        logger.info("STAGE 2: Architecture Design")
-        arch = run_agent_json(
-            design_agent,
-            [{"role": "user", "content": str(req)}],
-            ["components", "data_models", "apis", "security", "infrastructure", "scalability_considerations"],
-            agent_name="Design Agent"
-        )
-        if "error" in arch:
-            logger.error(f"Design stage failed: {arch['error']}")
-            return arch
-        logger.info(f"✓ Architecture designed with {len(arch.get('components', []))} components")
-
-        # 3️⃣ Code + Review
-        logger.info("STAGE 3: Code Generation with Review")
-        code = generate_with_review(arch, coding_agent, review_agent)
-        if "error" in code:
-            logger.error(f"Code generation stage failed: {code['error']}")
-            return code
-        logger.info(f"✓ Code generated: {len(code.get('files', []))} files")
-        
-        # Save code files
-        logger.info("Saving code files...")
-        code_save_stats = save_generated_files(project_name, code.get('files', []), 'src')
-        logger.info(f"Code files saved: {code_save_stats['saved_count']} succeeded, {code_save_stats['failed_count']} failed")
-
-        # 4️⃣ Tests
-        logger.info("STAGE 4: Test Generation")
-        tests = run_agent_json(
-            test_agent,
-            [{"role": "user", "content": str(code)}],
-            ["tests"],
-            agent_name="Test Agent"
-        )
-        if "error" in tests:
-            logger.error(f"Test generation stage failed: {tests['error']}")
-            return tests
-
-        for t in tests.get("tests", []):
-            t["content"] = safe_b64decode(t["content_base64"])
-            del t["content_base64"]
-        
-        logger.info(f"✓ Tests generated: {len(tests.get('tests', []))} test files")
-        
-        # Save test files
-        logger.info("Saving test files...")
-        test_save_stats = save_generated_files(project_name, tests.get('tests', []), 'tests')
-        logger.info(f"Test files saved: {test_save_stats['saved_count']} succeeded, {test_save_stats['failed_count']} failed")
-
-        # 5️⃣ Docs
-        logger.info("STAGE 5: Documentation Generation")
-        docs = run_agent_json(
-            documentation_agent,
-            [{"role": "user", "content": str({"requirements": req, "architecture": arch})}],
-            ["docs"],
-            agent_name="Documentation Agent"
-        )
-        if "error" in docs:
-            logger.error(f"Documentation stage failed: {docs['error']}")
-            return docs
-
-        for d in docs.get("docs", []):
-            d["content"] = safe_b64decode(d["content_base64"])
-            del d["content_base64"]
-        
-        logger.info(f"✓ Documentation generated: {len(docs.get('docs', []))} doc files")
-        
-        # Save documentation files
-        logger.info("Saving documentation files...")
-        docs_save_stats = save_generated_files(project_name, docs.get('docs', []), 'docs')
-        logger.info(f"Documentation files saved: {docs_save_stats['saved_count']} succeeded, {docs_save_stats['failed_count']} failed")
-
-        # 6️⃣ Deployment
-        logger.info("STAGE 6: Deployment Configuration")
-        deploy = run_agent_json(
-            deployment_agent,
-            [{"role": "user", "content": str(arch)}],
-            ["deploy"],
-            agent_name="Deployment Agent"
-        )
-        if "error" in deploy:
-            logger.error(f"Deployment stage failed: {deploy['error']}")
-            return deploy
-
-        for f in deploy.get("deploy", []):
-            f["content"] = safe_b64decode(f["content_base64"])
-            del f["content_base64"]
-        
-        logger.info(f"✓ Deployment configs generated: {len(deploy.get('deploy', []))} files")
-        
-        # Save deployment files
-        logger.info("Saving deployment files...")
-        deploy_save_stats = save_generated_files(project_name, deploy.get('deploy', []), 'deploy')
-        logger.info(f"Deployment files saved: {deploy_save_stats['saved_count']} succeeded, {deploy_save_stats['failed_count']} failed")
-
-        result = {
-            "requirements": req,
-            "architecture": arch,
-            "code": code,
-            "tests": tests,
-            "docs": docs,
-            "deploy": deploy,
-            "save_stats": {
-                "code": code_save_stats,
-                "tests": test_save_stats,
-                "docs": docs_save_stats,
-                "deploy": deploy_save_stats
-            }
-        }
-        
-        logger.info("="*80)
-        logger.info("✅ PIPELINE COMPLETED SUCCESSFULLY")
-        logger.info("="*80)
-        logger.info(f"Total files generated: {code_save_stats['saved_count'] + test_save_stats['saved_count'] + docs_save_stats['saved_count'] + deploy_save_stats['saved_count']}")
-        logger.info(f"Project location: {code_save_stats.get('target_directory', 'N/A').replace('src', '')}")
-        logger.info("="*80)
-        
-        return result
-        
-    except Exception as e:
-        logger.error("="*80)
-        logger.error("❌ PIPELINE FAILED")
-        logger.error("="*80)
-        logger.exception(f"Unhandled exception: {str(e)}")
-        logger.error("="*80)
-        
-        return {
-            "error": "Pipeline failed due to unrecoverable error",
-            "exception": str(e)
-        }
+import contextvars
+import logging
+import os
+import time
+from pathlib import PurePosixPath
+from concurrent.futures import ThreadPoolExecutor
+from core.agent_runner import run_agent_json
+from core.retry_loop import generate_with_review
+from core.artifact import to_artifacts
+from core.file_saver import save_generated_files_async, load_project_manifest, publish_run
+from core.logging_config import current_run_id, current_log_file
+from core.tracing import start_trace, span, export_trace
+from core import run_store
+from core.similarity_index import find_similar_run, requirement_similarity, REUSE_THRESHOLD, DRAFT_THRESHOLD
+from core.test_runner import run_generated_tests, build_test_feedback, failing_test_files, repair_improved
+from core.component_codegen import use_planned_generation, generate_planned
+from core.symbol_index import pack_context, TEST_CONTEXT_TOKENS
+from core.run_budget import RunBudget, bind_budget, unbind_budget
+from core.deploy_templates import plan_deploy, customization_prompt
+from core.docs_builder import build_docs, narrative_prompt, NARRATIVE_KEYS
+from core.lineage import (
+    stage_input_hash, diff_requirements, components_for_requirements,
+    diff_architecture, plan_code_update, plan_test_update, build_lineage, sources_for_tests
+)
+
+from agents.requirement_agent import requirement_agent
+from agents.design_agent import design_agent
+from agents.coding_agent import coding_agent
+from agents.review_agent import review_agent
+from agents.test_agent import test_agent
+from agents.documentation_agent import documentation_agent
+from agents.deployment_agent import deployment_agent
+
+logger = logging.getLogger(__name__)
+
+# Spans counted as LLM attempts when recording stage retries
+ATTEMPT_SPANS = ("agent.attempt", "review_loop.round")
+
+# How a near-duplicate earlier requirement is used:
+#   auto  - reuse its requirements/architecture above REUSE_THRESHOLD, draft from it above DRAFT_THRESHOLD
+#   draft - never reuse as-is, only draft from it
+#   off   - run every stage from scratch, ignoring earlier outputs and the previous run
+REUSE_MODES = ("auto", "draft", "off")
+# Recent successful runs of a project checked for an incremental baseline
+BASELINE_CANDIDATES = 20
+
+# Stage -> key of the generated file list in its output
+FILE_LIST_KEYS = {"code": "files", "tests": "tests", "docs": "docs", "deploy": "deploy"}
+
+ARCHITECTURE_KEYS = ["components", "data_models", "apis", "security", "infrastructure", "scalability_considerations"]
+
+# Generated tests are executed as a quality gate; failures get this many coding repair rounds.
+# Opt-in: this runs LLM-written code on the server (isolated where possible, see core.test_runner)
+RUN_GENERATED_TESTS = os.getenv("RUN_GENERATED_TESTS", "0") == "1"
+TEST_REPAIR_ROUNDS = int(os.getenv("TEST_REPAIR_ROUNDS", "1"))
+
+_gate_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="test-gate")
+
+
+def run_pipeline(
+    user_requirement: str, project_name: str = "generated_project", reuse: str = "auto", budget=None, user_id=None
+):
+    """
+    Run the complete multi-agent SDLC pipeline.
+    
+    Args:
+        user_requirement: User's project description
+        project_name: Name of the project (used for folder structure and logging)
+        reuse: Near-duplicate requirement handling - one of REUSE_MODES
+        budget: RunBudget (deadline and token limit) - defaults to the PIPELINE_DEADLINE_SECONDS /
+            PIPELINE_MAX_TOKENS settings
+        user_id: User the run belongs to (stable across UI sessions) - earlier runs are only reused from the same user
+    
+    Returns:
+        Dictionary containing all generated artifacts
+    """
+    logger.info("="*80)
+    logger.info("🚀 STARTING MULTI-AGENT SDLC PIPELINE")
+    logger.info("="*80)
+    logger.info(f"Project Name: {project_name}")
+    logger.info(f"User Requirement: {user_requirement}")
+    logger.info("="*80)
+
+    # Spans for this run are exported to traces/{run_id}.trace.json when it ends
+    trace = start_trace("run_pipeline", run_id=current_run_id())
+    started = time.time()
+    run_store.start_run(trace.run_id, project_name, user_requirement, log_file=current_log_file(), user_id=user_id)
+
+    budget = budget or RunBudget()
+    budget_token = bind_budget(budget)
+
+    result = None
+    try:
+        result = _execute_stages(user_requirement, project_name, trace, reuse, budget, user_id)
+        result["run_id"] = trace.run_id
+        result["budget"] = budget.summary()
+        run_store.record_stage(trace.run_id, "budget", result["budget"])
+        if "error" not in result:
+            # Only a complete run replaces what the project's readers see
+            result["manifest"] = load_project_manifest(project_name, trace.run_id)
+            try:
+                publish_run(project_name, trace.run_id)
+            except Exception as e:
+                logger.warning(f"✗ Could not publish run {trace.run_id} as latest: {str(e)}")
+        return result
+
+    finally:
+        unbind_budget(budget_token)
+        try:
+            export_trace(trace)
+        except Exception as e:
+            logger.warning(f"Could not export trace: {str(e)}")
+        _finish_run_record(trace, project_name, result, started)
+
+
+def _record_stage(trace, stage, output, stage_span, input_hash=None):
+    run_store.record_stage(
+        trace.run_id,
+        stage,
+        output,
+        latency_ms=stage_span.duration_ms if stage_span else None,
+        attempts=trace.count_descendants(stage_span, ATTEMPT_SPANS),
+        input_hash=input_hash
+    )
+
+
+def _cached_stage(stage, agent, payload, lookup=True):
+    """Input hash of a stage, and an earlier output for the same input if one exists (and lookup is on)."""
+    input_hash = stage_input_hash(stage, agent, payload)
+    return input_hash, run_store.find_stage_by_input(stage, input_hash) if lookup else None
+
+
+def _reuse_output(stage, cached, stage_span):
+    logger.info(f"♻️ {stage} input unchanged - reusing output of run {cached['run_id']}")
+    if stage_span is not None:
+        stage_span.set(reused_from=cached["run_id"])
+    output = cached["output"]
+    file_key = FILE_LIST_KEYS.get(stage)
+    if file_key and isinstance(output, dict) and file_key in output:
+        output[file_key] = to_artifacts(output[file_key])
+    return output
+
+
+def _previous_run(project_name, user_requirement, user_id=None):
+    """
+    Outputs and lineage of the project's latest successful run that this
+    request updates, or None.
+
+    Only runs of the same user with a similar requirement (DRAFT_THRESHOLD)
+    qualify, so an unrelated request that reuses a project name (or the UI's
+    default name) starts from scratch instead of patching someone else's project.
+    """
+    runs = run_store.list_runs(project_name=project_name, status="succeeded", limit=BASELINE_CANDIDATES, user_id=user_id)
+    for run in runs:
+        if run["user_id"] != user_id:
+            continue  # list_runs does not filter when user_id is None
+        similarity = requirement_similarity(user_requirement, run["requirement"])
+        if similarity < DRAFT_THRESHOLD:
+            continue
+
+        previous = {"run_id": run["run_id"], "similarity": round(similarity, 3)}
+        for stage, key in (("requirements", "requirements"), ("design", "architecture"), ("code", "code"),
+                           ("tests", "tests"), ("lineage", "lineage")):
+            previous[key] = run_store.get_stage_output(run["run_id"], stage)
+        if previous["requirements"] and previous["architecture"]:
+            return previous
+    return None
+
+
+def _merge_files(kept, generated):
+    """Kept files plus newly generated ones; a generated file replaces a kept file with the same path."""
+    generated_paths = {f["path"] for f in generated}
+    return to_artifacts([f for f in kept if f["path"] not in generated_paths] + list(generated))
+
+
+def _update_architecture(req, previous):
+    """
+    Revise the previous architecture for changed requirements. Components the
+    change does not reach are carried over verbatim, so their code can be kept.
+    """
+    changes = diff_requirements(previous["requirements"], req)
+    lineage = previous.get("lineage") or {}
+    affected = components_for_requirements(changes["added"], previous["architecture"])
+    for item in changes["removed"]:
+        affected.update(lineage.get("requirements", {}).get(item, []))
+    if not lineage:
+        affected.update(components_for_requirements(changes["removed"], previous["architecture"]))
+
+    logger.info(
+        f"Requirement changes: +{len(changes['added'])} / -{len(changes['removed'])} items, "
+        f"affecting components: {sorted(affected) or 'none'}"
+    )
+
+    content = (
+        f"{req}\n\n"
+        "PREVIOUS ARCHITECTURE (update it for the requirement changes below; keep every "
+        f"component the changes do not affect exactly as it is):\n{previous['architecture']}\n\n"
+        f"REQUIREMENT CHANGES:\n{changes}"
+    )
+    arch = run_agent_json(
+        design_agent,
+        [{"role": "user", "content": content}],
+        ARCHITECTURE_KEYS,
+        agent_name="Design Agent"
+    )
+    if "error" in arch:
+        return arch
+
+    previous_components = {
+        c.get("name"): c for c in previous["architecture"].get("components", []) if isinstance(c, dict)
+    }
+    arch["components"] = [
+        previous_components[c["name"]]
+        if isinstance(c, dict) and c.get("name") in previous_components and c["name"] not in affected
+        else c
+        for c in arch.get("components", [])
+    ]
+    return arch
+
+
+def _generate_code(arch, previous):
+    """Generate code - only for new/changed components when the previous run's files can be kept."""
+    plan = None
+    if previous and previous.get("code") and previous.get("lineage"):
+        plan = plan_code_update(
+            previous["code"].get("files", []),
+            previous["lineage"],
+            diff_architecture(previous["architecture"], arch)
+        )
+
+    if plan is None:
+        if use_planned_generation(arch):
+            return generate_planned(arch, coding_agent, review_agent)
+        return generate_with_review(arch, coding_agent, review_agent)
+
+    logger.info(f"Incremental code generation: keeping {len(plan['keep'])} files, regenerating {plan['regenerate'] or 'nothing'}")
+    if not plan["regenerate"]:
+        return {"files": to_artifacts(plan["keep"])}
+
+    prompt = {
+        "architecture": arch,
+        "incremental_update": {
+            "generate_files_for_components": plan["regenerate"],
+            "existing_files_kept_unchanged": [f["path"] for f in plan["keep"]],
+            "instructions": "Only output files for the listed components. The existing files stay as they "
+                            "are; import from them where needed and do not output them again.",
+        },
+    }
+    code = generate_with_review(prompt, coding_agent, review_agent)
+    if "error" in code:
+        return code
+    return {**code, "files": _merge_files(plan["keep"], code.get("files", []))}
+
+
+def _generate_tests(code, previous):
+    """Generate tests - only for changed source files when the previous run's tests still apply."""
+    files = code.get("files", [])
+    kept = []
+    if previous and previous.get("tests") and previous.get("lineage") and previous.get("code"):
+        previous_sources = {f["path"]: f["content"] for f in previous["code"].get("files", [])}
+        current_paths = {f["path"] for f in files}
+        changed = {f["path"] for f in files if previous_sources.get(f["path"]) != f["content"]}
+        changed |= previous_sources.keys() - current_paths
+        kept = plan_test_update(previous["tests"].get("tests", []), previous["lineage"], changed)
+        if kept:
+            files = [f for f in files if f["path"] in changed]
+            logger.info(f"Incremental test generation: keeping {len(kept)} test files, {len(files)} source files changed")
+            if not files:
+                return {"tests": to_artifacts(kept)}
+
+    # Signatures of the whole project plus full source of the files under test, within budget
+    targets = [f["path"] for f in files]
+    context = pack_context(code.get("files", []), TEST_CONTEXT_TOKENS, focus=targets)
+    tests = run_agent_json(
+        test_agent,
+        [{"role": "user", "content": f"WRITE TESTS FOR: {targets}\n\n{context}"}],
+        ["tests"],
+        agent_name="Test Agent"
+    )
+    if "error" in tests:
+        return tests
+
+    return {**tests, "tests": _merge_files(kept, tests.get("tests", []))}
+
+
+def _with_draft(content, draft):
+    """Append an earlier stage output as a draft for the agent to revise."""
+    if draft is None:
+        return content
+    return (
+        f"{content}\n\n"
+        "DRAFT FROM A SIMILAR EARLIER REQUEST (revise it to match the request above; "
+        f"keep what still applies):\n{draft}"
+    )
+
+
+def _generate_docs(project_name, req, arch, code, use_cache, budget, stage_span):
+    """
+    Docs rendered from the requirements, architecture and code, with narrative sections from the documentation agent.
+
+    Returns:
+        Tuple of (docs output, input hash to record it under - None when it must not be reused)
+    """
+    input_hash, cached = _cached_stage("docs", documentation_agent, {"requirements": req, "architecture": arch}, use_cache)
+    narrative = None
+    if cached and isinstance(cached["output"], dict) and cached["output"].get("narrative"):
+        # Only the narrative is reused - the rendered parts always follow the current code
+        logger.info(f"♻️ docs input unchanged - reusing narrative of run {cached['run_id']}")
+        if stage_span is not None:
+            stage_span.set(reused_from=cached["run_id"])
+        narrative = cached["output"]["narrative"]
+    elif budget.degrade_reason("docs"):
+        input_hash = None  # never reuse a degraded output
+    else:
+        narrative = run_agent_json(
+            documentation_agent,
+            [{"role": "user", "content": narrative_prompt(project_name, req, arch)}],
+            NARRATIVE_KEYS,
+            max_retries=2,
+            agent_name="Documentation Agent"
+        )
+        if "error" in narrative:
+            logger.warning(f"✗ No narrative for the docs, rendering them without it: {narrative['error']}")
+            narrative, input_hash = None, None
+
+    with span("render_docs"):
+        files = build_docs(project_name, req, arch, code.get("files", []), narrative)
+    return {"docs": files, "narrative": narrative}, input_hash
+
+
+def _generate_deploy(arch, code, use_cache, budget, stage_span):
+    """
+    Deploy files from templates where the stack is recognized, else from the deployment agent.
+
+    Returns:
+        Tuple of (deploy output, input hash to record it under - None when it must not be reused)
+    """
+    plan = plan_deploy(arch, code.get("files", []))
+    if stage_span is not None:
+        stage_span.set(mode=plan["mode"])
+
+    if plan["mode"] == "template":
+        # Rendering is cheaper than a cache lookup and always matches the current code
+        logger.info(f"✓ Deploy files rendered from templates ({plan['reason']}) - no LLM call")
+        return {"deploy": plan["files"]}, None
+
+    if plan["mode"] == "customize":
+        payload = customization_prompt(plan, arch)
+        input_hash, cached = _cached_stage("deploy", deployment_agent, payload, use_cache)
+        fallback = {"deploy": plan["files"]}
+    else:
+        logger.info(f"Deploy templates not applicable ({plan['reason']}) - using the deployment agent")
+        payload = str(arch)
+        input_hash, cached = _cached_stage("deploy", deployment_agent, arch, use_cache)
+        fallback = {"deploy": []}
+
+    if cached:
+        return _reuse_output("deploy", cached, stage_span), input_hash
+    if budget.degrade_reason("deploy"):
+        return fallback, None
+
+    if plan["mode"] == "customize":
+        logger.info(f"Customizing templated deploy files ({plan['reason']})")
+    deploy = run_agent_json(
+        deployment_agent,
+        [{"role": "user", "content": payload}],
+        ["deploy"],
+        agent_name="Deployment Agent"
+    )
+    if "error" in deploy:
+        if plan["mode"] == "customize":
+            # The rendered files are complete for everything the templates know
+            logger.warning(f"✗ Deploy customization failed, keeping templated files: {deploy['error']}")
+            return fallback, None
+        return deploy, input_hash
+
+    with span("decode", files=len(deploy.get("deploy", []))):
+        deploy["deploy"] = to_artifacts(deploy.get("deploy", []))
+    if plan["mode"] == "customize":
+        # The agent returns only added/changed files - the rest keep their templated content
+        templated = {f["path"] for f in plan["files"]}
+        changed = sum(1 for f in deploy["deploy"] if f["path"] in templated)
+        logger.info(f"✓ Deploy customization: {changed} templated files changed, {len(deploy['deploy']) - changed} added")
+        deploy["deploy"] = _merge_files(plan["files"], deploy["deploy"])
+    return deploy, input_hash
+
+
+def _finish_run_record(trace, project_name, result, started):
+    failed = result is None or "error" in result
+    error = None
+    if failed:
+        error = result.get("error", "Unknown error") if result else "Pipeline aborted"
+
+    run_store.finish_run(
+        trace.run_id,
+        "failed" if failed else "succeeded",
+        error=error,
+        duration_ms=(time.time() - started) * 1000,
+        manifest=None if failed else result.get("manifest"),
+        save_stats=None if failed else result.get("save_stats")
+    )
+
+
+def _run_test_gate(project_name, run_id, code_save, test_save):
+    """Run the generated tests once the code and test files are on disk."""
+    code_save.result()
+    test_save.result()
+    with span("stage.test_run") as gate_span:
+        results = run_generated_tests(project_name, load_project_manifest(project_name, run_id))
+        if gate_span is not None:
+            gate_span.set(status=results["status"], failed=results["failed"], cached=results["cached"])
+    return results
+
+
+def _repair_prompt(arch, code, tests, test_results):
+    """Current code (full source of the files the failing tests exercise) and a request for changed files only."""
+    files = code.get("files", [])
+    failing = {PurePosixPath(path).name for path in failing_test_files(test_results)}
+    failing_tests = [t for t in tests.get("tests", []) if PurePosixPath(t["path"]).name in failing]
+    targets = sorted({path for paths in sources_for_tests(failing_tests, files).values() for path in paths})
+    return {
+        "architecture": arch,
+        "test_repair": {
+            "current_code": pack_context(files, TEST_CONTEXT_TOKENS, focus=targets),
+            "failing_tests": pack_context(failing_tests, TEST_CONTEXT_TOKENS // 2),
+            "instructions": "The current code fails the tests listed in review_feedback. Output ONLY the "
+                            "source files you change to make them pass, each complete; files you do not "
+                            "output stay as they are. Do not change or output test files.",
+        },
+    }
+
+
+def _repair_from_tests(arch, code, tests, code_save_stats, test_results, project_name, run_id):
+    """
+    Feed test failures and the failing code back into the coding loop. The
+    changed files are merged over the current ones, and the repaired version
+    is kept only if it fails fewer tests; otherwise the original files are restored.
+
+    Returns:
+        Tuple of (code, code_save_stats, test_results)
+    """
+    for repair_round in range(1, TEST_REPAIR_ROUNDS + 1):
+        feedback = build_test_feedback(test_results)
+        if feedback is None:
+            break
+
+        with span("stage.test_repair", round=repair_round):
+            logger.info(f"🔧 Repairing code from {len(feedback['issues'])} test failures (round {repair_round}/{TEST_REPAIR_ROUNDS})")
+            try:
+                changes = generate_with_review(
+                    _repair_prompt(arch, code, tests, test_results), coding_agent, review_agent,
+                    initial_feedback=feedback
+                )
+            except Exception as e:
+                logger.warning(f"✗ Test repair round failed: {str(e)}")
+                break
+            if "error" in changes:
+                break
+            logger.info(f"Test repair changed {len(changes.get('files', []))} files")
+            repaired = {**code, "files": _merge_files(code.get("files", []), changes.get("files", []))}
+
+            repaired_save_stats = save_generated_files_async(project_name, repaired.get('files', []), 'src', run_id).result()
+            repaired_results = run_generated_tests(project_name, load_project_manifest(project_name, run_id))
+
+        if repair_improved(test_results, repaired_results):
+            logger.info(f"✓ Repair improved test results: {repaired_results['passed']} passed, {repaired_results['failed']} failed")
+            code, code_save_stats, test_results = repaired, repaired_save_stats, repaired_results
+        else:
+            logger.warning("✗ Repair did not improve test results - restoring previous code")
+            save_generated_files_async(project_name, code.get('files', []), 'src', run_id).result()
+            break
+
+    return code, code_save_stats, test_results
+
+
+def _execute_stages(user_requirement, project_name, trace, reuse="auto", budget=None, user_id=None):
+    """Run every stage in order; returns the result dict or the first stage error."""
+    budget = budget or RunBudget()
+    try:
+
+        # 0️⃣ Near-duplicate lookup - template-style requests skip stages 1 and 2
+        similar = None
+        if reuse in ("auto", "draft"):
+            with span("similarity_lookup") as lookup_span:
+                similar = find_similar_run(user_requirement, DRAFT_THRESHOLD, user_id=user_id)
+                if lookup_span is not None and similar:
+                    lookup_span.set(match=similar["run_id"], similarity=similar["similarity"])
+
+        reused = similar if similar and reuse == "auto" and similar["similarity"] >= REUSE_THRESHOLD else None
+        draft = similar if similar and not reused else None
+
+        # Previous run of this project - the baseline for incremental regeneration
+        use_cache = reuse != "off"
+        previous = _previous_run(project_name, user_requirement, user_id) if use_cache else None
+        if previous:
+            logger.info(f"Incremental baseline: run {previous['run_id']} (similarity {previous['similarity']:.2f})")
+
+        if reused:
+            logger.info(
+                f"♻️ Reusing requirements and architecture of run {reused['run_id']} "
+                f"(similarity {reused['similarity']:.2f}) - skipping stages 1 and 2"
+            )
+            req, arch = reused["requirements"], reused["architecture"]
+            for stage, agent, payload, output in (
+                ("requirements", requirement_agent, user_requirement, req),
+                ("design", design_agent, req, arch),
+            ):
+                budget.start_stage(stage)
+                with span(f"stage.{stage}", reused_from=reused["run_id"]) as stage_span:
+                    pass
+                _record_stage(trace, stage, output, stage_span, stage_input_hash(stage, agent, payload))
+        else:
+            if draft:
+                logger.info(f"Drafting requirements and architecture from run {draft['run_id']} (similarity {draft['similarity']:.2f})")
+
+            # 1️⃣ Requirements
+            budget.start_stage("requirements")
+            base_req = draft["requirements"] if draft else (previous and previous["requirements"])
+            # The draft is part of the prompt, so it is part of the input
+            payload = {"requirement": user_requirement, "draft": base_req} if base_req else user_requirement
+            input_hash, cached = _cached_stage("requirements", requirement_agent, payload, use_cache)
+            with span("stage.requirements") as stage_span:
+                logger.info("STAGE 1: Requirements Analysis")
+                if cached:
+                    req = _reuse_output("requirements", cached, stage_span)
+                else:
+                    req = run_agent_json(
+                        requirement_agent,
+                        [{"role": "user", "content": _with_draft(user_requirement, base_req)}],
+                        ["functional_requirements", "non_functional_requirements", "constraints", "edge_cases"],
+                        agent_name="Requirement Agent"
+                    )
+                if "error" in req:
+                    logger.error(f"Requirements stage failed: {req['error']}")
+                    return req
+                logger.info(f"✓ Requirements generated: {len(req.get('functional_requirements', []))} functional, {len(req.get('non_functional_requirements', []))} non-functional")
+
+            _record_stage(trace, "requirements", req, stage_span, input_hash)
+
+            # 2️⃣ Design
+            budget.start_stage("design")
+            base_arch = draft["architecture"] if draft else (previous and previous["architecture"])
+            payload = {"requirements": req, "draft": base_arch} if base_arch else req
+            input_hash, cached = _cached_stage("design", design_agent, payload, use_cache)
+            with span("stage.design") as stage_span:
+                logger.info("STAGE 2: Architecture Design")
+                if cached:
+                    arch = _reuse_output("design", cached, stage_span)
+                elif previous and not draft:
+                    arch = _update_architecture(req, previous)
+                else:
+                    arch = run_agent_json(
+                        design_agent,
+                        [{"role": "user", "content": _with_draft(str(req), draft and draft["architecture"])}],
+                        ARCHITECTURE_KEYS,
+                        agent_name="Design Agent"
+                    )
+                if "error" in arch:
+                    logger.error(f"Design stage failed: {arch['error']}")
+                    return arch
+                logger.info(f"✓ Architecture designed with {len(arch.get('components', []))} components")
+
+            _record_stage(trace, "design", arch, stage_span, input_hash)
+
+        # 3️⃣ Code + Review
+        budget.start_stage("code")
+        input_hash, cached = _cached_stage("code", coding_agent, arch, use_cache)
+        with span("stage.code") as stage_span:
+            logger.info("STAGE 3: Code Generation with Review")
+            if cached:
+                code = _reuse_output("code", cached, stage_span)
+            else:
+                code = _generate_code(arch, previous)
+            if "error" in code:
+                logger.error(f"Code generation stage failed: {code['error']}")
+                return code
+            logger.info(f"✓ Code generated: {len(code.get('files', []))} files")
+        
+            # Save code files in the background while the next stage runs
+            logger.info("Saving code files...")
+            code_save = save_generated_files_async(project_name, code.get('files', []), 'src', trace.run_id)
+
+        _record_stage(trace, "code", code, stage_span, input_hash)
+        code_span, code_input_hash = stage_span, input_hash
+
+        # 4️⃣ Tests
+        budget.start_stage("tests")
+        input_hash, cached = _cached_stage("tests", test_agent, code.get("files", []), use_cache)
+        with span("stage.tests") as stage_span:
+            logger.info("STAGE 4: Test Generation")
+            if cached:
+                tests = _reuse_output("tests", cached, stage_span)
+            else:
+                tests = _generate_tests(code, previous)
+            if "error" in tests:
+                logger.error(f"Test generation stage failed: {tests['error']}")
+                return tests
+        
+            logger.info(f"✓ Tests generated: {len(tests.get('tests', []))} test files")
+        
+            # Save test files
+            logger.info("Saving test files...")
+            test_save = save_generated_files_async(project_name, tests.get('tests', []), 'tests', trace.run_id)
+
+            # Execute the generated suite in the background while docs and deploy are generated
+            test_gate = None
+            if RUN_GENERATED_TESTS:
+                test_gate = _gate_pool.submit(
+                    contextvars.copy_context().run, _run_test_gate, project_name, trace.run_id, code_save, test_save
+                )
+
+        _record_stage(trace, "tests", tests, stage_span, input_hash)
+
+        # 5️⃣ Docs - rendered locally; the narrative sections are optional and skipped when the budget runs out
+        budget.start_stage("docs")
+        with span("stage.docs") as stage_span:
+            logger.info("STAGE 5: Documentation Generation")
+            docs, input_hash = _generate_docs(project_name, req, arch, code, use_cache, budget, stage_span)
+        
+            logger.info(f"✓ Documentation generated: {len(docs.get('docs', []))} doc files")
+        
+            # Save documentation files
+            logger.info("Saving documentation files...")
+            docs_save = save_generated_files_async(project_name, docs.get('docs', []), 'docs', trace.run_id)
+
+        _record_stage(trace, "docs", docs, stage_span, input_hash)
+
+        # 6️⃣ Deployment - rendered from templates for recognized stacks; optional, skipped when the budget runs out
+        budget.start_stage("deploy")
+        with span("stage.deploy") as stage_span:
+            logger.info("STAGE 6: Deployment Configuration")
+            deploy, input_hash = _generate_deploy(arch, code, use_cache, budget, stage_span)
+            if "error" in deploy:
+                logger.error(f"Deployment stage failed: {deploy['error']}")
+                return deploy
+        
+            logger.info(f"✓ Deployment configs generated: {len(deploy.get('deploy', []))} files")
+        
+            # Save deployment files
+            logger.info("Saving deployment files...")
+            deploy_save = save_generated_files_async(project_name, deploy.get('deploy', []), 'deploy', trace.run_id)
+
+        _record_stage(trace, "deploy", deploy, stage_span, input_hash)
+
+        # Wait for all background saves
+        with span("stage.save_wait"):
+            code_save_stats = code_save.result()
+            logger.info(f"Code files saved: {code_save_stats['saved_count']} succeeded, {code_save_stats['failed_count']} failed")
+            test_save_stats = test_save.result()
+            logger.info(f"Test files saved: {test_save_stats['saved_count']} succeeded, {test_save_stats['failed_count']} failed")
+            docs_save_stats = docs_save.result()
+            logger.info(f"Documentation files saved: {docs_save_stats['saved_count']} succeeded, {docs_save_stats['failed_count']} failed")
+            deploy_save_stats = deploy_save.result()
+            logger.info(f"Deployment files saved: {deploy_save_stats['saved_count']} succeeded, {deploy_save_stats['failed_count']} failed")
+
+        # 7️⃣ Test execution gate
+        test_results = None
+        if test_gate is not None:
+            with span("stage.test_gate") as stage_span:
+                try:
+                    test_results = test_gate.result()
+                    if (
+                        test_results["status"] == "failed" and TEST_REPAIR_ROUNDS > 0
+                        and not budget.degrade_reason("test_repair")
+                    ):
+                        budget.start_stage("test_repair")
+                        original_code = code
+                        code, code_save_stats, test_results = _repair_from_tests(
+                            arch, code, tests, code_save_stats, test_results, project_name, trace.run_id
+                        )
+                        if code is not original_code:
+                            _record_stage(trace, "code", code, code_span, code_input_hash)
+                except Exception as e:
+                    logger.warning(f"✗ Generated test execution failed: {str(e)}")
+
+            if test_results is not None:
+                _record_stage(trace, "test_run", test_results, stage_span)
+
+        # Lineage of this run is the baseline for the next incremental run of the project
+        run_store.record_stage(
+            trace.run_id, "lineage", build_lineage(req, arch, code.get("files", []), tests.get("tests", []))
+        )
+
+        result = {
+            "requirements": req,
+            "architecture": arch,
+            "code": code,
+            "tests": tests,
+            "docs": docs,
+            "deploy": deploy,
+            "save_stats": {
+                "code": code_save_stats,
+                "tests": test_save_stats,
+                "docs": docs_save_stats,
+                "deploy": deploy_save_stats
+            }
+        }
+        if test_results is not None:
+            result["test_results"] = test_results
+        
+        logger.info("="*80)
+        logger.info("✅ PIPELINE COMPLETED SUCCESSFULLY")
+        logger.info("="*80)
+        logger.info(f"Total files generated: {code_save_stats['saved_count'] + test_save_stats['saved_count'] + docs_save_stats['saved_count'] + deploy_save_stats['saved_count']}")
+        logger.info(f"Project location: {code_save_stats.get('target_directory', 'N/A').replace('src', '')}")
+        logger.info("="*80)
+        
+        return result
+        
+    except Exception as e:
+        logger.error("="*80)
+        logger.error("❌ PIPELINE FAILED")
+        logger.error("="*80)
+        logger.exception(f"Unhandled exception: {str(e)}")
+        logger.error("="*80)
+        
+        return {
+            "error": "Pipeline failed due to unrecoverable error",
+            "exception": str(e)
+        }
@@ -0,0 +1,73 @@
+"""
+Artifact Memory
+Peak memory of one pipeline run against the offline fake LLM backend.
+
+Generated files are held as Artifacts whose bytes are released once saved,
+so a run's traced peak stays bounded and does not grow from run to run.
+"""
+import sys
+import tracemalloc
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from tools.fake_llm import BackendConfig, FakeBackend, install_fake_agents, set_variant
+
+# Generous bound for one run of the canned project; a regression that keeps
+# decoded copies of every file (or of every prompt) alive blows well past it
+PEAK_BYTES_PER_RUN = 4 * 1024 * 1024
+REQUIREMENT = "A login service with registration and token issuing"
+
+
+@pytest.fixture(scope="module")
+def pipeline(tmp_path_factory):
+    if "orchestrator.pipeline" in sys.modules:
+        pytest.skip("orchestrator.pipeline was already imported with the real agents")
+    install_fake_agents(FakeBackend(BackendConfig(latency_dist="fixed", time_scale=0.0, seed=7)))
+
+    from tools.loadgen import _isolate
+    _isolate(tmp_path_factory.mktemp("artifact_memory"))
+
+    from orchestrator import pipeline
+    pipeline.RUN_GENERATED_TESTS = False
+    return pipeline
+
+
+def _traced_run(pipeline, variant: int):
+    set_variant(variant)
+    tracemalloc.start()
+    try:
+        result = pipeline.run_pipeline(REQUIREMENT, f"memory_{variant}", reuse="off")
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, peak
+
+
+def test_peak_memory_per_run_is_bounded(pipeline):
+    # Warm-up: first-use imports and caches are not per-run cost
+    result, _ = _traced_run(pipeline, 0)
+    assert "error" not in result, result.get("error")
+
+    result, first_peak = _traced_run(pipeline, 1)
+    assert "error" not in result, result.get("error")
+    assert first_peak < PEAK_BYTES_PER_RUN
+
+    _, second_peak = _traced_run(pipeline, 2)
+    assert second_peak < first_peak * 1.5
+
+
+def test_saved_artifacts_release_their_bytes(pipeline):
+    set_variant(3)
+    result = pipeline.run_pipeline(REQUIREMENT, "memory_release", reuse="off")
+    assert "error" not in result, result.get("error")
+
+    files = result["code"]["files"]
+    assert files
+    for f in files:
+        assert f._data is None and f._encoded is None
+        # repr must not pull the content back from the store
+        assert repr(f) == f"Artifact({f.path!r}, {f.size} bytes)"
+        assert f._data is None
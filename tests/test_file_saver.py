@@ -0,0 +1,66 @@
+"""
+File Saver
+Per-run workspaces, atomic tree swaps and publishing the latest run.
+"""
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from core import artifact_store, file_saver
+
+
+@pytest.fixture(autouse=True)
+def stores(tmp_path, monkeypatch):
+    monkeypatch.setattr(file_saver, "GENERATED_DIR", tmp_path / "generated")
+    monkeypatch.setattr(artifact_store, "STORE_DIR", tmp_path / "generated" / ".store")
+    monkeypatch.setattr(artifact_store, "OBJECTS_DIR", tmp_path / "generated" / ".store" / "objects")
+
+
+def _save(run_id, content):
+    files = [{"path": "app/main.py", "content": content}]
+    return file_saver.save_generated_files("demo", files, "src", run_id)
+
+
+def test_runs_write_separate_workspaces():
+    _save("run1", "first = 1\n")
+    _save("run2", "second = 2\n")
+
+    for run_id, content in (("run1", "first = 1\n"), ("run2", "second = 2\n")):
+        path = file_saver.run_workspace("demo", run_id) / "src" / "app" / "main.py"
+        assert path.read_text() == content
+
+
+def test_publish_repoints_latest_and_its_manifest():
+    _save("run1", "first = 1\n")
+    _save("run2", "second = 2\n")
+
+    file_saver.publish_run("demo", "run1")
+    assert file_saver.latest_run_id("demo") == "run1"
+
+    file_saver.publish_run("demo", "run2")
+    assert file_saver.latest_run_id("demo") == "run2"
+    digest = file_saver.load_project_manifest("demo")["src"]["app/main.py"]
+    assert artifact_store.get_blob(digest) == b"second = 2\n"
+
+
+def test_publishing_an_unsaved_run_fails():
+    with pytest.raises(FileNotFoundError):
+        file_saver.publish_run("demo", "missing")
+
+
+def test_swap_replaces_the_tree_behind_a_symlink(tmp_path):
+    target = tmp_path / "src"
+    for version in ("one", "two"):
+        staging = tmp_path / f".src.staging-{version}"
+        staging.mkdir()
+        (staging / "version.txt").write_text(version)
+        file_saver._swap_directory(staging, target)
+        assert (target / "version.txt").read_text() == version
+
+    assert target.is_symlink()
+    # Previous tree is kept for readers that resolved it just before; older ones are removed
+    trees = [p for p in tmp_path.glob(".src.*") if not p.is_symlink()]
+    assert len(trees) == 2
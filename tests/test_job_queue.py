@@ -0,0 +1,70 @@
+"""
+Job Queue
+User identity, per-user job listing and fair claiming.
+"""
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from core import job_queue
+
+
+@pytest.fixture(autouse=True)
+def queue_db(tmp_path, monkeypatch):
+    monkeypatch.setattr(job_queue, "DB_PATH", tmp_path / "jobs.db")
+    monkeypatch.setattr(job_queue, "_initialized", False)
+
+
+def test_resolve_user_id_keeps_an_issued_id():
+    user_id = job_queue.resolve_user_id(None)
+
+    assert job_queue.resolve_user_id(user_id) == user_id
+    assert job_queue.resolve_user_id("") != user_id
+    assert job_queue.resolve_user_id("<script>") != "<script>"
+
+
+def test_open_jobs_are_found_again_after_a_reload():
+    user_id = job_queue.resolve_user_id(None)
+    job_id = job_queue.submit_job(user_id, "a login service", "auth")
+    job_queue.submit_job(job_queue.resolve_user_id(None), "a billing service", "billing")
+
+    # A reload resolves the same ID from the URL
+    reloaded = job_queue.resolve_user_id(user_id)
+    open_jobs = job_queue.list_jobs(reloaded, statuses=["queued", "running"])
+
+    assert [j["job_id"] for j in open_jobs] == [job_id]
+
+
+def test_list_jobs_filters_by_status():
+    user_id = job_queue.resolve_user_id(None)
+    done = job_queue.submit_job(user_id, "first", "p1")
+    queued = job_queue.submit_job(user_id, "second", "p2")
+    job_queue.complete_job(done, "succeeded")
+
+    assert [j["job_id"] for j in job_queue.list_jobs(user_id, statuses=["queued", "running"])] == [queued]
+    assert {j["job_id"] for j in job_queue.list_jobs(user_id)} == {done, queued}
+
+
+def test_claim_prefers_users_with_fewer_running_jobs():
+    busy, idle = job_queue.resolve_user_id(None), job_queue.resolve_user_id(None)
+    job_queue.submit_job(busy, "first", "p1")
+    assert job_queue.claim_next_job("w1")["user_id"] == busy
+
+    job_queue.submit_job(busy, "second", "p2")
+    later = job_queue.submit_job(idle, "third", "p3")
+
+    assert job_queue.claim_next_job("w2")["job_id"] == later
+
+
+def test_cancel_only_affects_queued_jobs():
+    user_id = job_queue.resolve_user_id(None)
+    running = job_queue.submit_job(user_id, "first", "p1")
+    job_queue.claim_next_job("w1")
+    queued = job_queue.submit_job(user_id, "second", "p2")
+
+    assert not job_queue.cancel_job(running)
+    assert job_queue.cancel_job(queued)
+    assert job_queue.get_job(queued)["status"] == "cancelled"
@@ -0,0 +1,63 @@
+"""
+Lineage
+Keep/regenerate split of incremental code updates.
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from core.lineage import build_lineage, diff_architecture, plan_code_update
+
+ARCHITECTURE = {
+    "components": ["Auth Service", "Billing Service"],
+    "data_models": ["User"],
+    "apis": ["POST /login"],
+}
+FILES = [
+    {"path": "app/__init__.py", "content": ""},
+    {"path": "app/auth_service.py", "content": "def login():\n    return True\n"},
+    {"path": "app/billing_service.py", "content": "def charge():\n    return 0\n"},
+    {"path": "app/main.py", "content": "from app.auth_service import login\n"},
+    {"path": "requirements.txt", "content": "fastapi\n"},
+]
+
+
+def _plan(new_architecture):
+    lineage = build_lineage({}, ARCHITECTURE, FILES, [])
+    return plan_code_update(FILES, lineage, diff_architecture(ARCHITECTURE, new_architecture))
+
+
+def _paths(files):
+    return sorted(f["path"] for f in files)
+
+
+def test_changed_component_is_regenerated_and_unowned_files_are_kept():
+    plan = _plan({**ARCHITECTURE, "components": ["Auth Service", {"name": "Billing Service", "note": "v2"}]})
+
+    assert plan["regenerate"] == ["Billing Service"]
+    assert _paths(plan["keep"]) == ["app/__init__.py", "app/auth_service.py", "app/main.py", "requirements.txt"]
+
+
+def test_added_component_keeps_every_previous_file():
+    plan = _plan({**ARCHITECTURE, "components": ARCHITECTURE["components"] + ["Email Service"]})
+
+    assert plan["regenerate"] == ["Email Service"]
+    assert _paths(plan["keep"]) == _paths(FILES)
+
+
+def test_removal_only_diff_drops_the_component_files_and_keeps_the_rest():
+    plan = _plan({**ARCHITECTURE, "components": ["Auth Service"]})
+
+    assert plan["regenerate"] == []
+    assert _paths(plan["keep"]) == ["app/__init__.py", "app/auth_service.py", "app/main.py", "requirements.txt"]
+
+
+def test_unchanged_architecture_keeps_everything():
+    plan = _plan(dict(ARCHITECTURE))
+
+    assert plan == {"keep": FILES, "regenerate": []}
+
+
+def test_shared_change_needs_full_regeneration():
+    assert _plan({**ARCHITECTURE, "data_models": ["User", "Invoice"]}) is None
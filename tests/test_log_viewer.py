@@ -0,0 +1,59 @@
+"""
+Log Viewer
+Backward paging across rotated log files, with level and stage filters.
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from core.log_viewer import read_page
+
+
+def _record(n, level="INFO", stage="code"):
+    return f"2024-01-01 12:00:{n % 60:02d} | {level:<8} | {stage:<11} | core.test | message {n}\n"
+
+
+def _write_log(tmp_path):
+    log = tmp_path / "run.log"
+    # Oldest records live in the highest-numbered backup
+    (tmp_path / "run.log.2").write_text("".join(_record(n) for n in range(0, 10)))
+    (tmp_path / "run.log.1").write_text("".join(_record(n) for n in range(10, 20)))
+    log.write_text(
+        "".join(_record(n) for n in range(20, 29))
+        + _record(29, level="ERROR", stage="tests") + "Traceback (most recent call last):\n  boom\n"
+    )
+    return log
+
+
+def _messages(lines):
+    return [int(line.rsplit(" ", 1)[1]) for line in lines if "message" in line]
+
+
+def test_pages_cover_every_record_once_oldest_to_newest(tmp_path):
+    log = _write_log(tmp_path)
+
+    pages, cursor = [], None
+    while True:
+        page = read_page(log, cursor, max_records=7)
+        pages.insert(0, page.lines)
+        cursor = page.cursor
+        if cursor is None:
+            break
+
+    assert _messages([line for lines in pages for line in lines]) == list(range(30))
+
+
+def test_newest_page_keeps_multiline_records_together(tmp_path):
+    page = read_page(_write_log(tmp_path), max_records=1)
+
+    assert page.lines[0].endswith("message 29")
+    assert page.lines[1:] == ["Traceback (most recent call last):", "  boom"]
+
+
+def test_filters_match_the_record_header(tmp_path):
+    log = _write_log(tmp_path)
+
+    assert _messages(read_page(log, levels=["ERROR"]).lines) == [29]
+    assert _messages(read_page(log, stages=["tests"]).lines) == [29]
+    assert read_page(log, levels=["DEBUG"]).lines == []
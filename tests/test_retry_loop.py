@@ -0,0 +1,100 @@
+"""
+Review Loop
+Per-file rejection memo, submission verdict cache and the review prompt.
+"""
+import base64
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from core import adaptive_params, retry_loop, run_store
+
+
+@pytest.fixture(autouse=True)
+def run_db(tmp_path, monkeypatch):
+    monkeypatch.setattr(run_store, "DB_PATH", tmp_path / "runs.db")
+    monkeypatch.setattr(run_store, "_initialized", False)
+    monkeypatch.setattr(adaptive_params, "_stats_cache", {})
+
+
+class ScriptedAgent:
+    """Answers with the next scripted output and records the prompts it got."""
+
+    def __init__(self, name, outputs):
+        self.name = name
+        self.system_message = name
+        self.llm_config = {}
+        self.outputs = list(outputs)
+        self.prompts = []
+
+    def generate_reply(self, messages=None, **kwargs):
+        self.prompts.append(messages[0]["content"])
+        return {"content": json.dumps(self.outputs.pop(0)), "role": "assistant"}
+
+
+def _submission(files):
+    return {"files": [
+        {"path": path, "content_base64": base64.b64encode(content.encode()).decode()}
+        for path, content in files.items()
+    ]}
+
+
+def _review(status, *issues):
+    return {"status": status, "issues": list(issues), "suggested_fixes": []}
+
+
+MAIN_V1 = "from app.svc import f\n\n\ndef main():\n    return f()\n"
+MAIN_V2 = MAIN_V1 + "\n\nprint(main())\n"
+SVC_V1 = "def f():\n    pass\n"
+SVC_V2 = "def f():\n    return 1\n"
+
+
+def test_unchanged_named_file_stays_rejected_until_it_changes():
+    coder = ScriptedAgent("coding_agent", [
+        _submission({"app/main.py": MAIN_V1, "app/svc.py": SVC_V1}),
+        _submission({"app/main.py": MAIN_V1, "app/svc.py": SVC_V2}),
+        _submission({"app/main.py": MAIN_V2, "app/svc.py": SVC_V2}),
+    ])
+    reviewer = ScriptedAgent("review_agent", [
+        _review("REJECTED", "main.py prints nothing", "general: add logging"),
+        _review("APPROVED"),
+        _review("APPROVED"),
+    ])
+
+    result = retry_loop.generate_with_review({"components": []}, coder, reviewer)
+
+    assert len(reviewer.prompts) == 3
+    # Round 2: svc.py was not named, so it is reviewed again in full; main.py only as its interface
+    second = reviewer.prompts[1]
+    assert "### app/svc.py\n" + SVC_V2 in second
+    assert MAIN_V1 not in second
+    assert "- app/main.py: main.py prints nothing" in second
+    assert "from app.svc import f" in second and "def main()" in second
+    # ... and the approval of svc.py alone did not approve the submission
+    assert "main.py prints nothing" in coder.prompts[2]
+    assert {f.path: f.content for f in result["files"]}["app/main.py"] == MAIN_V2
+
+
+def test_changed_files_are_reviewed_in_full():
+    big = "def f():\n" + "    x = 1\n" * 4000 + "    return x\n"
+    coder = ScriptedAgent("coding_agent", [_submission({"app/big.py": big})])
+    reviewer = ScriptedAgent("review_agent", [_review("APPROVED")])
+
+    retry_loop.generate_with_review({"components": []}, coder, reviewer)
+
+    assert big in reviewer.prompts[0]
+
+
+def test_identical_resubmission_reuses_the_submission_verdict():
+    files = {"app/main.py": MAIN_V1}
+    coder = ScriptedAgent("coding_agent", [_submission(files), _submission(files), _submission(files)])
+    reviewer = ScriptedAgent("review_agent", [_review("REJECTED", "not good enough")])
+
+    retry_loop.generate_with_review({"components": []}, coder, reviewer)
+
+    assert len(reviewer.prompts) == 1
+    assert "resubmission_notice" in coder.prompts[2]
@@ -0,0 +1,49 @@
+"""
+Run Budget
+Stage windows, retry cut-offs and degradation of optional stages.
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from core.run_budget import RunBudget
+
+
+def test_stage_windows_split_the_remaining_budget_by_share():
+    budget = RunBudget(deadline_seconds=100, max_tokens=1000, shares={"a": 1.0, "b": 3.0})
+
+    budget.start_stage("a")
+    assert budget.stage_tokens == 250
+
+    budget.add_tokens(50)
+    budget.start_stage("b")
+    assert budget.stage_tokens == 950
+
+
+def test_retry_is_cut_when_the_window_cannot_fit_another_attempt():
+    budget = RunBudget(deadline_seconds=0, max_tokens=1000, shares={"code": 1.0})
+    budget.start_stage("code")
+    budget.add_tokens(700)
+    budget.record_attempt(1.0, 700)
+
+    assert not budget.allow_retry("review_loop")
+    assert "code:review_loop" in budget.summary()["cut_retries"]
+
+
+def test_retry_is_allowed_while_the_window_has_room():
+    budget = RunBudget(deadline_seconds=0, max_tokens=1000, shares={"code": 1.0})
+    budget.start_stage("code")
+    budget.add_tokens(100)
+    budget.record_attempt(1.0, 100)
+
+    assert budget.allow_retry("review_loop")
+
+
+def test_only_optional_stages_are_degraded():
+    budget = RunBudget(deadline_seconds=0, max_tokens=100)
+    budget.add_tokens(150)
+
+    assert budget.degrade_reason("code") is None
+    assert budget.degrade_reason("docs").startswith("token budget")
+    assert "docs" in budget.summary()["degraded"]
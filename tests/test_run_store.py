@@ -0,0 +1,47 @@
+"""
+Run Store
+Run history scoped to the stable user ID.
+"""
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from core import job_queue, run_store
+
+
+@pytest.fixture(autouse=True)
+def run_db(tmp_path, monkeypatch):
+    monkeypatch.setattr(run_store, "DB_PATH", tmp_path / "runs.db")
+    monkeypatch.setattr(run_store, "_initialized", False)
+
+
+def _finished_run(run_id, user_id, project="demo"):
+    run_store.start_run(run_id, project, f"requirement of {run_id}", user_id=user_id)
+    run_store.finish_run(run_id, "succeeded", duration_ms=10)
+
+
+def test_history_survives_a_reload_and_stays_private():
+    user_id, other = job_queue.resolve_user_id(None), job_queue.resolve_user_id(None)
+    _finished_run("run1", user_id)
+    _finished_run("run2", other)
+    _finished_run("run3", user_id)
+
+    # A reload resolves the same ID from the URL and sees every earlier run
+    reloaded = job_queue.resolve_user_id(user_id)
+    history = run_store.list_runs(status="succeeded", user_id=reloaded)
+
+    assert [r["run_id"] for r in history] == ["run3", "run1"]
+    assert [r["run_id"] for r in run_store.list_runs(user_id=other)] == ["run2"]
+
+
+def test_history_reopens_a_run():
+    user_id = job_queue.resolve_user_id(None)
+    _finished_run("run1", user_id, project="shop")
+
+    past = run_store.load_run(run_store.list_runs(user_id=user_id)[0]["run_id"])
+
+    assert past["run"]["project_name"] == "shop"
+    assert past["run"]["user_id"] == user_id
@@ -0,0 +1,48 @@
+"""
+Symbol Index
+Token-bounded project context for agent prompts.
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from core.symbol_index import build_symbol_index, pack_context
+
+
+def _module(name, functions):
+    body = "\n\n".join(
+        f"def {fn}(value: int) -> int:\n    \"\"\"{fn} docs.\"\"\"\n" + "    value += 1\n" * 30 + "    return value\n"
+        for fn in functions
+    )
+    return {"path": f"app/{name}.py", "content": f"import os\n\n\n{body}"}
+
+
+FILES = [_module("auth", ["login", "logout"]), _module("billing", ["charge"]), _module("report", ["render"])]
+
+
+def test_index_records_imports_and_signatures():
+    entry = build_symbol_index(FILES)["app/auth.py"]
+
+    assert entry["imports"] == ["import os"]
+    assert [f["signature"] for f in entry["functions"]] == ["def login(value: int) -> int", "def logout(value: int) -> int"]
+
+
+def test_small_project_is_sent_once_in_full():
+    context = pack_context(FILES, budget_tokens=100_000)
+
+    assert "SIGNATURES" not in context
+    assert "NOT SHOWN IN FULL" not in context
+    for f in FILES:
+        assert context.count(f"### {f['path']}\n") == 1
+        assert f["content"] in context
+
+
+def test_files_that_do_not_fit_are_named_and_summarized():
+    context = pack_context(FILES, budget_tokens=250, focus=["app/billing.py"])
+
+    assert FILES[1]["content"] in context
+    assert "SIGNATURES (modules not shown in full):" in context
+    assert "def login(value: int) -> int" in context
+    assert context.rstrip().endswith("NOT SHOWN IN FULL (signatures and slices only): app/auth.py, app/report.py")
+    assert "\n# app/billing.py" not in context
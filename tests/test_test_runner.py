@@ -0,0 +1,67 @@
+"""
+Generated Test Runner
+Test-failure feedback and the keep-or-restore decision of test repairs.
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from core.test_runner import build_test_feedback, failing_test_files, repair_improved
+
+
+def _failure(file, test, environment=False, message="assert False"):
+    return {"file": file, "test": test, "kind": "failure", "message": message, "environment": environment}
+
+
+def _results(failed=0, errors=0, failures=()):
+    return {"status": "failed" if failures else "passed", "passed": 3, "failed": failed, "errors": errors,
+            "skipped": 0, "failures": list(failures)}
+
+
+def test_feedback_lists_code_failures_in_review_format():
+    results = _results(failed=2, failures=[
+        _failure("tests/test_auth.py", "test_login"),
+        _failure("tests/test_auth.py", "test_logout", message="x" * 1000),
+    ])
+
+    feedback = build_test_feedback(results)
+
+    assert feedback["status"] == "REJECTED"
+    assert feedback["issues"][0] == "tests/test_auth.py :: test_login (failure): assert False"
+    assert len(feedback["issues"][1]) < 600
+    assert "2 failing" in feedback["suggested_fixes"][0]
+
+
+def test_feedback_ignores_environment_failures():
+    results = _results(errors=1, failures=[
+        _failure("tests/test_db.py", "test_connect", environment=True, message="No module named 'psycopg2'"),
+    ])
+
+    assert build_test_feedback(results) is None
+    assert failing_test_files(results) == []
+
+
+def test_feedback_is_capped():
+    results = _results(failed=20, failures=[_failure("tests/test_a.py", f"test_{i}") for i in range(20)])
+
+    assert len(build_test_feedback(results, max_failures=5)["issues"]) == 5
+
+
+def test_failing_test_files_are_deduplicated():
+    results = _results(failed=3, failures=[
+        _failure("tests/test_b.py", "test_1"),
+        _failure("tests/test_a.py", "test_2"),
+        _failure("tests/test_b.py", "test_3"),
+    ])
+
+    assert failing_test_files(results) == ["tests/test_a.py", "tests/test_b.py"]
+
+
+def test_repair_is_kept_only_when_fewer_tests_fail():
+    before = _results(failed=2, errors=1)
+
+    assert repair_improved(before, _results(failed=1, errors=1))
+    assert repair_improved(before, _results())
+    assert not repair_improved(before, _results(failed=2, errors=1))
+    assert not repair_improved(before, _results(failed=0, errors=4))
@@ -0,0 +1,43 @@
+"""
+ZIP Export
+Archives built from the artifact store and cached by manifest hash.
+"""
+import sys
+import zipfile
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from core import artifact_store, zip_export
+
+
+@pytest.fixture(autouse=True)
+def stores(tmp_path, monkeypatch):
+    monkeypatch.setattr(artifact_store, "STORE_DIR", tmp_path / ".store")
+    monkeypatch.setattr(artifact_store, "OBJECTS_DIR", tmp_path / ".store" / "objects")
+    monkeypatch.setattr(zip_export, "ZIP_CACHE_DIR", tmp_path / ".zips")
+
+
+def test_archive_holds_every_entry_and_is_reused():
+    manifest = {"src": {"app/main.py": artifact_store.put_blob(b"print('hi')\n")},
+                "docs": {"README.md": artifact_store.put_blob(b"# Demo\n")}}
+
+    path = zip_export.build_project_zip("demo", manifest=manifest)
+
+    with zipfile.ZipFile(path) as archive:
+        assert sorted(archive.namelist()) == ["docs/README.md", "src/app/main.py"]
+        assert archive.read("src/app/main.py") == b"print('hi')\n"
+    assert zip_export.get_cached_zip("demo", manifest=manifest) == path
+    assert zip_export.build_project_zip("demo", manifest=manifest) == path
+
+
+def test_missing_content_raises_and_caches_nothing():
+    manifest = {"src": {"app/main.py": artifact_store.put_blob(b"x = 1\n"), "app/gone.py": "0" * 64}}
+
+    with pytest.raises(FileNotFoundError, match="src/app/gone.py"):
+        zip_export.build_project_zip("demo", manifest=manifest)
+
+    assert zip_export.get_cached_zip("demo", manifest=manifest) is None
+    assert list(zip_export.ZIP_CACHE_DIR.iterdir()) == []
@@ -0,0 +1,257 @@
+"""
+Fake LLM Backend
+Offline stand-in for the seven pipeline agents, for load tests.
+
+Each fake agent answers generate_reply() like an AssistantAgent, after a
+simulated delay (a latency distribution plus output tokens at a fixed token
+rate). Some configured fraction of calls returns truncated or malformed JSON,
+gets a rejecting review, or fails like a rate-limited (429) or broken call.
+Token usage is accounted through core.llm_client.record_usage (imported on
+first call), just like real calls, so run budgets and adaptive parameters
+see it. The fake backend needs no provider packages or connection; the
+pipeline it drives still imports its own HTTP client modules.
+
+install_fake_agents() must run before orchestrator.pipeline is imported: it
+registers the fake agents as the agents.* modules, so neither Streamlit
+secrets nor a provider connection are needed.
+"""
+import base64
+import contextvars
+import json
+import math
+import random
+import sys
+import threading
+import time
+import types
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+CHARS_PER_TOKEN = 4
+
+# Configured output caps of the real agents
+AGENT_MAX_TOKENS = {
+    "requirement_agent": 2000,
+    "design_agent": 2000,
+    "coding_agent": 5000,
+    "review_agent": 2000,
+    "test_agent": 2000,
+    "documentation_agent": 600,
+    "deployment_agent": 2000,
+}
+
+
+class FakeRateLimitError(Exception):
+    """Raised like the provider's 429 response."""
+    status_code = 429
+
+
+class FakeProviderError(Exception):
+    """Raised like a provider-side 5xx response."""
+    status_code = 500
+
+
+@dataclass
+class BackendConfig:
+    latency_dist: str = "lognormal"  # fixed | uniform | lognormal
+    latency_ms: float = 800.0  # median (fixed: exact value, uniform: mean)
+    latency_p95_ms: float = 2500.0  # lognormal tail / uniform upper bound
+    tokens_per_second: float = 250.0
+    rate_limit_rate: float = 0.0
+    error_rate: float = 0.0
+    truncated_rate: float = 0.0
+    malformed_rate: float = 0.0
+    reject_rate: float = 0.0
+    time_scale: float = 1.0  # multiply every delay, e.g. 0.01 for quick smoke runs
+    seed: Optional[int] = None
+
+
+def _b64(text: str) -> str:
+    return base64.b64encode(text.encode("utf-8")).decode("ascii")
+
+
+def _canned_outputs(variant: int) -> Dict[str, Dict]:
+    """Valid outputs of every agent; variant makes each run's code unique."""
+    module = f"service_{variant}"
+    return {
+        "requirement_agent": {
+            "functional_requirements": ["Users can register", "Users can log in and receive a token"],
+            "non_functional_requirements": ["p95 latency under 200ms"],
+            "constraints": ["Python 3.11"],
+            "edge_cases": ["duplicate email on registration"],
+        },
+        "design_agent": {
+            "components": ["Auth Service (FastAPI)", "User Repository (PostgreSQL)"],
+            "data_models": ["User"],
+            "apis": ["POST /register", "POST /login"],
+            "security": ["Hashed passwords", "Signed tokens"],
+            "infrastructure": ["Docker", "PostgreSQL"],
+            "scalability_considerations": ["Stateless API instances"],
+        },
+        "coding_agent": {
+            "files": [
+                {"path": "app/__init__.py", "content_base64": _b64("")},
+                {"path": f"app/{module}.py", "content_base64": _b64(
+                    "def login(user: str, password: str) -> bool:\n"
+                    "    \"\"\"Check credentials.\"\"\"\n"
+                    "    return bool(user and password)\n"
+                )},
+                {"path": "app/main.py", "content_base64": _b64(
+                    f"from app.{module} import login\n\n\n"
+                    "def main():\n"
+                    "    return login('user', 'secret')\n"
+                )},
+            ]
+        },
+        "review_agent": {"status": "APPROVED", "issues": [], "suggested_fixes": []},
+        "test_agent": {
+            "tests": [
+                {"path": f"test_{module}.py", "content_base64": _b64(
+                    f"from app.{module} import login\n\n\n"
+                    "def test_login_accepts_credentials():\n"
+                    "    assert login('user', 'secret')\n\n\n"
+                    "def test_login_rejects_empty():\n"
+                    "    assert not login('', '')\n"
+                )}
+            ]
+        },
+        "documentation_agent": {
+            "overview": f"Service {variant} registers users and issues login tokens.",
+            "architecture": "A FastAPI auth service stores users in PostgreSQL through a repository layer.",
+            "usage": "Start the stack, register a user, then log in to receive a token.",
+        },
+        "deployment_agent": {"deploy": [{"path": "Dockerfile", "content_base64": _b64("FROM python:3.11-slim\n")}]},
+    }
+
+
+_REJECTION = {
+    "status": "REJECTED",
+    "issues": ["app/main.py does not handle failed logins"],
+    "suggested_fixes": ["Return an error when login fails"],
+}
+
+
+class FakeBackend:
+    """Shared latency/failure model and call statistics of all fake agents."""
+
+    def __init__(self, config: BackendConfig):
+        self.config = config
+        self._random = random.Random(config.seed)
+        self._lock = threading.Lock()
+        self.stats = {
+            "calls": 0, "rate_limited": 0, "errors": 0, "truncated": 0,
+            "malformed": 0, "rejected": 0, "prompt_tokens": 0, "completion_tokens": 0,
+        }
+
+    def _draw(self) -> float:
+        with self._lock:
+            return self._random.random()
+
+    def _latency_seconds(self) -> float:
+        config = self.config
+        with self._lock:
+            if config.latency_dist == "fixed":
+                ms = config.latency_ms
+            elif config.latency_dist == "uniform":
+                spread = max(0.0, config.latency_p95_ms - config.latency_ms)
+                ms = self._random.uniform(config.latency_ms - spread, config.latency_p95_ms)
+            else:
+                sigma = math.log(max(config.latency_p95_ms, config.latency_ms) / config.latency_ms) / 1.645
+                ms = self._random.lognormvariate(math.log(config.latency_ms), sigma)
+        return max(0.0, ms) / 1000
+
+    def _count(self, key: str, amount: int = 1) -> None:
+        with self._lock:
+            self.stats[key] += amount
+
+    def complete(self, agent_name: str, messages: List[Dict], variant: int) -> str:
+        """Simulate one completion; returns the response text or raises like the provider."""
+        config = self.config
+        self._count("calls")
+        prompt_tokens = len(str(messages)) // CHARS_PER_TOKEN
+
+        if self._draw() < config.rate_limit_rate:
+            self._count("rate_limited")
+            time.sleep(0.05 * config.time_scale)
+            raise FakeRateLimitError("Error code: 429 - rate limit exceeded (fake backend)")
+        if self._draw() < config.error_rate:
+            self._count("errors")
+            time.sleep(self._latency_seconds() * config.time_scale)
+            raise FakeProviderError("Error code: 500 - internal error (fake backend)")
+
+        output = _canned_outputs(variant)[agent_name]
+        if agent_name == "review_agent" and self._draw() < config.reject_rate:
+            self._count("rejected")
+            output = _REJECTION
+        text = json.dumps(output)
+
+        truncated = False
+        draw = self._draw()
+        if draw < config.truncated_rate:
+            self._count("truncated")
+            text, truncated = text[:max(1, int(len(text) * 0.6))], True
+        elif draw < config.truncated_rate + config.malformed_rate:
+            self._count("malformed")
+            text = "Sorry, I ran into a problem generating the JSON for this request."
+
+        completion_tokens = len(text) // CHARS_PER_TOKEN + 1
+        self._count("prompt_tokens", prompt_tokens)
+        self._count("completion_tokens", completion_tokens)
+
+        delay = self._latency_seconds() + completion_tokens / config.tokens_per_second
+        time.sleep(delay * config.time_scale)
+
+        # Imported on first use, so the fake backend itself needs no provider client packages
+        from core.llm_client import record_usage
+        record_usage(prompt_tokens, completion_tokens, AGENT_MAX_TOKENS.get(agent_name), truncated)
+        return text
+
+
+# Run variant of the calling context - unique generated code per load-test run
+_variant = contextvars.ContextVar("fake_llm_variant", default=0)
+
+
+def set_variant(variant: int) -> None:
+    _variant.set(variant)
+
+
+class FakeAgent:
+    """Minimal AssistantAgent stand-in (name, system_message, llm_config, generate_reply)."""
+
+    def __init__(self, name: str, backend: FakeBackend):
+        self.name = name
+        self.system_message = f"fake {name}"
+        self.llm_config = {"max_tokens": AGENT_MAX_TOKENS[name], "temperature": 0.0}
+        self._backend = backend
+
+    def generate_reply(self, messages=None, **kwargs):
+        text = self._backend.complete(self.name, messages or [], _variant.get())
+        return {"content": text, "role": "assistant"}
+
+
+def install_fake_agents(backend: FakeBackend) -> Dict[str, FakeAgent]:
+    """
+    Register fake agents as the agents.* modules.
+
+    Args:
+        backend: Shared fake backend
+
+    Returns:
+        Dictionary of agent name -> FakeAgent
+
+    Raises:
+        RuntimeError: If the pipeline was already imported with the real agents
+    """
+    if "orchestrator.pipeline" in sys.modules:
+        raise RuntimeError("install_fake_agents() must run before orchestrator.pipeline is imported")
+
+    package = sys.modules.setdefault("agents", types.ModuleType("agents"))
+    package.__path__ = []
+    agents = {}
+    for name in AGENT_MAX_TOKENS:
+        module = types.ModuleType(f"agents.{name}")
+        agents[name] = FakeAgent(name, backend)
+        setattr(module, name, agents[name])
+        sys.modules[f"agents.{name}"] = module
+        setattr(package, name, module)
+    return agents
@@ -0,0 +1,392 @@
+"""
+Load Test
+Drive run_pipeline at a target arrival rate against the fake LLM backend.
+
+    python -m tools.loadgen --rate 0.5 --runs 40 --max-concurrency 16
+
+Runs arrive as a Poisson process (or at a fixed interval) and execute on a
+pool of --max-concurrency threads, like UI sessions or queue workers sharing
+one box. The report covers throughput against the offered rate, end-to-end,
+queueing and per-stage latency percentiles, peak concurrency, memory and CPU
+(including the generated-test subprocesses), and what the fake backend did.
+With --project every run uses the same project name, and each finished run's
+workspace is checked for files of other runs.
+
+Everything runs offline. Run history, generated files, logs and traces go to
+a throwaway work directory, so the real run store (and the adaptive
+parameters learned from it) is never touched.
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import resource
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from tools.fake_llm import BackendConfig, FakeBackend, install_fake_agents, set_variant
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_SECONDS = 0.5
+
+
+def _percentiles(values: List[float]) -> Dict[str, Optional[float]]:
+    if not values:
+        return {"p50": None, "p95": None, "p99": None, "max": None, "n": 0}
+    ordered = sorted(values)
+
+    def pick(fraction):
+        return round(ordered[min(len(ordered) - 1, int(fraction * len(ordered)))], 1)
+
+    return {"p50": pick(0.50), "p95": pick(0.95), "p99": pick(0.99), "max": round(ordered[-1], 1), "n": len(ordered)}
+
+
+def _rss_mb() -> float:
+    """Current resident set size (Linux), else the peak so far."""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _isolate(workdir: Path) -> None:
+    """Point every on-disk store at the work directory."""
+    from core import artifact_store, file_saver, logging_config, run_store, test_runner, tracing, zip_export
+
+    run_store.DB_PATH = workdir / "data" / "runs.db"
+    run_store._initialized = False
+    file_saver.GENERATED_DIR = workdir / "generated"
+    artifact_store.STORE_DIR = file_saver.GENERATED_DIR / ".store"
+    artifact_store.OBJECTS_DIR = artifact_store.STORE_DIR / "objects"
+    test_runner.RESULTS_CACHE_DIR = file_saver.GENERATED_DIR / ".test_results"
+    zip_export.ZIP_CACHE_DIR = file_saver.GENERATED_DIR / ".zips"
+    tracing.TRACES_DIR = workdir / "traces"
+    logging_config.LOGS_DIR = workdir / "logs"
+
+
+class Monitor:
+    """Samples concurrency, memory and CPU while the test runs."""
+
+    def __init__(self):
+        self.active = 0
+        self.peak_active = 0
+        self.samples = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+
+    def run_started(self):
+        with self._lock:
+            self.active += 1
+            self.peak_active = max(self.peak_active, self.active)
+
+    def run_finished(self):
+        with self._lock:
+            self.active -= 1
+
+    def _sample(self):
+        times = os.times()
+        self.samples.append({
+            "t": time.monotonic(),
+            "active": self.active,
+            "rss_mb": _rss_mb(),
+            "cpu_s": times.user + times.system,
+            "children_cpu_s": times.children_user + times.children_system,
+        })
+
+    def _loop(self):
+        while not self._stop.wait(SAMPLE_SECONDS):
+            self._sample()
+
+    def start(self):
+        self._sample()
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self._sample()
+
+    def summary(self) -> Dict:
+        first, last = self.samples[0], self.samples[-1]
+        wall = max(1e-9, last["t"] - first["t"])
+        return {
+            "peak_concurrent_runs": self.peak_active,
+            "rss_start_mb": round(first["rss_mb"], 1),
+            "rss_peak_mb": round(max(s["rss_mb"] for s in self.samples), 1),
+            "cpu_cores_avg": round((last["cpu_s"] - first["cpu_s"]) / wall, 2),
+            "test_subprocess_cores_avg": round((last["children_cpu_s"] - first["children_cpu_s"]) / wall, 2),
+        }
+
+
+def _workspace_is_clean(project: str, run_id: str, index: int) -> bool:
+    """Whether a run's workspace holds exactly its own generated files."""
+    from core.file_saver import load_project_manifest, run_workspace
+
+    src = load_project_manifest(project, run_id).get("src", {})
+    services = {path for path in src if path.startswith("app/service_")}
+    on_disk = {
+        p.relative_to(run_workspace(project, run_id) / "src").as_posix()
+        for p in (run_workspace(project, run_id) / "src").rglob("*") if p.is_file()
+    }
+    return services == {f"app/service_{index}.py"} and on_disk == set(src)
+
+
+def _run_one(index: int, scheduled: float, reuse: str, monitor: Monitor, project: Optional[str] = None) -> Dict:
+    from core.logging_config import setup_logging, close_run_logging
+    from orchestrator.pipeline import run_pipeline
+
+    started = time.monotonic()
+    monitor.run_started()
+    set_variant(index)
+    run_id = f"lt{index:05d}{uuid.uuid4().hex[:4]}"
+    project = project or f"loadtest_{index:05d}"
+    setup_logging(project, run_id=run_id)
+    try:
+        result = run_pipeline(
+            f"Load test request {index}: a login service with registration and token issuing",
+            project, reuse=reuse
+        )
+        error = result.get("error") if "error" in result else None
+        if error and result.get("exception"):
+            error = f"{error}: {result['exception']}"
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    finally:
+        close_run_logging(run_id)
+        monitor.run_finished()
+
+    if error is None and not _workspace_is_clean(project, run_id, index):
+        error = "workspace contains files of another run"
+
+    return {
+        "index": index,
+        "run_id": run_id,
+        "ok": error is None,
+        "error": error,
+        "queue_ms": (started - scheduled) * 1000,
+        "latency_ms": (time.monotonic() - started) * 1000,
+    }
+
+
+def run_load_test(
+    backend_config: BackendConfig,
+    rate: float,
+    runs: int,
+    max_concurrency: int,
+    arrival: str = "poisson",
+    reuse: str = "off",
+    test_gate: bool = True,
+    workdir: Optional[Path] = None,
+    project: Optional[str] = None,
+    hedge: bool = False,
+) -> Dict:
+    """
+    Run a load test and return the report.
+
+    Args:
+        backend_config: Latency/failure model of the fake backend
+        rate: Offered load in runs per second
+        runs: Number of runs to start
+        max_concurrency: Runs executing at once; later arrivals queue
+        arrival: 'poisson' or 'fixed' inter-arrival times
+        reuse: reuse mode passed to run_pipeline ('off' measures full runs)
+        test_gate: Execute the generated tests, as production runs with RUN_GENERATED_TESTS=1 do
+        workdir: Where run state goes (default: a temporary directory, removed afterwards)
+        project: Project name shared by every run (default: one project per run)
+        hedge: Hedge slow agent calls (see core.hedging); starts once agents have history
+
+    Returns:
+        Report dictionary (see format_report)
+    """
+    backend = FakeBackend(backend_config)
+    install_fake_agents(backend)
+
+    cleanup = workdir is None
+    workdir = Path(workdir or tempfile.mkdtemp(prefix="codeforge-loadtest-"))
+    workdir.mkdir(parents=True, exist_ok=True)
+    _isolate(workdir)
+
+    from orchestrator import pipeline
+    from core import hedging, run_store
+
+    pipeline.RUN_GENERATED_TESTS = test_gate
+    hedging.HEDGE_REQUESTS = hedge
+
+    arrivals = random.Random(backend_config.seed)
+    monitor = Monitor()
+    monitor.start()
+    started = time.monotonic()
+    futures = []
+    try:
+        with ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="loadtest") as pool:
+            next_arrival = started
+            for index in range(runs):
+                delay = next_arrival - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                futures.append(pool.submit(_run_one, index, next_arrival, reuse, monitor, project))
+                gap = arrivals.expovariate(rate) if arrival == "poisson" else 1.0 / rate
+                next_arrival += gap
+            results = [f.result() for f in futures]
+        elapsed = time.monotonic() - started
+    finally:
+        monitor.stop()
+
+    stage_latencies = run_store.stage_latencies([r["run_id"] for r in results])
+    succeeded = [r for r in results if r["ok"]]
+    report = {
+        "config": {
+            "rate": rate, "runs": runs, "max_concurrency": max_concurrency, "arrival": arrival,
+            "reuse": reuse, "test_gate": test_gate, "project": project, "hedge": hedge,
+            "backend": vars(backend_config),
+        },
+        "elapsed_s": round(elapsed, 2),
+        "succeeded": len(succeeded),
+        "failed": len(results) - len(succeeded),
+        "throughput_rps": round(len(succeeded) / elapsed, 3) if elapsed else 0.0,
+        "offered_rps": rate,
+        "latency_ms": _percentiles([r["latency_ms"] for r in succeeded]),
+        "queue_ms": _percentiles([r["queue_ms"] for r in results]),
+        "stages_ms": {stage: _percentiles(values) for stage, values in sorted(stage_latencies.items())},
+        "resources": monitor.summary(),
+        "backend": dict(backend.stats),
+        "hedging": hedging.hedge_metrics(),
+        "errors": Counter(r["error"] for r in results if r["error"]).most_common(5),
+        "workdir": None if cleanup else str(workdir),
+    }
+
+    if cleanup:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return report
+
+
+def format_report(report: Dict) -> str:
+    """Human-readable summary of a load test report."""
+    def row(label, p):
+        if not p["n"]:
+            return f"  {label:<22} (no samples)"
+        return f"  {label:<22} p50 {p['p50']:>9.0f}  p95 {p['p95']:>9.0f}  p99 {p['p99']:>9.0f}  max {p['max']:>9.0f}  n={p['n']}"
+
+    config, resources, backend = report["config"], report["resources"], report["backend"]
+    lines = [
+        "=" * 80,
+        f"LOAD TEST: {config['runs']} runs at {config['rate']} runs/s ({config['arrival']}), "
+        f"max {config['max_concurrency']} concurrent",
+        "=" * 80,
+        f"Completed in {report['elapsed_s']}s: {report['succeeded']} succeeded, {report['failed']} failed",
+        f"Throughput: {report['throughput_rps']} runs/s (offered {report['offered_rps']})",
+        "",
+        "Latency (ms):",
+        row("end-to-end", report["latency_ms"]),
+        row("queueing", report["queue_ms"]),
+    ]
+    for stage, p in report["stages_ms"].items():
+        lines.append(row(f"stage {stage}", p))
+    lines += [
+        "",
+        f"Peak concurrent runs: {resources['peak_concurrent_runs']}",
+        f"Memory: {resources['rss_start_mb']} MB at start, {resources['rss_peak_mb']} MB peak RSS",
+        f"CPU: {resources['cpu_cores_avg']} cores (pipeline process), "
+        f"{resources['test_subprocess_cores_avg']} cores (generated-test subprocesses)",
+        "",
+        f"Fake backend: {backend['calls']} calls, {backend['rate_limited']} rate-limited, {backend['errors']} errors, "
+        f"{backend['truncated']} truncated, {backend['malformed']} malformed, {backend['rejected']} rejected reviews, "
+        f"{backend['prompt_tokens'] + backend['completion_tokens']:,} tokens",
+    ]
+    if config["hedge"]:
+        hedging = report["hedging"]
+        lines.append(
+            f"Hedging: {hedging['hedged']} of {hedging['calls']} eligible calls hedged, "
+            f"{hedging['hedge_wins']} won by the hedge, {hedging['budget_denied']} denied by the hedge budget"
+        )
+
+    saturated = report["throughput_rps"] < 0.9 * report["offered_rps"] or (
+        report["queue_ms"]["p95"] or 0
+    ) > (report["latency_ms"]["p50"] or float("inf"))
+    if saturated:
+        lines.append("⚠️  Saturated: throughput is below the offered load or runs queue longer than they execute")
+    if report["errors"]:
+        lines.append("")
+        lines.append("Top errors:")
+        lines.extend(f"  {count}x {error}" for error, count in report["errors"])
+    lines.append("=" * 80)
+    return "\n".join(lines)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Offline load test of run_pipeline with a fake LLM backend")
+    parser.add_argument("--rate", type=float, default=0.5, help="Offered load in runs per second")
+    parser.add_argument("--runs", type=int, default=20, help="Number of runs to start")
+    parser.add_argument("--max-concurrency", type=int, default=8, help="Runs executing at once")
+    parser.add_argument("--arrival", choices=("poisson", "fixed"), default="poisson")
+    parser.add_argument("--reuse", choices=("auto", "draft", "off"), default="off")
+    parser.add_argument("--no-test-gate", action="store_true", help="Skip executing the generated tests")
+    parser.add_argument("--latency-dist", choices=("fixed", "uniform", "lognormal"), default="lognormal")
+    parser.add_argument("--latency-ms", type=float, default=800.0, help="Median (lognormal) / mean per-call latency")
+    parser.add_argument("--latency-p95-ms", type=float, default=2500.0, help="p95 (lognormal) / upper bound (uniform)")
+    parser.add_argument("--tokens-per-second", type=float, default=250.0, help="Simulated output token rate")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Fraction of calls failing with 429")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of calls failing with 500")
+    parser.add_argument("--truncated-rate", type=float, default=0.0, help="Fraction of outputs cut off")
+    parser.add_argument("--malformed-rate", type=float, default=0.0, help="Fraction of outputs without JSON")
+    parser.add_argument("--reject-rate", type=float, default=0.0, help="Fraction of reviews that reject")
+    parser.add_argument("--time-scale", type=float, default=1.0, help="Multiply every simulated delay")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--hedge", action="store_true", help="Hedge agent calls slower than their p90 latency")
+    parser.add_argument("--project", default=None, help="Run every request as this one project (concurrent runs)")
+    parser.add_argument("--workdir", type=Path, default=None, help="Keep run state here instead of a temp dir")
+    parser.add_argument("--json", type=Path, default=None, help="Also write the report as JSON")
+    args = parser.parse_args(argv)
+
+    # Pipeline logs go to the per-run files; keep the console for the report
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+    backend_config = BackendConfig(
+        latency_dist=args.latency_dist,
+        latency_ms=args.latency_ms,
+        latency_p95_ms=args.latency_p95_ms,
+        tokens_per_second=args.tokens_per_second,
+        rate_limit_rate=args.rate_limit_rate,
+        error_rate=args.error_rate,
+        truncated_rate=args.truncated_rate,
+        malformed_rate=args.malformed_rate,
+        reject_rate=args.reject_rate,
+        time_scale=args.time_scale,
+        seed=args.seed,
+    )
+    report = run_load_test(
+        backend_config,
+        rate=args.rate,
+        runs=args.runs,
+        max_concurrency=args.max_concurrency,
+        arrival=args.arrival,
+        reuse=args.reuse,
+        test_gate=not args.no_test_gate,
+        workdir=args.workdir,
+        project=args.project,
+        hedge=args.hedge,
+    )
+
+    print(format_report(report))
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    return 0 if report["succeeded"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -7,11 +7,20 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 
 import streamlit as st
 from orchestrator.pipeline import run_pipeline
-from core.logging_config import setup_logging
+from core.logging_config import setup_logging, close_run_logging
+from core.llm_client import prewarm, connection_metrics
+from core.zip_export import build_project_zip, get_cached_zip
+from core.tracing import load_timeline, TRACES_DIR
+from core.file_saver import get_artifact_by_hash, open_artifact, read_artifact_preview
+from core.artifact import Artifact
+from core import run_store, job_queue
+from core.similarity_index import find_similar_run, REUSE_THRESHOLD
+from core.adaptive_params import estimate_run
+from core.log_viewer import read_page, LOG_LEVELS, LOG_STAGES
+import altair as alt
+import os
 import re
 import json
-import zipfile
-import io
 from datetime import datetime
 import time
 
@@ -22,6 +31,44 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+
+@st.cache_resource(show_spinner=False)
+def prewarm_llm_client():
+    # Runs once per server process - opens the shared LLM connection pool
+    return prewarm()
+
+
+prewarm_llm_client()
+
+# Pipeline runs go to a background worker pool unless PIPELINE_JOB_QUEUE=0;
+# set PIPELINE_EXTERNAL_WORKERS=1 when workers run as `python -m core.job_queue`
+USE_JOB_QUEUE = os.getenv("PIPELINE_JOB_QUEUE", "1") != "0"
+JOB_POLL_SECONDS = 2
+
+
+@st.cache_resource(show_spinner=False)
+def start_worker_pool():
+    # One pool of pre-warmed worker processes per server process
+    return job_queue.WorkerPool().start()
+
+
+if USE_JOB_QUEUE and os.getenv("PIPELINE_EXTERNAL_WORKERS", "0") != "1":
+    start_worker_pool()
+
+# The user ID lives in the ?user= query parameter, so a reload or reconnect reaches the
+# same jobs and run history; the first visit gets a new ID written into the URL
+if "user_id" not in st.session_state:
+    st.session_state.user_id = job_queue.resolve_user_id(st.query_params.get("user"))
+if st.query_params.get("user") != st.session_state.user_id:
+    st.query_params["user"] = st.session_state.user_id
+
+# A new session picks up the user's newest unfinished job (e.g. after a reload)
+if USE_JOB_QUEUE and "jobs_resumed" not in st.session_state:
+    st.session_state.jobs_resumed = True
+    open_jobs = job_queue.list_jobs(st.session_state.user_id, limit=1, statuses=["queued", "running"])
+    if open_jobs:
+        st.session_state.active_job = open_jobs[0]["job_id"]
+
 st.markdown("""
     <style>
     .main-header {
@@ -118,6 +165,54 @@ with st.sidebar:
     st.metric("Projects Generated", st.session_state.total_projects)
     st.metric("Total Files Created", st.session_state.total_files)
     
+    if USE_JOB_QUEUE:
+        # Jobs of this user ID, including ones submitted before a reload
+        st.markdown("#### 🧾 Your Jobs")
+        user_jobs = job_queue.list_jobs(st.session_state.user_id, limit=20)
+        if user_jobs:
+            job_labels = {
+                j["job_id"]: f"{j['project_name']} · {j['status']} · {datetime.fromtimestamp(j['created_at']).strftime('%m-%d %H:%M')}"
+                for j in user_jobs
+            }
+            selected_job = st.selectbox("Jobs", list(job_labels.keys()), format_func=job_labels.get)
+            if st.button("👁️ Follow Job", use_container_width=True):
+                st.session_state.pop("current_result", None)
+                st.session_state.pop("job_error", None)
+                st.session_state.active_job = selected_job
+        else:
+            st.caption("No jobs yet")
+        st.caption("Bookmark this page's URL to get back to your jobs and runs from another tab.")
+    
+    # Run History - reopening a run reads the run store, no LLM calls
+    st.markdown("#### 🕘 Run History")
+    past_runs = run_store.list_runs(status="succeeded", limit=50, user_id=st.session_state.user_id)
+    if past_runs:
+        past_run_labels = {
+            r["run_id"]: f"{r['project_name']} · {datetime.fromtimestamp(r['created_at']).strftime('%m-%d %H:%M')} · {r['run_id']}"
+            for r in past_runs
+        }
+        selected_run = st.selectbox(
+            "Previous runs",
+            list(past_run_labels.keys()),
+            format_func=past_run_labels.get
+        )
+        if st.button("📂 Open Run", use_container_width=True):
+            past = run_store.load_run(selected_run)
+            if past is None:
+                st.error("⚠️ Run not found in history")
+            else:
+                st.session_state.current_result = {
+                    "out": past,
+                    "project_name": past["run"]["project_name"],
+                    "run_id": past["run"]["run_id"],
+                    "log_file": past["run"]["log_file"],
+                    "elapsed_time": (past["run"]["duration_ms"] or 0) / 1000,
+                    "requirement": past["run"]["requirement"],
+                    "from_history": True,
+                }
+    else:
+        st.caption("No previous runs yet")
+    
     st.markdown("---")
     st.markdown("#### ℹ️ About")
     st.markdown("""
@@ -187,6 +282,32 @@ req = st.text_area(
 if req:
     st.caption(f"✍️ Characters: {len(req)} | Words: {len(req.split())}")
 
+# Offer the requirements/architecture of a near-identical earlier run
+reuse_mode = "auto"
+similar_run = find_similar_run(req, user_id=st.session_state.user_id) if req.strip() else None
+if similar_run:
+    reusable = similar_run["similarity"] >= REUSE_THRESHOLD
+    st.info(
+        f"♻️ {similar_run['similarity']:.0%} similar to an earlier run of **{similar_run['project_name']}** "
+        f"(`{similar_run['run_id']}`)"
+    )
+    reuse_options = {
+        "Reuse its requirements & architecture": "auto",
+        "Use them as a draft": "draft",
+        "Start from scratch": "off",
+    }
+    if not reusable:
+        reuse_options.pop("Reuse its requirements & architecture")
+    reuse_choice = st.radio("Prior analysis", list(reuse_options), horizontal=True)
+    reuse_mode = reuse_options[reuse_choice]
+
+# Token and latency prediction from earlier runs
+estimate = estimate_run(req, user_id=st.session_state.user_id) if req.strip() else None
+if estimate:
+    latency = f"~{estimate['latency_s']:.0f}s" if estimate["latency_s"] else "unknown time"
+    p90 = f" (p90 {estimate['latency_p90_s']:.0f}s)" if estimate["latency_p90_s"] else ""
+    st.caption(f"📊 Estimated cost: ~{estimate['tokens']:,} tokens, {latency}{p90} - based on {estimate['basis']}")
+
 sanitized_project_name = re.sub(r'[^a-zA-Z0-9_-]', '_', project_name)
 
 col1, col2= st.columns([2, 1])
@@ -194,10 +315,508 @@ with col1:
     generate_button = st.button("🚀 Generate Full Project", type="primary", use_container_width=True)
 with col2:
     if st.button("🔄 Reset", use_container_width=True):
+        st.session_state.pop("current_result", None)
+        st.session_state.pop("job_error", None)
         st.rerun()
 
+
+# Partial reruns for result widgets (st.fragment in Streamlit >= 1.37)
+_fragment_api = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None)
+fragment = _fragment_api or (lambda func: func)
+polling_fragment = _fragment_api(run_every=JOB_POLL_SECONDS) if _fragment_api else (lambda func: func)
+
+# Artifact browser - only one page of files is rendered, and only opened files are read
+FILES_PER_PAGE = 20
+PREVIEW_BYTES = 20_000
+FILE_LANGUAGES = {
+    ".py": "python",
+    ".md": "markdown",
+    ".yml": "yaml",
+    ".yaml": "yaml",
+    ".json": "json",
+    ".toml": "toml",
+    ".sh": "bash",
+    ".txt": "text",
+    ".ini": "ini",
+    ".cfg": "ini",
+}
+
+LOG_PAGE_RECORDS = 200
+LOG_TAIL_RECORDS = 50
+
+PIPELINE_STAGES = [
+    ("requirements", "Requirements"),
+    ("design", "Architecture"),
+    ("code", "Code Generation"),
+    ("tests", "Testing"),
+    ("docs", "Documentation"),
+    ("deploy", "Deployment"),
+]
+
+
+@polling_fragment
+def render_job_status(job_id):
+    """Live status of a queued/running job; hands over to the results view when done."""
+    job = job_queue.get_job(job_id)
+    if job is None:
+        st.session_state.pop("active_job", None)
+        st.error("⚠️ Job not found")
+        return
+    
+    st.markdown("### 🔄 Generation in Progress")
+    
+    if job["status"] == "queued":
+        position = job_queue.queue_position(job_id) or 0
+        st.info(f"⏳ Queued - {position} job(s) ahead of yours. You can close this tab; the run continues on the server and reopening this page's URL brings you back to it.")
+        if st.button("✖️ Cancel Job"):
+            job_queue.cancel_job(job_id)
+            st.rerun()
+        return
+    
+    if job["status"] == "running":
+        done = set(run_store.completed_stages(job_id)) & {stage_key for stage_key, _ in PIPELINE_STAGES}
+        st.progress(len(done) / len(PIPELINE_STAGES))
+        stage_cols = st.columns(len(PIPELINE_STAGES))
+        active_marked = False
+        for col, (stage_key, stage_label) in zip(stage_cols, PIPELINE_STAGES):
+            with col:
+                if stage_key in done:
+                    st.markdown(f"✅ {stage_label}")
+                elif not active_marked:
+                    st.markdown(f"⏳ {stage_label}")
+                    active_marked = True
+                else:
+                    st.markdown(f"⚪ {stage_label}")
+        elapsed = time.time() - (job["started_at"] or job["created_at"])
+        st.caption(f"🤖 Running on worker `{job['worker_id']}` for {elapsed:.0f}s")
+        if show_debug and job["log_file"]:
+            # Newest records only, re-read on every poll - cheap however large the log grows
+            tail = read_page(job["log_file"], max_records=LOG_TAIL_RECORDS)
+            with st.expander("📜 Live Log", expanded=True):
+                st.code("\n".join(tail.lines) or "(no log output yet)", language='log')
+        return
+    
+    # Finished - move the outcome into session state and rerender the whole page
+    st.session_state.pop("active_job", None)
+    past = run_store.load_run(job_id) if job["status"] == "succeeded" else None
+    if past is not None and "error" not in past:
+        st.session_state.total_projects += 1
+        st.session_state.total_files += sum(stats["saved_count"] for stats in past["save_stats"].values())
+        st.session_state.current_result = {
+            "out": past,
+            "project_name": job["project_name"],
+            "run_id": job_id,
+            "log_file": job["log_file"],
+            "elapsed_time": (job["finished_at"] - (job["started_at"] or job["created_at"])),
+            "fresh": True,
+        }
+    else:
+        st.session_state.job_error = {
+            "error": job["error"] or job["status"],
+            "log_file": job["log_file"],
+        }
+    st.rerun()
+
+
+def render_test_results(results):
+    """Outcome of executing the generated test suite."""
+    summary = (
+        f"{results['passed']} passed, {results['failed']} failed, {results['errors']} errors, "
+        f"{results['skipped']} skipped in {results['duration_ms'] / 1000:.1f}s"
+        + (" (cached)" if results.get("cached") else "")
+    )
+    if results["status"] == "passed":
+        st.success(f"🧪 Generated tests passed: {summary}")
+    elif results["status"] == "failed":
+        st.error(f"🧪 Generated tests failed: {summary}")
+    elif results["status"] == "error":
+        st.warning(f"🧪 Generated tests could not run in the sandbox (missing packages): {summary}")
+    else:
+        st.info("🧪 No generated tests to run")
+    
+    if results.get("failures"):
+        with st.expander(f"🔍 {len(results['failures'])} Test Failures"):
+            for failure in results["failures"]:
+                st.markdown(f"**{failure['file']}** :: `{failure['test']}` ({failure['kind']})")
+                st.code(failure["message"], language="text")
+
+
+@fragment
+def render_downloads(out, project_name):
+    """Download buttons - reruns only this fragment when clicked."""
+    # Download Section
+    st.markdown("### 💾 Download Options")
+    dl_col1, dl_col2, dl_col3 = st.columns(3)
+    
+    with dl_col1:
+        # Archive is streamed from the artifact store and cached by content hash;
+        # without auto-download it is only built when first requested
+        manifest = out.get("manifest")
+        try:
+            zip_path = get_cached_zip(project_name, manifest=manifest)
+            if zip_path is None and (auto_download or st.button("📦 Prepare Project ZIP", use_container_width=True)):
+                zip_path = build_project_zip(project_name, manifest=manifest)
+            if zip_path:
+                with open(zip_path, 'rb') as zip_file:
+                    st.download_button(
+                        label="📦 Download Complete Project (ZIP)",
+                        data=zip_file,
+                        file_name=f"{project_name}.zip",
+                        mime="application/zip",
+                        use_container_width=True
+                    )
+            elif auto_download:
+                st.warning("ZIP export unavailable - no saved files found")
+        except Exception as e:
+            st.error(f"Could not build the project ZIP: {e}")
+    
+    with dl_col2:
+        # Download requirements as JSON
+        requirements_json = json.dumps(out["requirements"], indent=2)
+        st.download_button(
+            label="📋 Download Requirements (JSON)",
+            data=requirements_json,
+            file_name=f"{project_name}_requirements.json",
+            mime="application/json",
+            use_container_width=True
+        )
+    
+    with dl_col3:
+        # Download architecture as JSON
+        architecture_json = json.dumps(out["architecture"], indent=2)
+        st.download_button(
+            label="🏗️ Download Architecture (JSON)",
+            data=architecture_json,
+            file_name=f"{project_name}_architecture.json",
+            mime="application/json",
+            use_container_width=True
+        )
+
+
+def file_language(path):
+    """Syntax highlighting language for a generated file."""
+    if "Dockerfile" in path:
+        return "dockerfile"
+    return FILE_LANGUAGES.get(Path(path).suffix.lower(), "text")
+
+
+def file_size(f):
+    """Size of a generated file without decoding it when it is an Artifact."""
+    return f.size if isinstance(f, Artifact) else len(f["content"].encode("utf-8"))
+
+
+def load_file_content(f, digest, full):
+    """
+    File text for display - read from the artifact store when the file was saved,
+    truncated to a preview unless the full file was requested.
+    
+    Returns:
+        Tuple of (text, truncated)
+    """
+    if digest and not full:
+        preview = read_artifact_preview(digest, PREVIEW_BYTES)
+        if preview is not None:
+            return preview
+    if digest and full:
+        content = get_artifact_by_hash(digest)
+        if content is not None:
+            return content, False
+    content = f["content"]
+    if not full and len(content) > PREVIEW_BYTES:
+        return content[:PREVIEW_BYTES], True
+    return content, False
+
+
+def render_file_browser(files, kind, title, digests, icon="📄"):
+    """
+    Paginated, searchable file list. Contents are only read and rendered for
+    files the user opens, so page cost does not grow with the number of files.
+    
+    Args:
+        files: List of {path, content} dictionaries
+        kind: Widget key prefix ('code', 'test', 'doc', 'deploy')
+        title: Heading label
+        digests: Manifest entries {path: sha256} for reading files from disk
+        icon: Icon shown next to each file
+    """
+    st.markdown(f"#### Generated {len(files)} {title} Files")
+    if not files:
+        return
+    
+    opened = st.session_state.setdefault(f"{kind}_open_files", set())
+    full = st.session_state.setdefault(f"{kind}_full_files", set())
+    
+    query = st.text_input("🔍 Filter by path", key=f"{kind}_file_filter", placeholder="e.g. models/")
+    matches = [f for f in files if query.lower() in f["path"].lower()] if query else files
+    if not matches:
+        st.info("No files match the filter")
+        return
+    
+    page_count = (len(matches) + FILES_PER_PAGE - 1) // FILES_PER_PAGE
+    page = 1
+    if page_count > 1:
+        # A narrower filter may leave the remembered page out of range
+        if st.session_state.get(f"{kind}_file_page", 1) > page_count:
+            st.session_state[f"{kind}_file_page"] = page_count
+        page = st.number_input(
+            f"Page (of {page_count})", min_value=1, max_value=page_count, step=1, key=f"{kind}_file_page"
+        )
+    first = (page - 1) * FILES_PER_PAGE
+    st.caption(f"Showing {first + 1}-{min(first + FILES_PER_PAGE, len(matches))} of {len(matches)} files")
+    
+    for f in matches[first:first + FILES_PER_PAGE]:
+        path = f["path"]
+        is_open = path in opened
+        
+        row = st.columns([6, 1])
+        with row[0]:
+            st.markdown(f"{icon} **{path}** ({file_size(f):,} bytes)")
+        with row[1]:
+            st.button(
+                "Hide" if is_open else "View",
+                key=f"{kind}_toggle_{path}",
+                on_click=opened.symmetric_difference_update,
+                args=({path},),
+                use_container_width=True
+            )
+        
+        if not is_open:
+            continue
+        
+        digest = digests.get(path)
+        text, truncated = load_file_content(f, digest, path in full)
+        if kind == "doc":
+            st.markdown(text)
+        else:
+            st.code(text, language=file_language(path), line_numbers=True)
+        
+        action_cols = st.columns(2)
+        with action_cols[0]:
+            if truncated:
+                st.button(
+                    f"📜 Load full file ({file_size(f):,} bytes)",
+                    key=f"{kind}_full_{path}",
+                    on_click=full.add,
+                    args=(path,)
+                )
+        with action_cols[1]:
+            # Serve the stored copy; fall back to the in-memory text
+            artifact_file = open_artifact(digest) if digest else None
+            download_args = dict(
+                label=f"💾 Download {path}",
+                file_name=Path(path).name,
+                mime="text/markdown" if kind == "doc" else "text/plain",
+                key=f"download_{kind}_{path}"
+            )
+            if artifact_file:
+                with artifact_file:
+                    st.download_button(data=artifact_file, **download_args)
+            else:
+                st.download_button(data=f["content"], **download_args)
+        st.markdown("---")
+
+
+@fragment
+def render_artifact_tabs(out):
+    """Artifact tabs - per-file downloads rerun only this fragment."""
+    st.markdown("### 📄 Generated Artifacts")
+    tabs = st.tabs([
+        "📝 Requirements", 
+        "🏗️ Architecture", 
+        "💻 Source Code", 
+        "🧪 Tests", 
+        "📚 Documentation", 
+        "🚀 Deployment"
+    ])
+    
+    with tabs[0]:
+        st.markdown("#### Functional Requirements")
+        for idx, req_item in enumerate(out["requirements"].get("functional_requirements", []), 1):
+            st.markdown(f"{idx}. {req_item}")
+        
+        st.markdown("#### Non-Functional Requirements")
+        for idx, req_item in enumerate(out["requirements"].get("non_functional_requirements", []), 1):
+            st.markdown(f"{idx}. {req_item}")
+        
+        st.markdown("#### Constraints")
+        for idx, constraint in enumerate(out["requirements"].get("constraints", []), 1):
+            st.markdown(f"{idx}. {constraint}")
+        
+        with st.expander("📊 View Raw JSON"):
+            st.json(out["requirements"])
+    
+    with tabs[1]:
+        st.markdown("#### System Components")
+        components = out["architecture"].get("components", [])
+        if components:
+            for idx, comp in enumerate(components, 1):
+                if isinstance(comp, dict):
+                    with st.expander(f"Component {idx}: {comp.get('name', 'Unnamed')}"):
+                        st.markdown(f"**Purpose:** {comp.get('purpose', 'N/A')}")
+                        st.markdown(f"**Technology:** {comp.get('technology', 'N/A')}")
+                        if comp.get('description'):
+                            st.markdown(f"**Description:** {comp.get('description')}")
+                else:
+                    st.markdown(f"{idx}. {comp}")
+        else:
+            st.info("No components defined")
+        
+        st.markdown("#### Data Models")
+        data_models = out["architecture"].get("data_models", [])
+        if data_models:
+            for idx, model in enumerate(data_models, 1):
+                if isinstance(model, dict):
+                    model_name = model.get('name', f'Model {idx}')
+                    with st.expander(f"📊 {model_name}"):
+                        st.json(model)
+                else:
+                    st.markdown(f"{idx}. {model}")
+        else:
+            st.info("No data models defined")
+        
+        st.markdown("#### APIs")
+        apis = out["architecture"].get("apis", [])
+        if apis:
+            for idx, api in enumerate(apis, 1):
+                if isinstance(api, dict):
+                    st.markdown(f"**{idx}. {api.get('endpoint', 'API')}**")
+                    st.markdown(f"- Method: {api.get('method', 'N/A')}")
+                    st.markdown(f"- Description: {api.get('description', 'N/A')}")
+                else:
+                    st.markdown(f"{idx}. {api}")
+        
+        with st.expander("📊 View Complete Architecture"):
+            st.json(out["architecture"])
+    
+    manifest = out.get("manifest") or {}
+    
+    with tabs[2]:
+        render_file_browser(out["code"]["files"], "code", "Source", manifest.get("src", {}), icon="📄")
+    
+    with tabs[3]:
+        render_file_browser(out["tests"]["tests"], "test", "Test", manifest.get("tests", {}), icon="🧪")
+    
+    with tabs[4]:
+        render_file_browser(out["docs"]["docs"], "doc", "Documentation", manifest.get("docs", {}), icon="📄")
+    
+    with tabs[5]:
+        render_file_browser(out["deploy"]["deploy"], "deploy", "Deployment", manifest.get("deploy", {}), icon="🚀")
+
+
+@fragment
+def render_log_viewer(log_file, key):
+    """Paged, filtered view of a run log - reads only the page shown, newest page first."""
+    col_levels, col_stages = st.columns(2)
+    with col_levels:
+        levels = st.multiselect("Levels", LOG_LEVELS, key=f"{key}_levels")
+    with col_stages:
+        stages = st.multiselect("Stages", LOG_STAGES, key=f"{key}_stages", help="'-' is logging outside any stage")
+
+    # Cursors of the pages above the one shown; reset when the filters change
+    filters = (tuple(levels), tuple(stages))
+    if st.session_state.get(f"{key}_filters") != filters:
+        st.session_state[f"{key}_filters"] = filters
+        st.session_state[f"{key}_cursors"] = [None]
+    cursors = st.session_state[f"{key}_cursors"]
+
+    page = read_page(log_file, cursors[-1], max_records=LOG_PAGE_RECORDS, levels=levels, stages=stages)
+
+    col_older, col_newer, col_latest = st.columns(3)
+    with col_older:
+        st.button("⬅️ Older", key=f"{key}_older", disabled=page.cursor is None, on_click=cursors.append, args=(page.cursor,))
+    with col_newer:
+        st.button("Newer ➡️", key=f"{key}_newer", disabled=len(cursors) == 1, on_click=cursors.pop)
+    with col_latest:
+        st.button("⏭️ Latest", key=f"{key}_latest", on_click=cursors.__delitem__, args=(slice(1, None),))
+
+    st.code("\n".join(page.lines) or "(no matching log records)", language='log')
+    caption = f"Page {len(cursors)} · {len(page.lines)} lines · {page.scanned_bytes / 1024:.0f} KB scanned"
+    if page.truncated_scan:
+        caption += " · scan limit reached - use ⬅️ Older to keep searching"
+    st.caption(caption)
+
+
+def render_results(out, project_name, run_id=None, log_file=None):
+    """Render statistics, downloads and artifact tabs for a pipeline result."""
+    st.markdown("### 📊 Generation Statistics")
+    metric_cols = st.columns(5)
+    
+    with metric_cols[0]:
+        total_files = sum([
+            out["save_stats"]["code"]["saved_count"],
+            out["save_stats"]["tests"]["saved_count"],
+            out["save_stats"]["docs"]["saved_count"],
+            out["save_stats"]["deploy"]["saved_count"]
+        ])
+        st.metric("Total Files", total_files, delta="Generated")
+    
+    with metric_cols[1]:
+        st.metric("Code Files", out["save_stats"]["code"]["saved_count"])
+    
+    with metric_cols[2]:
+        st.metric("Test Files", out["save_stats"]["tests"]["saved_count"])
+    
+    with metric_cols[3]:
+        st.metric("Docs", out["save_stats"]["docs"]["saved_count"])
+    
+    with metric_cols[4]:
+        st.metric("Deploy Configs", out["save_stats"]["deploy"]["saved_count"])
+    
+    # Project Location
+    project_dir = out["save_stats"]["code"].get("target_directory", "").replace("\\src", "").replace("/src", "")
+    st.info(f"📂 **Project Location:** `{project_dir}`")
+    
+    if out.get("test_results"):
+        render_test_results(out["test_results"])
+
+    for stage, reason in out.get("budget", {}).get("degraded", {}).items():
+        st.warning(f"⏱️ {stage} was degraded to stay within the run budget: {reason}")
+    
+    render_downloads(out, project_name)
+    
+    # View Log File
+    if show_debug:
+        with st.expander("🔍 View Log File"):
+            try:
+                render_log_viewer(log_file, key=f"log_{run_id or Path(log_file).stem}")
+            except Exception as e:
+                st.error(f"Could not read log file: {e}")
+        with st.expander("🔌 LLM Connection Pool"):
+            st.json(connection_metrics())
+        with st.expander("⏱️ Run Timeline"):
+            timeline = load_timeline(run_id)
+            if timeline:
+                for idx, row in enumerate(timeline):
+                    row["row"] = f"{idx:03d} {row['span']}"
+                chart = alt.Chart(alt.Data(values=timeline)).mark_bar().encode(
+                    x=alt.X("start_ms:Q", title="Milliseconds since run start"),
+                    x2="end_ms:Q",
+                    y=alt.Y("row:N", sort=None, title=None),
+                    color=alt.Color("span:N", legend=None),
+                    tooltip=["span:N", "duration_ms:Q", "thread:N", "details:N"]
+                ).properties(height=max(200, 18 * len(timeline)))
+                st.altair_chart(chart, use_container_width=True)
+                
+                with open(TRACES_DIR / f"{run_id}.trace.json", 'rb') as trace_file:
+                    st.download_button(
+                        label="⬇️ Download Trace (Perfetto / chrome://tracing)",
+                        data=trace_file,
+                        file_name=f"{project_name}_{run_id}.trace.json",
+                        mime="application/json",
+                        key="download_trace"
+                    )
+            else:
+                st.info("No trace recorded for this run")
+    
+    st.markdown("---")
+    
+    render_artifact_tabs(out)
+
+
 # Main Logic
 if generate_button:
+    # A new run replaces whatever result is currently shown
+    st.session_state.pop("current_result", None)
     if not req.strip():
         st.error("⚠️ Please provide a project description")
         st.stop()
@@ -206,290 +825,121 @@ if generate_button:
         st.error("⚠️ Please provide a valid project name")
         st.stop()
     
-    start_time = time.time()
+    if USE_JOB_QUEUE:
+        # Hand the run to the worker pool; the status panel below polls it
+        st.session_state.active_job = job_queue.submit_job(
+            st.session_state.user_id, req, sanitized_project_name, reuse=reuse_mode
+        )
+        st.session_state.pop("job_error", None)
+    else:
+        start_time = time.time()
     
-    # Initialize logging 
-    log_file = setup_logging(sanitized_project_name)
+        # Initialize logging 
+        log_file = setup_logging(sanitized_project_name)
     
-    # Progress Container
-    progress_container = st.container()
-    with progress_container:
-        st.markdown("### 🔄 Generation in Progress")
-        progress_bar = st.progress(0)
-        status_text = st.empty()
+        # Progress Container
+        progress_container = st.container()
+        with progress_container:
+            st.markdown("### 🔄 Generation in Progress")
+            progress_bar = st.progress(0)
+            status_text = st.empty()
         
-        # Stage indicators
-        stages = ["Requirements", "Architecture", "Code Generation", "Testing", "Documentation", "Deployment"]
-        stage_cols = st.columns(6)
-        stage_indicators = []
-        for i, col in enumerate(stage_cols):
-            with col:
-                stage_indicators.append(st.empty())
-                stage_indicators[i].markdown(f"⏳ {stages[i]}")
+            # Stage indicators
+            stages = ["Requirements", "Architecture", "Code Generation", "Testing", "Documentation", "Deployment"]
+            stage_cols = st.columns(6)
+            stage_indicators = []
+            for i, col in enumerate(stage_cols):
+                with col:
+                    stage_indicators.append(st.empty())
+                    stage_indicators[i].markdown(f"⏳ {stages[i]}")
         
-        # Simulate progress 
-        def update_stage(stage_idx, status="done"):
-            emoji = "✅" if status == "done" else "⏳" if status == "active" else "⚪"
-            stage_indicators[stage_idx].markdown(f"{emoji} {stages[stage_idx]}")
-            progress_bar.progress((stage_idx + 1) / len(stages))
+            # Simulate progress 
+            def update_stage(stage_idx, status="done"):
+                emoji = "✅" if status == "done" else "⏳" if status == "active" else "⚪"
+                stage_indicators[stage_idx].markdown(f"{emoji} {stages[stage_idx]}")
+                progress_bar.progress((stage_idx + 1) / len(stages))
         
-        status_text.info(f"📝 Logging to: {Path(log_file).name}")
+            status_text.info(f"📝 Logging to: {Path(log_file).name}")
         
-        # Run Pipeline
-        try:
-            with st.spinner("🤖 AI agents are collaborating on your project..."):
-                for i in range(len(stages)):
-                    update_stage(i, "active")
-                    time.sleep(0.1)  
-                    if i < len(stages) - 1:
-                        update_stage(i, "done")
+            # Run Pipeline
+            try:
+                with st.spinner("🤖 AI agents are collaborating on your project..."):
+                    for i in range(len(stages)):
+                        update_stage(i, "active")
+                        time.sleep(0.1)  
+                        if i < len(stages) - 1:
+                            update_stage(i, "done")
                 
-                out = run_pipeline(req, sanitized_project_name)
-                update_stage(len(stages) - 1, "done")
-            
-            elapsed_time = time.time() - start_time
-            
-            if "error" in out:
-                st.error(f"❌ Generation Failed: {out['error']}")
-                with st.expander("🔍 View Error Details"):
-                    st.code(out.get('_exception', 'No additional details available'))
-                    st.info(f"💡 Check log file for more information: {log_file}")
-                st.stop()
-            
-            st.session_state.total_projects += 1
-            if "save_stats" in out:
-                st.session_state.total_files += sum([
-                    out["save_stats"]["code"]["saved_count"],
-                    out["save_stats"]["tests"]["saved_count"],
-                    out["save_stats"]["docs"]["saved_count"],
-                    out["save_stats"]["deploy"]["saved_count"]
-                ])
-            
-            st.balloons()
-            st.success(f"✅ Project Generated Successfully in {elapsed_time:.2f}s!")
+                    out = run_pipeline(req, sanitized_project_name, reuse=reuse_mode, user_id=st.session_state.user_id)
+                    update_stage(len(stages) - 1, "done")
             
-            st.markdown("### 📊 Generation Statistics")
-            metric_cols = st.columns(5)
+                elapsed_time = time.time() - start_time
             
-            with metric_cols[0]:
-                total_files = sum([
-                    out["save_stats"]["code"]["saved_count"],
-                    out["save_stats"]["tests"]["saved_count"],
-                    out["save_stats"]["docs"]["saved_count"],
-                    out["save_stats"]["deploy"]["saved_count"]
-                ])
-                st.metric("Total Files", total_files, delta="Generated")
+                if "error" in out:
+                    st.error(f"❌ Generation Failed: {out['error']}")
+                    with st.expander("🔍 View Error Details"):
+                        st.code(out.get('_exception', 'No additional details available'))
+                        st.info(f"💡 Check log file for more information: {log_file}")
+                    st.stop()
             
-            with metric_cols[1]:
-                st.metric("Code Files", out["save_stats"]["code"]["saved_count"])
+                st.session_state.total_projects += 1
+                if "save_stats" in out:
+                    st.session_state.total_files += sum([
+                        out["save_stats"]["code"]["saved_count"],
+                        out["save_stats"]["tests"]["saved_count"],
+                        out["save_stats"]["docs"]["saved_count"],
+                        out["save_stats"]["deploy"]["saved_count"]
+                    ])
             
-            with metric_cols[2]:
-                st.metric("Test Files", out["save_stats"]["tests"]["saved_count"])
-            
-            with metric_cols[3]:
-                st.metric("Docs", out["save_stats"]["docs"]["saved_count"])
-            
-            with metric_cols[4]:
-                st.metric("Deploy Configs", out["save_stats"]["deploy"]["saved_count"])
-            
-            # Project Location
-            project_dir = out["save_stats"]["code"].get("target_directory", "").replace("\\src", "").replace("/src", "")
-            st.info(f"📂 **Project Location:** `{project_dir}`")
-            
-            # Download Section
-            st.markdown("### 💾 Download Options")
-            dl_col1, dl_col2, dl_col3 = st.columns(3)
-            
-            with dl_col1:
-                zip_buffer = io.BytesIO()
-                with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-                    # Add code files
-                    for f in out["code"]["files"]:
-                        zip_file.writestr(f"src/{f['path']}", f['content'])
-                    # Add test files
-                    for t in out["tests"]["tests"]:
-                        zip_file.writestr(f"tests/{t['path']}", t['content'])
-                    # Add docs
-                    for d in out["docs"]["docs"]:
-                        zip_file.writestr(f"docs/{d['path']}", d['content'])
-                    # Add deploy files
-                    for dep in out["deploy"]["deploy"]:
-                        zip_file.writestr(f"deploy/{dep['path']}", dep['content'])
-                
-                st.download_button(
-                    label="📦 Download Complete Project (ZIP)",
-                    data=zip_buffer.getvalue(),
-                    file_name=f"{sanitized_project_name}.zip",
-                    mime="application/zip",
-                    use_container_width=True
-                )
-            
-            with dl_col2:
-                # Download requirements as JSON
-                requirements_json = json.dumps(out["requirements"], indent=2)
-                st.download_button(
-                    label="📋 Download Requirements (JSON)",
-                    data=requirements_json,
-                    file_name=f"{sanitized_project_name}_requirements.json",
-                    mime="application/json",
-                    use_container_width=True
-                )
-            
-            with dl_col3:
-                # Download architecture as JSON
-                architecture_json = json.dumps(out["architecture"], indent=2)
-                st.download_button(
-                    label="🏗️ Download Architecture (JSON)",
-                    data=architecture_json,
-                    file_name=f"{sanitized_project_name}_architecture.json",
-                    mime="application/json",
-                    use_container_width=True
-                )
-            
-            # View Log File
-            if show_debug:
-                with st.expander("🔍 View Log File"):
-                    try:
-                        with open(log_file, 'r', encoding='utf-8') as f:
-                            log_content = f.read()
-                        st.code(log_content, language='log')
-                    except Exception as e:
-                        st.error(f"Could not read log file: {e}")
-            
-            st.markdown("---")
-            
-            st.markdown("### 📄 Generated Artifacts")
-            tabs = st.tabs([
-                "📝 Requirements", 
-                "🏗️ Architecture", 
-                "💻 Source Code", 
-                "🧪 Tests", 
-                "📚 Documentation", 
-                "🚀 Deployment"
-            ])
-            
-            with tabs[0]:
-                st.markdown("#### Functional Requirements")
-                for idx, req_item in enumerate(out["requirements"].get("functional_requirements", []), 1):
-                    st.markdown(f"{idx}. {req_item}")
-                
-                st.markdown("#### Non-Functional Requirements")
-                for idx, req_item in enumerate(out["requirements"].get("non_functional_requirements", []), 1):
-                    st.markdown(f"{idx}. {req_item}")
-                
-                st.markdown("#### Constraints")
-                for idx, constraint in enumerate(out["requirements"].get("constraints", []), 1):
-                    st.markdown(f"{idx}. {constraint}")
-                
-                with st.expander("📊 View Raw JSON"):
-                    st.json(out["requirements"])
-            
-            with tabs[1]:
-                st.markdown("#### System Components")
-                components = out["architecture"].get("components", [])
-                if components:
-                    for idx, comp in enumerate(components, 1):
-                        if isinstance(comp, dict):
-                            with st.expander(f"Component {idx}: {comp.get('name', 'Unnamed')}"):
-                                st.markdown(f"**Purpose:** {comp.get('purpose', 'N/A')}")
-                                st.markdown(f"**Technology:** {comp.get('technology', 'N/A')}")
-                                if comp.get('description'):
-                                    st.markdown(f"**Description:** {comp.get('description')}")
-                        else:
-                            st.markdown(f"{idx}. {comp}")
-                else:
-                    st.info("No components defined")
-                
-                st.markdown("#### Data Models")
-                data_models = out["architecture"].get("data_models", [])
-                if data_models:
-                    for idx, model in enumerate(data_models, 1):
-                        if isinstance(model, dict):
-                            model_name = model.get('name', f'Model {idx}')
-                            with st.expander(f"📊 {model_name}"):
-                                st.json(model)
-                        else:
-                            st.markdown(f"{idx}. {model}")
-                else:
-                    st.info("No data models defined")
-                
-                st.markdown("#### APIs")
-                apis = out["architecture"].get("apis", [])
-                if apis:
-                    for idx, api in enumerate(apis, 1):
-                        if isinstance(api, dict):
-                            st.markdown(f"**{idx}. {api.get('endpoint', 'API')}**")
-                            st.markdown(f"- Method: {api.get('method', 'N/A')}")
-                            st.markdown(f"- Description: {api.get('description', 'N/A')}")
-                        else:
-                            st.markdown(f"{idx}. {api}")
-                
-                with st.expander("📊 View Complete Architecture"):
-                    st.json(out["architecture"])
-            
-            with tabs[2]:
-                st.markdown(f"#### Generated {len(out['code']['files'])} Source Files")
-                for idx, f in enumerate(out["code"]["files"], 1):
-                    with st.expander(f"📄 {f['path']} ({len(f['content'])} chars)"):
-                        st.code(f["content"], language="python", line_numbers=True)
-                        
-                        # Download individual file
-                        st.download_button(
-                            label=f"💾 Download {f['path']}",
-                            data=f['content'],
-                            file_name=f['path'],
-                            mime="text/plain",
-                            key=f"download_code_{idx}"
-                        )
-            
-            with tabs[3]:
-                st.markdown(f"#### Generated {len(out['tests']['tests'])} Test Files")
-                for idx, t in enumerate(out["tests"]["tests"], 1):
-                    with st.expander(f"🧪 {t['path']} ({len(t['content'])} chars)"):
-                        st.code(t["content"], language="python", line_numbers=True)
-                        
-                        st.download_button(
-                            label=f"💾 Download {t['path']}",
-                            data=t['content'],
-                            file_name=t['path'],
-                            mime="text/plain",
-                            key=f"download_test_{idx}"
-                        )
-            
-            with tabs[4]:
-                st.markdown(f"#### Generated {len(out['docs']['docs'])} Documentation Files")
-                for idx, d in enumerate(out["docs"]["docs"], 1):
-                    st.markdown(f"### 📄 {d['path']}")
-                    st.markdown(d["content"])
-                    st.markdown("---")
-                    
-                    st.download_button(
-                        label=f"💾 Download {d['path']}",
-                        data=d['content'],
-                        file_name=d['path'],
-                        mime="text/markdown",
-                        key=f"download_doc_{idx}"
-                    )
-            
-            with tabs[5]:
-                st.markdown(f"#### Generated {len(out['deploy']['deploy'])} Deployment Files")
-                for idx, dep in enumerate(out["deploy"]["deploy"], 1):
-                    with st.expander(f"🚀 {dep['path']}"):
-                        st.code(dep["content"], language="dockerfile" if "Dockerfile" in dep['path'] else "yaml")
-                        
-                        st.download_button(
-                            label=f"💾 Download {dep['path']}",
-                            data=dep['content'],
-                            file_name=dep['path'],
-                            mime="text/plain",
-                            key=f"download_deploy_{idx}"
-                        )
+                # Keep the result across reruns (downloads, sidebar toggles) instead of losing it
+                st.session_state.current_result = {
+                    "out": out,
+                    "project_name": sanitized_project_name,
+                    "run_id": out.get("run_id"),
+                    "log_file": log_file,
+                    "elapsed_time": elapsed_time,
+                    "fresh": True,
+                }
         
-        except Exception as e:
-            st.error(f"❌ An unexpected error occurred: {str(e)}")
-            with st.expander("🔍 View Full Error"):
-                st.exception(e)
-            st.info(f"💡 Check log file: {log_file}")
+            except Exception as e:
+                st.error(f"❌ An unexpected error occurred: {str(e)}")
+                with st.expander("🔍 View Full Error"):
+                    st.exception(e)
+                st.info(f"💡 Check log file: {log_file}")
+            finally:
+                close_run_logging()
+
+if st.session_state.get("active_job"):
+    render_job_status(st.session_state.active_job)
+    if _fragment_api is None:
+        # No fragment support - fall back to polling with full reruns
+        time.sleep(JOB_POLL_SECONDS)
+        st.rerun()
+
+if st.session_state.get("job_error"):
+    job_error = st.session_state.job_error
+    st.error(f"❌ Generation Failed: {job_error['error']}")
+    if job_error.get("log_file"):
+        st.info(f"💡 Check log file for more information: {job_error['log_file']}")
+        if show_debug:
+            with st.expander("🔍 View Log File", expanded=True):
+                render_log_viewer(job_error["log_file"], key=f"log_{Path(job_error['log_file']).stem}")
+
+# Results persist in session state, so any later rerun renders them again for free
+if "current_result" in st.session_state:
+    current = st.session_state.current_result
+    if current.pop("fresh", False):
+        st.balloons()
+        st.success(f"✅ Project Generated Successfully in {current['elapsed_time']:.2f}s!")
+    elif current.get("from_history"):
+        st.info(
+            f"📂 Showing saved run `{current['run_id']}` of **{current['project_name']}** "
+            f"({current['elapsed_time']:.2f}s) - loaded from history, no LLM calls"
+        )
+        with st.expander("📄 Original Project Description"):
+            st.markdown(current["requirement"])
+    
+    render_results(current["out"], current["project_name"], run_id=current["run_id"], log_file=current["log_file"])
 
 # Footer
 st.markdown("---")